@@ -3,38 +3,105 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import time
+import json
 import plotly.express as px
 import plotly.graph_objects as go
-from math import sqrt, ceil
-from scipy.stats import norm
-import io
-import xlsxwriter
+from contextlib import closing
+from sc_engine import (
+    CostInputError,
+    compute_z_value,
+    warehouse_id,
+    build_network_index,
+)
+from sc_demand import (
+    MONTHS,
+    DEFAULT_DEMAND,
+    read_demand_table,
+    read_area_correlations,
+    demand_table_to_grid,
+    grid_to_demand_table,
+    default_demand_grid,
+    merge_demand_grids,
+    grid_to_market_data,
+    market_data_to_grid,
+)
+from sc_containers import SHIPMENTS_PER_YEAR
+from sc_geo import DEFAULT_COORDINATES, DEFAULT_ROAD_FACTOR, COORDINATE_COLUMNS, read_coordinates, road_distance, coordinates_to_table, table_to_coordinates
+from sc_catalog import CATALOG_COLUMNS, read_catalog, default_catalog, catalog_to_params, params_to_catalog
+from sc_incremental import COMPONENTS, recalculate_component, recalculate_all, compute_fingerprints
+from sc_cache import shared_cache, result_key, cache_get, cache_put, cache_stats
+from sc_sweep import MAX_GRID_POINTS, run_parameter_sweep
+from sc_sensitivity import INPUT_GROUPS, compute_sensitivities
+from sc_timeline import MAX_HORIZON_YEARS, run_cost_timeline
+from sc_optimizer import optimize_network, templates_from_warehouses
+from sc_montecarlo import simulate_service_levels
+from sc_inventory_sim import simulate_inventory
+from sc_export import EXPORT_FORMATS, export_to_bytes
+from sc_store import open_store, config_hash, save_scenario, load_scenario, list_scenarios, delete_scenario
+from sc_profiling import new_profile, lap, timed, count, finish_profile, append_log, start_cprofile, stop_cprofile
+
+DIAGNOSTICS_LOG_PATH = "sc_diagnostics.jsonl"
+# New market areas get a default demand row per SKU only for catalogs up to
+# this size; with larger catalogs their active SKUs are added or imported.
+MAX_SEEDED_SKUS = 10
+# SKUs shown in the inventory cost chart, most expensive first.
+MAX_CHART_SKUS = 25
+
+# Timings of this rerun, shown in the Diagnostics panel at the end of the page.
+rerun_profile = new_profile()
 
 # --- UI Enhancement Start ---
-# Initialize session state variables for storing results
-if 'rental_costs_calculated' not in st.session_state:
-    st.session_state.rental_costs_calculated = False
-    st.session_state.total_rental_cost = 0.0
-    st.session_state.rental_details_df = pd.DataFrame()
-
-if 'inventory_costs_calculated' not in st.session_state:
-    st.session_state.inventory_costs_calculated = False
-    st.session_state.total_inventory_financing_cost = 0.0
-    st.session_state.inventory_details_df = pd.DataFrame()
-    st.session_state.aggregated_inventory_metrics = {}
-
-if 'shipping_costs_calculated' not in st.session_state:
-    st.session_state.shipping_costs_calculated = False
-    st.session_state.total_shipping_cost = 0.0
-    st.session_state.shipping_details_df = pd.DataFrame()
-
-if 'labor_costs_calculated' not in st.session_state:
-    st.session_state.labor_costs_calculated = False
-    st.session_state.total_labor_cost = 0.0
-    st.session_state.labor_details_df = pd.DataFrame()
-
-if 'grand_total' not in st.session_state:
-    st.session_state.grand_total = 0.0
+# Results (cost components, sweeps, plans, optimizer runs, simulations) live
+# in the process-wide result cache shared by all sessions; a session keeps
+# only their keys, by kind of result, and the fingerprints of the inputs the
+# cost components were calculated from.
+result_cache = shared_cache()
+
+if 'result_keys' not in st.session_state:
+    st.session_state.result_keys = {}
+    st.session_state.result_fingerprints = {}
+
+if 'calc_messages' not in st.session_state:
+    st.session_state.calc_messages = {}
+
+if 'demand_grid' not in st.session_state:
+    # Base data of the demand editor; it only changes on import or when areas are added.
+    st.session_state.demand_grid = default_demand_grid([], [])
+    st.session_state.demand_grid_edited = st.session_state.demand_grid
+    st.session_state.demand_grid_areas = set()
+    st.session_state.demand_grid_version = 0
+    st.session_state.demand_file_id = None
+
+if 'catalog_grid' not in st.session_state:
+    # Base data of the SKU catalog editor; it only changes on import or when a scenario is loaded.
+    st.session_state.catalog_grid = default_catalog()
+    st.session_state.catalog_grid_version = 0
+    st.session_state.catalog_file_id = None
+
+if 'coordinate_grid' not in st.session_state:
+    # Base data of the coordinate editor; it only changes on import or when a scenario is loaded.
+    st.session_state.coordinate_grid = coordinates_to_table(DEFAULT_COORDINATES)
+    st.session_state.coordinate_grid_version = 0
+    st.session_state.coordinate_file_id = None
+
+if 'area_correlations' not in st.session_state:
+    # Imported area pair correlations; they stay until cleared or replaced.
+    st.session_state.area_correlations = {}
+    st.session_state.correlation_file_id = None
+
+if 'rerun_profiles' not in st.session_state:
+    st.session_state.rerun_profiles = []
+    st.session_state.event_timings = []
+    st.session_state.cprofile_armed = False
+    st.session_state.cprofile_report = None
+
+# A cProfile capture covers exactly one rerun after it was requested.
+rerun_profiler = start_cprofile() if st.session_state.cprofile_armed else None
+st.session_state.cprofile_armed = False
+
+if 'loaded_scenario' not in st.session_state:
+    st.session_state.loaded_scenario = None
+    st.session_state.market_area_options = []
 # --- UI Enhancement End ---
 
 # -----------------------------------------------------
@@ -85,13 +152,28 @@ st.markdown("<p class='main-header-font'><i class='fas fa-cogs icon'></i>Supply
 # -------------------------
 # Sidebar: Global Parameters
 # -------------------------
+def clear_area_correlations():
+    st.session_state.area_correlations = {}
+
 with st.sidebar:
     st.markdown("## <i class='fas fa-globe icon'></i> Global Settings", unsafe_allow_html=True)
     st.divider()
     st.markdown("<p class='widget-label'><i class='fas fa-percentage icon'></i> Actual Interest Rate (%)</p>", unsafe_allow_html=True)
-    interest_rate = st.number_input("", min_value=0.0, max_value=100.0, value=5.0, step=0.1, help="Enter the annual interest rate.", label_visibility="collapsed")
+    interest_rate = st.number_input("", min_value=0.0, max_value=100.0, value=5.0, step=0.1, help="Enter the annual interest rate.", key="interest_rate", label_visibility="collapsed")
     st.markdown("<p class='widget-label'><i class='fas fa-shield-alt icon'></i> Required Service Level (0-1)</p>", unsafe_allow_html=True)
-    service_level = st.slider("", min_value=0.0, max_value=1.0, value=0.95, help="Set desired service level.", label_visibility="collapsed")
+    service_level = st.slider("", min_value=0.0, max_value=1.0, value=0.95, help="Set desired service level.", key="service_level", label_visibility="collapsed")
+    st.markdown("<p class='widget-label'><i class='fas fa-project-diagram icon'></i> Demand Correlation Between Areas (0-1)</p>", unsafe_allow_html=True)
+    demand_correlation = st.slider("", min_value=0.0, max_value=1.0, value=1.0, step=0.05, help="1 adds up the safety stock of the areas a warehouse serves; lower values pool their demand risk.", key="demand_correlation", label_visibility="collapsed")
+    correlation_file = st.file_uploader("Area Correlations (CSV, Excel or Parquet)", type=["csv", "xlsx", "xls", "parquet"], key="correlation_file", help="One row per area pair: area, other_area, correlation. Overrides the value above for those pairs.")
+    if correlation_file is not None and correlation_file.file_id != st.session_state.correlation_file_id:
+        st.session_state.correlation_file_id = correlation_file.file_id
+        try:
+            st.session_state.area_correlations = read_area_correlations(correlation_file)
+        except ValueError as e:
+            st.error(f"Could not import area correlations: {e}")
+    if st.session_state.area_correlations:
+        st.caption(f"Using {sum(len(row) for row in st.session_state.area_correlations.values())} area pair correlations.")
+        st.button("Clear Area Correlations", key="clear_area_correlations", on_click=clear_area_correlations, use_container_width=True)
     st.divider()
     st.markdown("<p class='widget-label'><i class='fas fa-warehouse icon'></i> Layout Type</p>", unsafe_allow_html=True)
     layout_type = st.radio("", options=["Central and Fronts", "Main Regionals"], help="Select network structure.", key="layout_type_radio", horizontal=True, label_visibility="collapsed")
@@ -101,41 +183,22 @@ with st.sidebar:
         st.info("ℹ️ In 'Central and Fronts', define one MAIN and any number of FRONT warehouses.")
     st.divider()
     st.markdown("### <i class='fas fa-box-open icon'></i> Container Capacity", unsafe_allow_html=True)
-    container_capacity_40 = st.number_input("Capacity for 40ft HC (Units)", min_value=1, value=600, step=1, format="%d", help="Number of units fitting in a 40ft HC container.")
+    container_capacity_40 = st.number_input("Capacity for 40ft HC (Units)", min_value=1, value=600, step=1, format="%d", key="container_capacity_40", help="Number of units fitting in a 40ft HC container.")
+    shipment_planning = st.checkbox("Plan Container Loads", key="shipment_planning", help="Schedule sea shipments from the monthly forecast and pack them, by SKU footprint, into the cheapest mix of 20ft, 40ft and 40ft HC containers.")
+    shipments_per_year = st.selectbox("Shipments per Year", options=SHIPMENTS_PER_YEAR, index=SHIPMENTS_PER_YEAR.index(6), key="shipments_per_year", disabled=not shipment_planning, help="MAIN cycle stock is half a shipment; 6 matches the unplanned cycle stock.")
+    st.markdown("### <i class='fas fa-route icon'></i> Regional Deliveries", unsafe_allow_html=True)
+    land_routing = st.checkbox("Route Regional Deliveries", key="land_routing", disabled=layout_type != "Main Regionals", help="'Main Regionals' only: consolidate land orders into multi-stop truck routes instead of one out-and-back trip per order.")
+    deliveries_per_year = st.number_input("Delivery Rounds per Year", min_value=1, value=52, step=1, format="%d", key="deliveries_per_year", disabled=not land_routing)
+    route_truck_capacity = st.number_input("Truck Capacity (Units)", min_value=1, value=600, step=1, format="%d", key="route_truck_capacity", disabled=not land_routing)
 
 # Compute Z_value
-if service_level >= 1.0:
-    Z_value = 5
-elif service_level <= 0.0:
-    Z_value = -5
-else:
-    Z_value = norm.ppf(service_level)
+Z_value = compute_z_value(service_level)
+lap(rerun_profile, "page_and_sidebar")
 
 # -------------------------
 # Main App Tabs
 # -------------------------
-tab_setup, tab_calculations, tab_summary = st.tabs(["Setup Configuration", "Run Calculations", "Results Summary"])
-
-# =====================================================
-# Helper Function: Create Combined Excel File
-# =====================================================
-def create_combined_excel(rental_df, inventory_df, shipping_df, labor_df):
-    """
-    Creates an Excel file with 4 sheets:
-    - RentalCosts
-    - InventoryCosts
-    - ShippingCosts
-    - LaborCosts
-    Returns the file as bytes, suitable for download.
-    """
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        rental_df.to_excel(writer, sheet_name='RentalCosts', index=False)
-        inventory_df.to_excel(writer, sheet_name='InventoryCosts', index=False)
-        shipping_df.to_excel(writer, sheet_name='ShippingCosts', index=False)
-        labor_df.to_excel(writer, sheet_name='LaborCosts', index=False)
-    processed_data = output.getvalue()
-    return processed_data
+tab_setup, tab_calculations, tab_summary, tab_sweep, tab_timeline, tab_optimizer, tab_simulation = st.tabs(["Setup Configuration", "Run Calculations", "Results Summary", "Sensitivity Sweep", "Multi-Year Plan", "Network Optimizer", "Simulation"])
 
 # =====================================================
 # TAB 1: Setup – Inputs for Brands, Rental, Markets & Warehouses
@@ -145,72 +208,136 @@ with tab_setup:
     col_setup_1, col_setup_2 = st.columns(2)
     with col_setup_1:
         with st.container(border=True):
-             st.markdown("<p class='sub-header-font'><i class='fas fa-tags icon'></i>Brand Pricing</p>", unsafe_allow_html=True)
-             BRANDS = ["Heliocol", "SunStar", "SunValue"]
-             brand_unit_prices = {}
-             brand_cols = st.columns(len(BRANDS))
-             for idx, brand in enumerate(BRANDS):
-                 with brand_cols[idx]:
-                     brand_unit_prices[brand] = st.number_input(
-                         f"Unit Price ({brand})",
-                         min_value=0.0,
-                         value=80.0,
-                         step=1.0,
-                         help=f"Price per unit (4 panels) for {brand}.",
-                         key=f"{brand}_unit_price"
-                     )
+             st.markdown("<p class='sub-header-font'><i class='fas fa-tags icon'></i>SKU Catalog</p>", unsafe_allow_html=True)
+             catalog_file = st.file_uploader("Import SKU Catalog (CSV, Excel or Parquet)", type=["csv", "xlsx", "xls", "parquet"], key="catalog_file", help="One row per SKU: sku, unit_price and optionally sq_ft_per_unit. Replaces the catalog below.")
+             if catalog_file is not None and catalog_file.file_id != st.session_state.catalog_file_id:
+                 st.session_state.catalog_file_id = catalog_file.file_id
+                 try:
+                     imported_catalog = read_catalog(catalog_file)
+                 except ValueError as e:
+                     st.error(f"Could not import SKU catalog: {e}")
+                 else:
+                     st.session_state.catalog_grid = imported_catalog
+                     st.session_state.catalog_grid_version += 1
+                     st.success(f"Imported {len(imported_catalog)} SKUs.")
+             catalog_grid = st.data_editor(
+                 st.session_state.catalog_grid,
+                 key=f"catalog_editor_{st.session_state.catalog_grid_version}",
+                 num_rows="dynamic",
+                 hide_index=True,
+                 use_container_width=True,
+                 column_config={
+                     "sku": st.column_config.TextColumn("SKU", required=True),
+                     "unit_price": st.column_config.NumberColumn("Unit Price ($)", min_value=0.0, step=1.0, format="%.2f", default=80.0, help="Price per unit (4 panels)."),
+                     "sq_ft_per_unit": st.column_config.NumberColumn("Sq Ft per Unit", min_value=0.01, step=0.1, format="%.2f", help="Leave blank to use the global Sq Ft per Unit."),
+                 },
+             )
+             brand_unit_prices, brand_sq_ft = catalog_to_params(catalog_grid)
+             BRANDS = list(brand_unit_prices)
+             st.download_button("Download SKU Catalog (CSV)", catalog_grid[CATALOG_COLUMNS].to_csv(index=False).encode("utf-8"), file_name="sku_catalog.csv", mime="text/csv", key="catalog_download")
     with col_setup_2:
          with st.container(border=True):
             st.markdown("<p class='sub-header-font'><i class='fas fa-ruler-combined icon'></i>Rental Parameters</p>", unsafe_allow_html=True)
             rent_cols = st.columns(3)
             with rent_cols[0]:
-                sq_ft_per_unit = st.number_input("Sq Ft per Unit", min_value=0.1, value=0.8, step=0.1, format="%.1f", help="Square feet required for one unit.")
+                sq_ft_per_unit = st.number_input("Sq Ft per Unit", min_value=0.1, value=0.8, step=0.1, format="%.1f", key="sq_ft_per_unit", help="Square feet required for one unit of a SKU without its own footprint in the catalog.")
             with rent_cols[1]:
-                overhead_factor_main = st.number_input("Overhead (MAIN)", min_value=1.0, value=1.2, step=0.1, format="%.1f", help="Overhead factor for MAIN warehouses.")
+                overhead_factor_main = st.number_input("Overhead (MAIN)", min_value=1.0, value=1.2, step=0.1, format="%.1f", key="overhead_factor_main", help="Overhead factor for MAIN warehouses.")
             with rent_cols[2]:
-                 overhead_factor_front = st.number_input("Overhead (FRONT)", min_value=1.0, value=1.5, step=0.1, format="%.1f", help="Overhead factor for FRONT warehouses.")
+                 overhead_factor_front = st.number_input("Overhead (FRONT)", min_value=1.0, value=1.5, step=0.1, format="%.1f", key="overhead_factor_front", help="Overhead factor for FRONT warehouses.")
     st.markdown("<p class='section-header-font'><i class='fas fa-map-marker-alt icon'></i>Market Areas Setup</p>", unsafe_allow_html=True)
     with st.container(border=True):
         base_market_areas = ["FL", "CA_SOUTH", "CA_NORTH", "TX", "NJ"]
         st.write("Standard market areas:", ", ".join(base_market_areas))
-        custom_market_areas_str = st.text_input("Enter additional market areas (comma separated)", value="", help="E.g., NY, PA, OH")
+        custom_market_areas_str = st.text_input("Enter additional market areas (comma separated)", value="", key="market_areas_text", help="E.g., NY, PA, OH")
         custom_market_areas = [area.strip().upper() for area in custom_market_areas_str.split(",") if area.strip() != ""]
-        all_market_areas = sorted(list(dict.fromkeys(base_market_areas + custom_market_areas)))
-        selected_market_areas = st.multiselect("Select Market Areas to Include", options=all_market_areas, default=all_market_areas, help="Choose market areas to use.")
+        demand_file = st.file_uploader("Import Demand Table (CSV, Excel or Parquet)", type=["csv", "xlsx", "xls", "parquet"], key="demand_file", help="Long format, one row per area, brand and month: area, brand, month, forecast, avg_daily, std, avg_order.")
+        if demand_file is not None and demand_file.file_id != st.session_state.demand_file_id:
+            st.session_state.demand_file_id = demand_file.file_id
+            try:
+                imported_grid = demand_table_to_grid(read_demand_table(demand_file))
+            except ValueError as e:
+                st.error(f"Could not import demand table: {e}")
+            else:
+                st.session_state.demand_grid = merge_demand_grids(st.session_state.demand_grid_edited, imported_grid)
+                st.session_state.demand_grid_areas.update(imported_grid["area"])
+                st.session_state.demand_grid_version += 1
+                st.success(f"Imported {len(imported_grid)} area/brand rows for {imported_grid['area'].nunique()} market areas.")
+        all_market_areas = sorted(list(dict.fromkeys(base_market_areas + custom_market_areas + sorted(st.session_state.demand_grid_areas))))
+        # Areas that appear in the options are selected, areas that disappear are dropped.
+        previous_options = st.session_state.market_area_options
+        added_areas = [area for area in all_market_areas if area not in previous_options]
+        if "selected_market_areas" in st.session_state and (added_areas or set(previous_options) - set(all_market_areas)):
+            st.session_state.selected_market_areas = [area for area in st.session_state.selected_market_areas if area in all_market_areas] + added_areas
+        st.session_state.market_area_options = all_market_areas
+        selected_market_areas = st.multiselect("Select Market Areas to Include", options=all_market_areas, default=all_market_areas, key="selected_market_areas", help="Choose market areas to use.")
+        # New areas are seeded with default demand once; after that the grid owns their rows.
+        new_areas = [area for area in all_market_areas if area not in st.session_state.demand_grid_areas]
+        if new_areas:
+            seeded_skus = BRANDS if len(BRANDS) <= MAX_SEEDED_SKUS else []
+            st.session_state.demand_grid = merge_demand_grids(st.session_state.demand_grid_edited, default_demand_grid(new_areas, seeded_skus))
+            st.session_state.demand_grid_areas.update(new_areas)
+            st.session_state.demand_grid_version += 1
         market_area_data = {}
         if not selected_market_areas:
             st.warning("Please select at least one market area.")
         else:
-            st.markdown("<p class='sub-header-font'>Configure Parameters for Selected Market Areas:</p>", unsafe_allow_html=True)
-            for area in selected_market_areas:
-                 with st.expander(f"Parameters for Market Area: {area}", expanded=False):
-                    active_brands = st.multiselect(f"Select Active Brands for {area}", options=BRANDS, default=BRANDS, key=f"{area}_active_brands")
-                    brand_data = {}
-                    for brand in active_brands:
-                        st.markdown(f"**Brand: {brand}**")
-                        col1, col2, col3 = st.columns(3)
-                        with col1:
-                            avg_order_size = st.number_input(f"Avg Order Size", min_value=0, value=100, step=1, format="%d", key=f"{area}_{brand}_avg_order_size", help=f"Typical order size for {brand} in {area}.")
-                        with col2:
-                            avg_daily_demand = st.number_input(f"Avg Daily Demand", min_value=0, value=50, step=1, format="%d", key=f"{area}_{brand}_avg_daily_demand", help=f"Average daily demand for {brand} in {area}.")
-                        with col3:
-                            std_daily_demand = st.number_input(f"Std Dev Daily Demand", min_value=0.0, value=10.0, step=1.0, key=f"{area}_{brand}_std_daily_demand", help=f"Demand volatility for {brand} in {area}.")
-                        st.markdown(f"**12-Month Forecast Demand ({brand} - {area})**", unsafe_allow_html=True)
-                        forecast = []
-                        forecast_cols = st.columns(6)
-                        months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
-                        for m in range(12):
-                            with forecast_cols[m % 6]:
-                                val = st.number_input(f"{months[m]}", min_value=0, value=500, step=1, format="%d", key=f"{area}_{brand}_forecast_{m}", help=f"Forecast for {brand} in {area} for {months[m]}.")
-                                forecast.append(val)
-                        st.divider()
-                        brand_data[brand] = {
-                            "avg_order_size": avg_order_size,
-                            "avg_daily_demand": avg_daily_demand,
-                            "std_daily_demand": std_daily_demand,
-                            "forecast_demand": forecast
-                        }
-                    market_area_data[area] = brand_data
+            st.markdown("<p class='sub-header-font'>Demand by Market Area and Brand:</p>", unsafe_allow_html=True)
+            st.caption("One row per market area and active SKU; a SKU without a row does not sell in that area. Add or delete rows to change the active SKUs; rows for areas that are not selected are ignored.")
+            grid_brands = list(dict.fromkeys(BRANDS + st.session_state.demand_grid["brand"].dropna().tolist()))
+            demand_grid = st.data_editor(
+                st.session_state.demand_grid,
+                key=f"demand_editor_{st.session_state.demand_grid_version}",
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                column_config={
+                    "area": st.column_config.SelectboxColumn("Market Area", options=all_market_areas, required=True),
+                    "brand": st.column_config.SelectboxColumn("Brand", options=grid_brands, required=True),
+                    "avg_order": st.column_config.NumberColumn("Avg Order Size", min_value=0, step=1, format="%d", default=DEFAULT_DEMAND["avg_order"]),
+                    "avg_daily": st.column_config.NumberColumn("Avg Daily Demand", min_value=0, step=1, format="%d", default=DEFAULT_DEMAND["avg_daily"]),
+                    "std": st.column_config.NumberColumn("Std Dev Daily Demand", min_value=0.0, step=1.0, format="%.1f", default=DEFAULT_DEMAND["std"]),
+                    **{month: st.column_config.NumberColumn(month, min_value=0, step=1, format="%d", default=DEFAULT_DEMAND["forecast"]) for month in MONTHS},
+                },
+            )
+            st.session_state.demand_grid_edited = demand_grid
+            market_area_data = grid_to_market_data(demand_grid, selected_market_areas)
+            unpriced_brands = sorted({brand for brand_data in market_area_data.values() for brand in brand_data} - set(BRANDS))
+            if unpriced_brands:
+                st.warning(f"Not in the SKU catalog: {', '.join(unpriced_brands[:20])}{' ...' if len(unpriced_brands) > 20 else ''}. Their inventory is financed at 0.")
+            st.download_button("Download Demand Table (CSV)", grid_to_demand_table(demand_grid).to_csv(index=False).encode("utf-8"), file_name="demand_table.csv", mime="text/csv", key="demand_download")
+    with st.container(border=True):
+        st.markdown("<p class='sub-header-font'><i class='fas fa-map-marker-alt icon'></i>Location Coordinates</p>", unsafe_allow_html=True)
+        coordinate_file = st.file_uploader("Import Coordinates (CSV, Excel or Parquet)", type=["csv", "xlsx", "xls", "parquet"], key="coordinate_file", help="One row per market area or warehouse location: location, lat, lon. Replaces the table below.")
+        if coordinate_file is not None and coordinate_file.file_id != st.session_state.coordinate_file_id:
+            st.session_state.coordinate_file_id = coordinate_file.file_id
+            try:
+                imported_coordinates = read_coordinates(coordinate_file)
+            except ValueError as e:
+                st.error(f"Could not import coordinates: {e}")
+            else:
+                st.session_state.coordinate_grid = imported_coordinates
+                st.session_state.coordinate_grid_version += 1
+                st.success(f"Imported coordinates of {len(imported_coordinates)} locations.")
+        coordinate_cols = st.columns([3, 1])
+        with coordinate_cols[0]:
+            coordinate_grid = st.data_editor(
+                st.session_state.coordinate_grid,
+                key=f"coordinate_editor_{st.session_state.coordinate_grid_version}",
+                num_rows="dynamic",
+                hide_index=True,
+                use_container_width=True,
+                column_order=COORDINATE_COLUMNS,
+                column_config={
+                    "location": st.column_config.TextColumn("Location", required=True),
+                    "lat": st.column_config.NumberColumn("Latitude", min_value=-90.0, max_value=90.0, format="%.4f"),
+                    "lon": st.column_config.NumberColumn("Longitude", min_value=-180.0, max_value=180.0, format="%.4f"),
+                },
+            )
+        with coordinate_cols[1]:
+            road_factor = st.number_input("Road Factor", min_value=1.0, value=DEFAULT_ROAD_FACTOR, step=0.05, format="%.2f", key="road_factor", help="Road miles per great-circle mile.")
+        coordinates = table_to_coordinates(coordinate_grid)
+        st.caption("Land shipping distances left empty below are road miles between these coordinates; delivery routing also uses them between areas.")
     st.markdown("<p class='section-header-font'><i class='fas fa-industry icon'></i>Warehouse Setup</p>", unsafe_allow_html=True)
     with st.container(border=True):
         base_warehouse_locations = ["FL", "CA_SOUTH", "CA_NORTH", "TX", "NJ"]
@@ -218,13 +345,14 @@ with tab_setup:
         custom_warehouse_locations_str = st.text_input("Enter additional warehouse locations (comma separated)", value="", key="warehouse_locations_text", help="E.g., NY, PA")
         custom_warehouse_locations = [loc.strip().upper() for loc in custom_warehouse_locations_str.split(",") if loc.strip() != ""]
         all_warehouse_locations = sorted(list(dict.fromkeys(base_warehouse_locations + custom_warehouse_locations)))
-        num_warehouses = st.number_input("Number of Warehouses to Configure", min_value=1, value=1, step=1, help="Enter total warehouses in this scenario.")
+        num_warehouses = st.number_input("Number of Warehouses to Configure", min_value=1, value=1, step=1, key="num_warehouses", help="Enter total warehouses in this scenario.")
         warehouse_data = []
         temp_warehouse_configs = {}
         st.markdown("<p class='sub-header-font'>Configure Parameters for Each Warehouse:</p>", unsafe_allow_html=True)
         for i in range(int(num_warehouses)):
              with st.expander(f"Warehouse {i+1} Configuration", expanded=True if num_warehouses <= 2 else False):
-                wh_config = {}
+                # The ID stays with the configuration slot, so FRONT links survive location changes.
+                wh_config = {"id": f"WH{i+1}"}
                 col_loc, col_type = st.columns(2)
                 with col_loc:
                     location = st.selectbox(f"Location (WH {i+1})", options=[""] + all_warehouse_locations, index=0, key=f"wh_location_{i}", help="Choose warehouse location.")
@@ -283,12 +411,16 @@ with tab_setup:
                          other_markets = [m for m in served_markets if m != location]
                          for add_area in other_markets:
                              land_cols = st.columns([2,3])
+                             road_miles = road_distance(coordinates, location, add_area, road_factor)
                              with land_cols[0]:
-                                 distance_val = st.number_input(f"Distance to {add_area} (miles)", min_value=0.0, value=100.0, step=10.0, format="%.1f", key=f"dist_{i}_{add_area}")
+                                 # Empty means road miles from the coordinates; a typed value overrides them.
+                                 distance_val = st.number_input(f"Distance to {add_area} (miles)", min_value=0.0, value=None if road_miles is not None else 100.0, step=10.0, format="%.1f", key=f"dist_{i}_{add_area}",
+                                                                placeholder=f"{road_miles:,.1f} by road" if road_miles is not None else None, help="Leave empty to use the road distance between the coordinates.")
                              with land_cols[1]:
-                                 area_total_demand = sum(market_area_data[add_area][b]["avg_daily_demand"] for b in BRANDS if add_area in market_area_data and market_area_data[add_area][b]["avg_daily_demand"] > 0)
+                                 area_brands = market_area_data.get(add_area, {}).values()
+                                 area_total_demand = sum(b["avg_daily_demand"] for b in area_brands if b["avg_daily_demand"] > 0)
                                  if area_total_demand > 0:
-                                     area_avg_order = sum(market_area_data[add_area][b]["avg_order_size"] * market_area_data[add_area][b]["avg_daily_demand"] for b in BRANDS if add_area in market_area_data) / area_total_demand
+                                     area_avg_order = sum(b["avg_order_size"] * b["avg_daily_demand"] for b in area_brands) / area_total_demand
                                  else:
                                      area_avg_order = 0
                                  cost_val = st.number_input(f"Cost per Avg Order per Mile ({area_avg_order:.0f} units) to {add_area} ($)", min_value=0.0, value=50.0, step=1.0, format="%.2f", key=f"cost_{i}_{add_area}", help=f"Cost to ship an average order one mile to {add_area}.")
@@ -302,13 +434,13 @@ with tab_setup:
                          wh_config["land_shipping_data"] = land_shipping_data
                 elif wh_type == "FRONT":
                      st.markdown(f"<p class='sub-header-font' style='margin-top: 15px; color: #1A5276;'><i class='fas fa-exchange-alt icon'></i>Transfer Shipping (WH {i+1})</p>", unsafe_allow_html=True)
-                     main_wh_options = {f"WH {idx+1} ({w_conf['location']})": w_conf for idx, w_conf in temp_warehouse_configs.items() if w_conf.get("type") == "MAIN"}
+                     main_wh_options = {w_conf["id"]: f"WH {idx+1} ({w_conf['location']})" for idx, w_conf in temp_warehouse_configs.items() if w_conf.get("type") == "MAIN"}
                      if not main_wh_options:
                          st.error("No MAIN warehouse defined for this FRONT warehouse.")
-                         wh_config["serving_central_wh_key"] = None
+                         wh_config["serving_main_id"] = None
                      else:
-                         serving_central_label = st.selectbox(f"Select Serving MAIN Warehouse", options=list(main_wh_options.keys()), key=f"serving_central_{i}", help="Choose the MAIN warehouse that supplies this FRONT warehouse.")
-                         wh_config["serving_central_wh_key"] = serving_central_label
+                         serving_main_id = st.selectbox(f"Select Serving MAIN Warehouse", options=list(main_wh_options.keys()), format_func=main_wh_options.get, key=f"serving_central_{i}", help="Choose the MAIN warehouse that supplies this FRONT warehouse.")
+                         wh_config["serving_main_id"] = serving_main_id
                      front_ship_col1, front_ship_col2 = st.columns(2)
                      with front_ship_col1:
                          front_shipping_cost_40 = st.number_input("Cost (per 40ft Truckload, $)", min_value=0.0, value=500.0, step=1.0, format="%.0f", key=f"front_shipping_cost_40_{i}", help="Cost for a 40ft truckload.")
@@ -318,22 +450,19 @@ with tab_setup:
                      wh_config["front_shipping_cost_53"] = front_shipping_cost_53
                 temp_warehouse_configs[i] = wh_config
         warehouse_data = list(temp_warehouse_configs.values())
+        lap(rerun_profile, "setup_widgets")
+        count(rerun_profile, "warehouses", len(warehouse_data))
+        count(rerun_profile, "market_areas", len(market_area_data))
+        count(rerun_profile, "demand_rows", len(st.session_state.demand_grid_edited))
         # Validate served markets consistency between FRONT and its serving MAIN warehouse
-        for i, wh in enumerate(warehouse_data):
-            if wh.get("type") == "FRONT":
-                serving_main_label = wh.get("serving_central_wh_key")
-                if serving_main_label:
-                    main_wh = None
-                    for candidate in warehouse_data:
-                        candidate_label = f"WH {warehouse_data.index(candidate)+1} ({candidate.get('location')})"
-                        if candidate_label == serving_main_label:
-                            main_wh = candidate
-                            break
-                    if main_wh:
-                        front_markets = set(wh.get("served_markets", []))
-                        main_markets = set(main_wh.get("served_markets", []))
-                        if not front_markets.issubset(main_markets):
-                            st.error(f"Validation Error: FRONT Warehouse {i+1} ({wh.get('location')}) serves markets {front_markets} but its serving MAIN warehouse ({main_wh.get('location')}) serves {main_markets}. Please update the MAIN warehouse's served markets.")
+        network_index = build_network_index(warehouse_data)
+        for i, m in network_index["main_of"].items():
+            wh = warehouse_data[i]
+            main_wh = warehouse_data[m]
+            front_markets = set(wh.get("served_markets", []))
+            main_markets = set(main_wh.get("served_markets", []))
+            if not front_markets.issubset(main_markets):
+                st.error(f"Validation Error: FRONT Warehouse {i+1} ({wh.get('location')}) serves markets {front_markets} but its serving MAIN warehouse ({main_wh.get('location')}) serves {main_markets}. Please update the MAIN warehouse's served markets.")
         all_markets_served = set()
         config_complete = True
         final_warehouse_list_for_calc = []
@@ -347,7 +476,7 @@ with tab_setup:
             if not wh.get("served_markets"):
                 st.error(f"Served markets missing for Warehouse {i+1} ({wh.get('location', 'N/A')}).")
                 config_complete = False
-            if wh.get("type") == "FRONT" and not wh.get("serving_central_wh_key"):
+            if i in network_index["unresolved"]:
                  st.error(f"Serving MAIN warehouse not selected for FRONT Warehouse {i+1} ({wh.get('location', 'N/A')}).")
                  config_complete = False
             all_markets_served.update(wh.get("served_markets", []))
@@ -362,457 +491,585 @@ with tab_setup:
         else:
             st.warning("Please review errors in warehouse configuration.")
             warehouse_data = []
+        lap(rerun_profile, "validation")
     # --- UI Enhancement End ---
 
 # =====================================================
-# Helper Functions (Used in Calculations)
+# Scenario Parameters (Passed to the Cost Engine)
 # =====================================================
-def compute_annual_forecast_for_area(area, market_data):
-    total = 0
-    if area in market_data:
-        for brand, params in market_data[area].items():
-            total += sum(params.get("forecast_demand", [0]))
-    return total
-
-def compute_max_monthly_forecast_for_area(area, market_data):
-    max_m = 0
-    if area in market_data:
-        for m in range(12):
-            month_sum = sum(params.get("forecast_demand", [0])[m] for params in market_data[area].values())
-            max_m = max(max_m, month_sum)
-    return max_m
-
-def compute_std_sum_for_area(area, market_data):
-    total_std = 0
-    if area in market_data:
-        for params in market_data[area].values():
-            total_std += params.get("std_daily_demand", 0)
-    return total_std
-
-def compute_daily_demand_sum_for_area(area, market_data):
-    total = 0
-    if area in market_data:
-        for params in market_data[area].values():
-            total += params.get("avg_daily_demand", 0)
-    return total
-
-def compute_max_monthly_forecast(warehouse, market_data):
-    max_monthly = 0
-    for area in warehouse.get("served_markets", []):
-        area_max = compute_max_monthly_forecast_for_area(area, market_data)
-        max_monthly = max(max_monthly, area_max)
-    return max_monthly
-
-def compute_daily_demand_sum(warehouse, market_data):
-    total = 0
-    for area in warehouse.get("served_markets", []):
-        total += compute_daily_demand_sum_for_area(area, market_data)
-    return total
-
-def compute_annual_demand(warehouse, market_data):
-    total = 0
-    for area in warehouse.get("served_markets", []):
-        total += compute_annual_forecast_for_area(area, market_data)
-    return total
-
-def compute_std_sum(warehouse, market_data):
-    total = 0
-    for area in warehouse.get("served_markets", []):
-        total += compute_std_sum_for_area(area, market_data)
-    return total
-
-def compute_safety_stock_main(warehouse, market_data, Z_val, layout, all_warehouses):
-    std_sum = compute_std_sum(warehouse, market_data)
-    LT = warehouse.get("lt_shipping", 0)
-    safety_stock_main = std_sum * sqrt(LT) * Z_val if LT > 0 else 0
-    if layout == "Central and Fronts":
-        try:
-            warehouse_index = all_warehouses.index(warehouse)
-            serving_label = f"WH {warehouse_index+1} ({warehouse.get('location')})"
-            front_daily_demand = sum(
-                compute_daily_demand_sum(front_wh, market_data)
-                for front_wh in all_warehouses
-                if front_wh.get("type") == "FRONT" and front_wh.get("serving_central_wh_key") == serving_label
-            )
-            transfer_lead_time = 12
-            safety_stock_main += transfer_lead_time * front_daily_demand
-        except ValueError:
-            st.error("Internal error: MAIN warehouse not found during safety stock calculation.")
-    return safety_stock_main
-
-def compute_inventory_breakdown(warehouse, market_data, interest_rt, brand_prices, Z_val, layout, all_warehouses):
-    LT = warehouse.get("lt_shipping", 0)
-    breakdown = {brand: {"annual_forecast": 0, "std_sum": 0, "avg_daily_demand": 0} for brand in BRANDS}
-    for area in warehouse.get("served_markets", []):
-        if area in market_data:
-            for brand, params in market_data[area].items():
-                breakdown[brand]["annual_forecast"] += sum(params.get("forecast_demand", [0]))
-                breakdown[brand]["std_sum"] += params.get("std_daily_demand", 0)
-                breakdown[brand]["avg_daily_demand"] += params.get("avg_daily_demand", 0)
-    front_contrib = {brand: 0 for brand in BRANDS}
-    if layout == "Central and Fronts":
-        try:
-            warehouse_index = all_warehouses.index(warehouse)
-            serving_label = f"WH {warehouse_index+1} ({warehouse.get('location')})"
-            for front_wh in all_warehouses:
-                if front_wh.get("type") == "FRONT" and front_wh.get("serving_central_wh_key") == serving_label:
-                    for area in front_wh.get("served_markets", []):
-                        if area in market_data:
-                            for brand, params in market_data[area].items():
-                                front_contrib[brand] += params.get("avg_daily_demand", 0)
-        except ValueError:
-            st.error("Internal error during inventory breakdown calculation.")
-    for brand in BRANDS:
-        breakdown[brand]["front_contrib"] = 12 * front_contrib[brand] if layout == "Central and Fronts" else 0
-    results = {}
-    for brand in BRANDS:
-        safety_stock = breakdown[brand]["std_sum"] * sqrt(LT) * Z_val + breakdown[brand]["front_contrib"]
-        avg_inventory = (breakdown[brand]["annual_forecast"] / 12.0) + safety_stock
-        unit_price = brand_prices.get(brand, 0)
-        financing_cost = avg_inventory * 1.08 * (interest_rt / 100.0) * unit_price
-        results[brand] = {
-            "annual_forecast": breakdown[brand]["annual_forecast"],
-            "safety_stock": safety_stock,
-            "avg_inventory": avg_inventory,
-            "financing_cost": financing_cost
-        }
-    return results
+scenario_params = {
+    "interest_rate": interest_rate,
+    "service_level": service_level,
+    "layout_type": layout_type,
+    "container_capacity_40": container_capacity_40,
+    "shipment_planning": shipment_planning,
+    "shipments_per_year": shipments_per_year,
+    "land_routing": land_routing,
+    "deliveries_per_year": deliveries_per_year,
+    "route_truck_capacity": route_truck_capacity,
+    "coordinates": coordinates,
+    "road_factor": road_factor,
+    "brand_unit_prices": brand_unit_prices,
+    "sq_ft_per_unit": sq_ft_per_unit,
+    "brand_sq_ft": brand_sq_ft,
+    "overhead_factor_main": overhead_factor_main,
+    "overhead_factor_front": overhead_factor_front,
+    "demand_correlation": demand_correlation,
+    "area_correlations": st.session_state.area_correlations,
+}
+
+# Fingerprint of every component's current inputs; results stored under a
+# different fingerprint were calculated from an older configuration.
+current_fingerprints = compute_fingerprints(warehouse_data, market_area_data, scenario_params) if warehouse_data else {}
+lap(rerun_profile, "fingerprints")
+
+# Hash of the whole configuration, the key of its results in the shared
+# cache; computed at most once per run, when a result is looked up.
+scenario_digests = {}
+
+def scenario_digest():
+    if "config" not in scenario_digests:
+        scenario_digests["config"] = config_hash(market_area_data, warehouse_data, scenario_params)
+    return scenario_digests["config"]
+
+# Results returned by cached_run in this script run. A tool shows them from
+# here, since the shared cache may evict them at any time (or, if they are
+# larger than its budget, never store them).
+run_results = {}
+
+def stored_result(kind):
+    """This session's ``kind`` of result; None if it was never computed or has since been evicted from the shared cache."""
+    if kind in run_results:
+        return run_results[kind]
+    key = st.session_state.result_keys.get(kind)
+    return None if key is None else cache_get(result_cache, key, count=False)
+
+DROPPED_RESULT_MESSAGE = "These results were dropped from the shared result cache to free memory. Run the calculation again to see them."
+
+def show_missing_result(kind, message):
+    if kind in st.session_state.result_keys:
+        st.info(DROPPED_RESULT_MESSAGE)
+    else:
+        st.info(message)
+
+def show_dropped_results(stored):
+    """Notes components of ``stored`` (component -> entry) that were calculated but have been evicted since."""
+    if any(entry is None and component in st.session_state.result_keys for component, entry in stored.items()):
+        st.info(DROPPED_RESULT_MESSAGE)
+
+def cached_run(kind, compute, **settings):
+    """
+    The ``kind`` of result for the configuration on screen and ``settings``:
+    taken from the shared cache when any session computed it already, else
+    computed and cached. Returns it and whether it came from the cache.
+    """
+    key = result_key(kind, scenario_digest(), **settings)
+    result = cache_get(result_cache, key)
+    cached = result is not None
+    if not cached:
+        result = cache_put(result_cache, key, compute())
+    st.session_state.result_keys[kind] = key
+    run_results[kind] = result
+    return result, cached
+
+def is_stale(component):
+    return st.session_state.result_fingerprints.get(component) != current_fingerprints.get(component)
+
+def show_stale_warning(component, button_label):
+    if is_stale(component):
+        st.warning(f"Inputs changed since these results were calculated. Click '{button_label}' to update them.")
+
+# Results are stored as the engine's typed rows (one DataFrame per component,
+# keyed by "warehouse_id"); labels and number formats are only applied
+# when a table is displayed or exported.
+RESULT_COLUMNS = {
+    "rental": {
+        "warehouse": "Warehouse",
+        "type": "Type",
+        "pricing_method": "Pricing Method",
+        "sq_ft": "Est. Sq Ft",
+        "annual_rent": "Annual Rent ($)",
+    },
+    "shipping": {
+        "warehouse": "Warehouse",
+        "type": "Type",
+        "annual_demand": "Forcast Annual Demand (Units)",
+        "shipment": "Est. Shipments",
+        "annual_shipping_cost": "Annual Shipping Cost ($)",
+    },
+    "inventory": {
+        "warehouse": "Warehouse",
+        "brand": "Brand",
+        "safety_stock": "Safety Stock (Units)",
+        "avg_inventory": "Avg Inventory (Units)",
+        "financing_cost": "Annual Financing Cost ($)",
+    },
+    "labor": {
+        "warehouse": "Warehouse",
+        "type": "Type",
+        "num_employees": "# Employees",
+        "avg_salary": "Avg Salary ($)",
+        "annual_labor_cost": "Annual Labor Cost ($)",
+    },
+}
+
+RESULT_FORMATS = {
+    "rental": {"Est. Sq Ft": "{:.0f}", "Annual Rent ($)": "{:.0f}"},
+    "shipping": {"Forcast Annual Demand (Units)": "{:,.0f}", "Annual Shipping Cost ($)": "{:,.0f}"},
+    "inventory": {"Safety Stock (Units)": "{:.0f}", "Avg Inventory (Units)": "{:.0f}", "Annual Financing Cost ($)": "{:.0f}"},
+    "labor": {"Avg Salary ($)": "{:,.0f}", "Annual Labor Cost ($)": "{:,.0f}"},
+}
+
+# Column holding each warehouse's cost in the component's details.
+RESULT_COST_COLUMN = {
+    "rental": "annual_rent",
+    "inventory": "financing_cost",
+    "shipping": "annual_shipping_cost",
+    "labor": "annual_labor_cost",
+}
+
+def store_result(component, key, result=None):
+    """
+    Makes the result under ``key`` this session's ``component`` result;
+    a new ``result`` is cached first, its details as one DataFrame, and
+    the cached entry is returned (None without ``result``). Use that entry
+    rather than reading it back: the shared cache may evict it at any time.
+    """
+    entry = None
+    if result is not None:
+        entry = {name: value for name, value in result.items() if name not in ("details", "recomputed", "reused")}
+        entry["details_df"] = pd.DataFrame(result["details"])
+        cache_put(result_cache, key, entry)
+    st.session_state.result_keys[component] = key
+    st.session_state.result_fingerprints[component] = current_fingerprints[component]
+    return entry
+
+def drop_result(kind):
+    st.session_state.result_keys.pop(kind, None)
+    run_results.pop(kind, None)
+
+def describe_shipment(row):
+    if pd.notna(row["num_containers"]):
+        mix = [f"{int(row[col])} x {col[len('containers_'):]}" for col in row if col.startswith("containers_") and row[col] > 0]
+        shipment_type = (" + ".join(reversed(mix)) if mix else f"{int(row['num_containers'])} x 40HC") + " Int'l"
+        if pd.notna(row.get("route_trips")):
+            shipment_type += f" + {row['route_trips']:,.0f} Routed Trips ({row['regional_land_cost']:,.0f}$ vs {row['regional_land_estimate']:,.0f}$ per order)"
+        elif pd.notna(row["regional_land_cost"]):
+            shipment_type += f" + Regional ({row['regional_land_cost']:,.0f}$)"
+        return shipment_type
+    if row["type"] == "FRONT" and layout_type == "Central and Fronts":
+        return "Calculated via avg. & normalization"
+    return "N/A"
+
+def result_table(component, result):
+    """Details of the ``component`` result entry ``result`` with display column names; values stay numeric."""
+    details = pd.DataFrame() if result is None else result["details_df"]
+    columns = RESULT_COLUMNS[component]
+    if details.empty:
+        return pd.DataFrame(columns=list(columns.values()))
+    if component == "shipping":
+        details = details.assign(shipment=[describe_shipment(row) for row in details.to_dict("records")])
+    return details[list(columns)].rename(columns=columns)
+
+def current_scenario(name, stored):
+    """The configuration on screen with the result entries ``stored`` (component -> entry), in the shape the export expects."""
+    result = {component: {"total": entry["total"], "details": entry["details_df"].to_dict("records")} for component, entry in stored.items()}
+    result["inventory"]["total_avg_inventory"] = stored["inventory"]["total_avg_inventory"]
+    result["inventory"]["total_safety_stock"] = stored["inventory"]["total_safety_stock"]
+    result["grand_total"] = sum(entry["total"] for entry in stored.values())
+    return {"name": name, "market_area_data": market_area_data, "warehouse_data": warehouse_data, "params": scenario_params, "result": result}
+
+def show_result_table(component, result):
+    with timed(rerun_profile, "tables"):
+        st.dataframe(result_table(component, result).style.format(RESULT_FORMATS[component]), use_container_width=True, hide_index=True)
+    count(rerun_profile, "tables")
+
+def show_chart(fig):
+    with timed(rerun_profile, "charts"):
+        st.plotly_chart(fig, use_container_width=True)
+    count(rerun_profile, "charts")
+
+# Calculations (button callbacks) and downloads (generated on click) run
+# outside the timed script run; their timings go to this session's event
+# list and the log instead.
+event_timings = st.session_state.event_timings
+event_log_enabled = st.session_state.get("diagnostics_log", False)
+
+def log_event(record):
+    event_timings.append(record)
+    del event_timings[:-20]
+    if event_log_enabled:
+        append_log(record, DIAGNOSTICS_LOG_PATH)
+
+def timed_export(scenarios, fmt="xlsx"):
+    start = time.perf_counter()
+    data = export_to_bytes(scenarios, fmt)
+    log_event({"event": "export", "format": fmt, "seconds": time.perf_counter() - start, "bytes": len(data)})
+    return data
+
+def summarize_per_warehouse(warehouse_data, stored):
+    """Per-warehouse cost of every component in the result entries ``stored`` and the total, as numbers."""
+    details = {component: stored[component]["details_df"] for component in RESULT_COST_COLUMN}
+    frames = [
+        details[component][["warehouse_id", column]].rename(columns={column: "cost"}).assign(component=component)
+        for component, column in RESULT_COST_COLUMN.items()
+        if not details[component].empty
+    ]
+    costs = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"warehouse_id": [], "component": [], "cost": []})
+    per_warehouse = costs.groupby(["warehouse_id", "component"])["cost"].sum().unstack("component")
+    per_warehouse = per_warehouse.reindex(columns=list(RESULT_COST_COLUMN), fill_value=0.0)
+    warehouses = pd.DataFrame({
+        "warehouse_id": [warehouse_id(i, wh) for i, wh in enumerate(warehouse_data)],
+        "Warehouse": [f"WH {i+1} ({wh.get('location', 'N/A')})" for i, wh in enumerate(warehouse_data)],
+        "Type": [wh.get("type", "N/A") for wh in warehouse_data],
+    })
+    summary = warehouses.merge(per_warehouse, left_on="warehouse_id", right_index=True, how="left").fillna(0.0)
+    summary = summary.rename(columns={"rental": "Rental ($)", "inventory": "Inventory ($)", "shipping": "Shipping ($)", "labor": "Labor ($)"})
+    summary["Total ($)"] = summary[["Rental ($)", "Inventory ($)", "Shipping ($)", "Labor ($)"]].sum(axis=1)
+    return summary.drop(columns="warehouse_id")
+
+# =====================================================
+# Saved Scenarios (SQLite)
+# =====================================================
+def restore_scenario(name):
+    """
+    Loads a saved scenario into the input widgets. Runs as a button callback,
+    i.e. before the widgets of the next run exist, so their keys may be set.
+    """
+    with closing(open_store()) as store:
+        scenario = load_scenario(store, name)
+    if scenario is None:
+        return
+    state = st.session_state
+    params = scenario["params"]
+    state.interest_rate = params["interest_rate"]
+    state.service_level = params["service_level"]
+    state.demand_correlation = params.get("demand_correlation", 1.0)
+    state.area_correlations = params.get("area_correlations", {})
+    state.layout_type_radio = params["layout_type"]
+    state.container_capacity_40 = params["container_capacity_40"]
+    state.shipment_planning = params.get("shipment_planning", False)
+    state.shipments_per_year = params.get("shipments_per_year", 6)
+    state.land_routing = params.get("land_routing", False)
+    state.deliveries_per_year = params.get("deliveries_per_year", 52)
+    state.route_truck_capacity = params.get("route_truck_capacity") or params["container_capacity_40"]
+    state.coordinate_grid = coordinates_to_table(params.get("coordinates", {}))
+    state.coordinate_grid_version += 1
+    state.road_factor = params.get("road_factor", DEFAULT_ROAD_FACTOR)
+    state.catalog_grid = params_to_catalog(params)
+    state.catalog_grid_version += 1
+    state.sq_ft_per_unit = params["sq_ft_per_unit"]
+    state.overhead_factor_main = params["overhead_factor_main"]
+    state.overhead_factor_front = params["overhead_factor_front"]
+
+    areas = list(scenario["market_area_data"])
+    custom_areas = [area for area in areas if area not in base_market_areas]
+    state.market_areas_text = ", ".join(custom_areas)
+    state.market_area_options = sorted(dict.fromkeys(base_market_areas + custom_areas))
+    state.selected_market_areas = areas
+    state.demand_grid = market_data_to_grid(scenario["market_area_data"])
+    state.demand_grid_edited = state.demand_grid
+    state.demand_grid_areas = set(areas)
+    state.demand_grid_version += 1
+
+    warehouses = scenario["warehouse_data"]
+    state.warehouse_locations_text = ", ".join(sorted({wh["location"] for wh in warehouses} - set(base_warehouse_locations)))
+    state.num_warehouses = len(warehouses)
+    for i, wh in enumerate(warehouses):
+        state[f"wh_location_{i}"] = wh["location"]
+        if params["layout_type"] == "Central and Fronts":
+            state[f"wh_type_{i}"] = wh["type"]
+        state[f"wh_markets_{i}"] = wh["served_markets"]
+        state[f"rent_method_{i}"] = wh["rent_pricing_method"]
+        state[f"fixed_rent_{i}" if wh["rent_pricing_method"] == "Fixed Rent Price" else f"sqft_rent_{i}"] = wh["rent_price"]
+        state[f"employee_salary_{i}"] = wh["avg_employee_salary"]
+        state[f"num_employees_{i}"] = wh["num_employees"]
+        if wh["type"] == "MAIN":
+            state[f"lt_shipping_{i}"] = wh["lt_shipping"]
+            state[f"shipping_cost_40hc_{i}"] = wh["shipping_cost_40hc"]
+            for area, land in wh.get("land_shipping_data", {}).items():
+                state[f"dist_{i}_{area}"] = land["distance"]
+                state[f"cost_{i}_{area}"] = land["cost_for_avg_order"]
+        elif wh["type"] == "FRONT":
+            state[f"serving_central_{i}"] = wh["serving_main_id"]
+            state[f"front_shipping_cost_40_{i}"] = wh["front_shipping_cost_40"]
+            state[f"front_shipping_cost_{i}_53"] = wh["front_shipping_cost_53"]
+    state.loaded_scenario = scenario
+
+# Saved results are taken over once the restored widgets reproduce the saved
+# configuration exactly, so they are never shown for different inputs.
+if st.session_state.loaded_scenario is not None:
+    loaded = st.session_state.loaded_scenario
+    st.session_state.loaded_scenario = None
+    if loaded["result"] and warehouse_data and scenario_digest() == loaded["config_hash"]:
+        for component in COMPONENTS:
+            store_result(component, result_key(component, loaded["config_hash"]), loaded["result"][component])
+        st.toast(f"Loaded scenario '{loaded['name']}' with its saved results.")
+    else:
+        st.toast(f"Loaded scenario '{loaded['name']}'. Run the calculations to price it.")
+
+with st.sidebar:
+    st.divider()
+    st.markdown("### <i class='fas fa-save icon'></i> Saved Scenarios", unsafe_allow_html=True)
+    scenario_name = st.text_input("Scenario Name", key="scenario_name", help="Saving under an existing name replaces that scenario.")
+    if st.button("Save Scenario", key="save_scenario", use_container_width=True):
+        if not warehouse_data:
+            st.error("Complete the warehouse configuration before saving.")
+        elif not scenario_name.strip():
+            st.error("Enter a name for the scenario.")
+        else:
+            # Results are saved along only when all four are current.
+            stored = {component: stored_result(component) for component in COMPONENTS}
+            results_current = all(stored[component] is not None and not is_stale(component) for component in COMPONENTS)
+            with closing(open_store()) as store:
+                save_scenario(store, scenario_name, market_area_data, warehouse_data, scenario_params,
+                              current_scenario(scenario_name, stored)["result"] if results_current else None)
+            st.success(f"Saved '{scenario_name.strip()}'" + (" with its results." if results_current else " (without results)."))
+    with closing(open_store()) as store:
+        saved_scenarios = list_scenarios(store)
+    if saved_scenarios:
+        saved_totals = {row["name"]: row["grand_total"] for row in saved_scenarios}
+        selected_saved = st.selectbox(
+            "Saved Scenario",
+            options=list(saved_totals),
+            format_func=lambda name: name if saved_totals[name] is None else f"{name} (${saved_totals[name]:,.0f})",
+            key="saved_scenario",
+        )
+        col_load, col_delete = st.columns(2)
+        with col_load:
+            st.button("Load", key="load_scenario", on_click=restore_scenario, args=(selected_saved,), use_container_width=True)
+        with col_delete:
+            if st.button("Delete", key="delete_scenario", use_container_width=True):
+                with closing(open_store()) as store:
+                    delete_scenario(store, selected_saved)
+                st.rerun()
+
+lap(rerun_profile, "saved_scenarios")
 
 # =====================================================
 # TAB 2: Calculations – Rental, Inventory, Shipping & Labor
 # =====================================================
+# The calculation panels, the export and the summary are fragments. A
+# calculate button prices its component in a callback and reruns only the
+# fragments that show the result; the Setup tab is not re-executed, and the
+# model assembled from it in the last full run (market_area_data,
+# warehouse_data, scenario_params, current_fingerprints) is reused as is.
+CALC_VIEWS = {"rental": "rental_view", "shipping": "shipping_view", "inventory": "inventory_view", "labor": "labor_view"}
+RESULT_VIEWS = ["export_view", "summary_view"]
+CALC_TITLES = {"rental": "Rental Costs", "shipping": "Shipping Costs", "inventory": "Inventory Financing Costs", "labor": "Labor Costs"}
+
+def run_calculation(component):
+    start = time.perf_counter()
+    key = result_key(component, scenario_digest())
+    try:
+        entry = cache_get(result_cache, key)
+        result = None if entry is not None else recalculate_component(component, warehouse_data, market_area_data, scenario_params, result_cache)
+    except CostInputError as e:
+        st.session_state.calc_messages[component] = [("error", str(e))]
+        drop_result(component)
+    else:
+        entry = store_result(component, key, result) or entry
+        summary = "taken from the shared result cache" if result is None else f"{result['recomputed']} recomputed, {result['reused']} reused from cache"
+        st.session_state.calc_messages[component] = [("warning", msg) for msg in entry.get("warnings", [])] + [
+            ("success", f"{CALC_TITLES[component]} Calculated! ({summary})")
+        ]
+    log_event({"event": "calculate", "component": component, "seconds": time.perf_counter() - start})
+    st.rerun([CALC_VIEWS[component]] + RESULT_VIEWS)
+
+def run_all_calculations():
+    start = time.perf_counter()
+    keys = {component: result_key(component, scenario_digest()) for component in COMPONENTS}
+    entries = {component: cache_get(result_cache, keys[component]) for component in COMPONENTS}
+    missing = [component for component in COMPONENTS if entries[component] is None]
+    pipeline = {"results": {}, "errors": {}}
+    if missing:
+        pipeline = recalculate_all(warehouse_data, market_area_data, scenario_params, result_cache, components=missing)
+    messages = [("error", message) for message in pipeline["errors"].values()]
+    for component in pipeline["errors"]:
+        drop_result(component)
+    for component in COMPONENTS:
+        if component not in pipeline["errors"]:
+            entries[component] = store_result(component, keys[component], pipeline["results"].get(component)) or entries[component]
+    if "shipping" not in pipeline["errors"]:
+        messages += [("warning", msg) for msg in entries["shipping"].get("warnings", [])]
+    elapsed = time.perf_counter() - start
+    if not pipeline["errors"]:
+        recomputed = sum(result["recomputed"] for result in pipeline["results"].values())
+        shared = len(COMPONENTS) - len(missing)
+        messages.append(("success", f"All cost components calculated in {elapsed * 1000:.1f} ms ({recomputed} rows recomputed, {shared} components from the shared result cache)."))
+    st.session_state.calc_messages["all"] = messages
+    log_event({"event": "calculate", "component": "all", "seconds": elapsed})
+    st.rerun(["calc_all_view"] + list(CALC_VIEWS.values()) + RESULT_VIEWS)
+
+def show_calc_messages(key):
+    """Shows the messages of the last calculation of ``key`` once."""
+    for level, message in st.session_state.calc_messages.pop(key, []):
+        getattr(st, level)(message)
+
+@st.fragment(key="calc_all_view")
+def calc_all_view():
+    st.button("Calculate All", key="calc_all", type="primary", use_container_width=True, on_click=run_all_calculations)
+    show_calc_messages("all")
+
+@st.fragment(key="rental_view")
+def rental_view():
+    st.markdown("<p class='sub-header-font'><i class='fas fa-building icon'></i>Rental Costs</p>", unsafe_allow_html=True)
+    st.button("Calculate Rental Costs", key="calc_rental", type="primary", on_click=run_calculation, args=("rental",))
+    show_calc_messages("rental")
+    rental = stored_result("rental")
+    if rental is not None:
+        show_stale_warning("rental", "Calculate Rental Costs")
+        st.metric("Total Annual Rental Cost", f"${rental['total']:,.0f}")
+        show_result_table("rental", rental)
+    else:
+        show_missing_result("rental", "Rental cost results will appear here after calculation.")
+
+@st.fragment(key="shipping_view")
+def shipping_view():
+    st.markdown("<p class='sub-header-font'><i class='fas fa-truck-loading icon'></i>Shipping Costs</p>", unsafe_allow_html=True)
+    st.button("Calculate Shipping Costs", key="calc_shipping", type="primary", on_click=run_calculation, args=("shipping",))
+    show_calc_messages("shipping")
+    shipping = stored_result("shipping")
+    if shipping is not None:
+        show_stale_warning("shipping", "Calculate Shipping Costs")
+        st.metric("Total Annual Shipping Cost", f"${shipping['total']:,.0f}")
+        show_result_table("shipping", shipping)
+    else:
+        show_missing_result("shipping", "Shipping cost results will appear here after calculation.")
+
+@st.fragment(key="inventory_view")
+def inventory_view():
+    st.markdown("<p class='sub-header-font'><i class='fas fa-coins icon'></i>Inventory Financing Costs</p>", unsafe_allow_html=True)
+    st.button("Calculate Inventory Financing", key="calc_inventory", type="primary", on_click=run_calculation, args=("inventory",))
+    show_calc_messages("inventory")
+    inventory = stored_result("inventory")
+    if inventory is not None:
+        show_stale_warning("inventory", "Calculate Inventory Financing")
+        col_inv1, col_inv2, col_inv3 = st.columns(3)
+        with col_inv1:
+            st.metric("Total Annual Financing Cost", f"${inventory['total']:,.0f}")
+        with col_inv2:
+            st.metric("Total Avg Inventory", f"{inventory['total_avg_inventory']:,.0f} Units")
+        with col_inv3:
+            st.metric("Total Safety Stock", f"{inventory['total_safety_stock']:,.0f} Units")
+        show_result_table("inventory", inventory)
+        if not inventory["details_df"].empty:
+            brand_costs = result_table("inventory", inventory).groupby('Brand')['Annual Financing Cost ($)'].sum()
+            top_note = f" (Top {MAX_CHART_SKUS} of {len(brand_costs)})" if len(brand_costs) > MAX_CHART_SKUS else ""
+            brand_costs = brand_costs.nlargest(MAX_CHART_SKUS).reset_index()
+            fig_inv = px.bar(brand_costs, x='Brand', y='Annual Financing Cost ($)',
+                             title=f"Annual Inventory Financing Cost by Brand{top_note}",
+                             text_auto='.2s',
+                             labels={'Annual Financing Cost ($)': 'Annual Financing Cost ($)'})
+            fig_inv.update_layout(yaxis_title="Annual Financing Cost ($)", xaxis_title="Brand", title_x=0.5)
+            fig_inv.update_traces(textposition='outside')
+            show_chart(fig_inv)
+    else:
+        show_missing_result("inventory", "Inventory financing results will appear here after calculation.")
+
+@st.fragment(key="labor_view")
+def labor_view():
+    st.markdown("<p class='sub-header-font'><i class='fas fa-users icon'></i>Labor Costs</p>", unsafe_allow_html=True)
+    st.button("Calculate Labor Costs", key="calc_labor", type="primary", on_click=run_calculation, args=("labor",))
+    show_calc_messages("labor")
+    labor = stored_result("labor")
+    if labor is not None:
+        show_stale_warning("labor", "Calculate Labor Costs")
+        st.metric("Total Annual Labor Cost", f"${labor['total']:,.0f}")
+        show_result_table("labor", labor)
+    else:
+        show_missing_result("labor", "Labor cost results will appear here after calculation.")
+
+@st.fragment(key="export_view")
+def export_view():
+    stored = {component: stored_result(component) for component in COMPONENTS}
+    if all(entry is not None for entry in stored.values()):
+        export_col1, export_col2 = st.columns([1, 3])
+        with export_col1:
+            export_format = st.selectbox("Export Format", options=list(EXPORT_FORMATS), format_func=lambda fmt: {"xlsx": "Excel", "csv": "CSV (zip)", "parquet": "Parquet (zip)"}[fmt], key="export_format")
+        with export_col2:
+            st.download_button(
+                label="Download Results and Inputs",
+                data=lambda: timed_export([current_scenario("Current Scenario", stored)], export_format),
+                file_name=f"scenario_results{EXPORT_FORMATS[export_format][1]}",
+                mime=EXPORT_FORMATS[export_format][0],
+                key="export_results",
+                help="Cost details as numeric columns plus the parameters, demand and warehouse configuration they were calculated from."
+            )
+    else:
+        show_dropped_results(stored)
+        st.warning("Please calculate all cost components (Rental, Inventory, Shipping, and Labor) before downloading.")
+
 with tab_calculations:
     st.markdown("<p class='section-header-font'><i class='fas fa-cogs icon'></i>Calculate Network Costs</p>", unsafe_allow_html=True)
-    st.info("Click the buttons below to calculate each cost component based on the setup data.")
+    st.info("Click 'Calculate All' to compute every cost component in one pass, or use the buttons below to calculate each component individually.")
     if not warehouse_data:
          st.error("Cannot perform calculations. Please complete the warehouse setup and resolve any errors.")
     else:
+        calc_all_view()
         calc_col1, calc_col2 = st.columns(2)
         with calc_col1:
              with st.container(border=True):
-                 st.markdown("<p class='sub-header-font'><i class='fas fa-building icon'></i>Rental Costs</p>", unsafe_allow_html=True)
-                 if st.button("Calculate Rental Costs", key="calc_rental", type="primary"):
-                     with st.spinner("Calculating Rental Costs..."):
-                        time.sleep(0.5)
-                        rental_details = []
-                        total_rental_cost = 0.0
-                        valid_input = True
-                        for i, wh in enumerate(warehouse_data):
-                            rent_method = wh["rent_pricing_method"]
-                            rent_price = wh["rent_price"]
-                            wh_type = wh["type"]
-                            overhead = overhead_factor_main if wh_type == "MAIN" else overhead_factor_front
-                            max_monthly = compute_max_monthly_forecast(wh, market_area_data)
-                            if wh_type == "MAIN":
-                                safety_stock_main = compute_safety_stock_main(wh, market_area_data, Z_value, layout_type, warehouse_data)
-                                calculated_units = max_monthly + safety_stock_main
-                            else:
-                                daily_sum = compute_daily_demand_sum(wh, market_area_data)
-                                calculated_units = (max_monthly / 4.0) + (daily_sum * 12.0)
-                            wh_area = sq_ft_per_unit * overhead * calculated_units
-
-                            # חישוב מחיר לפי שיטה
-                            if rent_method == "Fixed Rent Price":
-                                wh_rental_cost = rent_price
-                            else:
-                                if sq_ft_per_unit <= 0 or rent_price <= 0:
-                                    st.error(f"Invalid rental parameters for Warehouse {i+1}.")
-                                    valid_input = False
-                                    break
-                                wh_rental_cost = rent_price * wh_area                
-                            rental_details.append({
-                                "Warehouse": f"WH {i+1} ({wh.get('location')})",
-                                "Type": wh_type,
-                                "Pricing Method": rent_method,
-                                "Est. Sq Ft": f"{wh_area:.0f}" if isinstance(wh_area, (int, float)) else wh_area,
-                                "Annual Rent ($)": f"{wh_rental_cost:.0f}"
-                            })
-                            total_rental_cost += wh_rental_cost
-                        if valid_input:
-                            st.session_state.total_rental_cost = total_rental_cost
-                            st.session_state.rental_details_df = pd.DataFrame(rental_details)
-                            st.session_state.rental_costs_calculated = True
-                            st.success("Rental Costs Calculated!")
-                        else:
-                            st.session_state.rental_costs_calculated = False
-                 if st.session_state.rental_costs_calculated:
-                     st.metric("Total Annual Rental Cost", f"${st.session_state.total_rental_cost:,.0f}")
-                     st.dataframe(st.session_state.rental_details_df, use_container_width=True, hide_index=True)
-                 else:
-                      st.info("Rental cost results will appear here after calculation.")
+                 rental_view()
              st.divider()
              with st.container(border=True):
-                 st.markdown("<p class='sub-header-font'><i class='fas fa-truck-loading icon'></i>Shipping Costs</p>", unsafe_allow_html=True)
-                 if st.button("Calculate Shipping Costs", key="calc_shipping", type="primary"):
-                     with st.spinner("Calculating Shipping Costs..."):
-                        time.sleep(0.5)
-                        shipping_details = []
-                        total_sea_shipping_cost = 0.0
-                        total_land_shipping_cost = 0.0
-                        valid_input = True
-                        if container_capacity_40 <= 0:
-                             st.error("Container Capacity must be positive.")
-                             valid_input = False
-                        for i, wh in enumerate(warehouse_data):
-                             if not valid_input:
-                                  break
-                             annual_demand_wh = compute_annual_demand(wh, market_area_data)
-                             wh_shipping_cost = 0.0
-                             shipment_type = "N/A"
-                             if wh["type"] == "MAIN":
-                                 cost_per_40hc = wh.get("shipping_cost_40hc", 0)
-                                 if cost_per_40hc <= 0 and annual_demand_wh > 0:
-                                     st.error(f"International Shipping Cost for WH {i+1} must be positive if demand exists.")
-                                     valid_input = False
-                                     break
-                                 num_containers = ceil(annual_demand_wh / container_capacity_40)
-                                 wh_shipping_cost = num_containers * cost_per_40hc
-                                 shipment_type = f"{num_containers} x 40HC Int'l"
-                                 if layout_type == "Main Regionals" and "land_shipping_data" in wh:
-                                     regional_land_cost = 0
-                                     for area, ship_data in wh["land_shipping_data"].items():
-                                         area_annual_demand = compute_annual_forecast_for_area(area, market_area_data)
-                                         area_avg_order_size = ship_data.get("calculated_avg_order_size", 1)
-                                         cost_per_avg_order = ship_data.get("cost_for_avg_order", 0)
-                                         distance_val = ship_data.get("distance", 0)  # Updated to include distance
-                                         if area_avg_order_size > 0 and cost_per_avg_order > 0 and distance_val > 0:
-                                             num_orders = ceil(area_annual_demand / area_avg_order_size)
-                                             regional_land_cost += num_orders * cost_per_avg_order * distance_val
-                                         elif area_annual_demand > 0 and cost_per_avg_order <= 0:
-                                             st.warning(f"Missing regional shipping cost for {area} from {wh['location']}.")
-                                     wh_shipping_cost += regional_land_cost
-                                     shipment_type += f" + Regional ({regional_land_cost:,.0f}$)"
-                             elif wh["type"] == "FRONT" and layout_type == "Central and Fronts":
-                                 warehouse_land_cost = 0.0
-                                 for m in range(12):
-                                     monthly_forecast = 0
-                                     for area in wh.get("served_markets", []):
-                                         monthly_forecast += sum(market_area_data[area][brand]["forecast_demand"][m] for brand in market_area_data[area])
-                                     weekly_demand = monthly_forecast / 4.0
-                                     cost_40_unit = wh.get("front_shipping_cost_40", 0) / container_capacity_40
-                                     cost_53_unit = wh.get("front_shipping_cost_53", 0) / (container_capacity_40 * 1.37)
-                                     avg_cost_unit = (cost_40_unit + cost_53_unit) / 2.0
-                                     normalized_cost = avg_cost_unit / 0.85
-                                     weekly_shipping_cost = weekly_demand * normalized_cost
-                                     warehouse_land_cost += weekly_shipping_cost * 4.0
-                                 wh_shipping_cost = warehouse_land_cost
-                                 shipment_type = "Calculated via avg. & normalization"
-                             shipping_details.append({
-                                "Warehouse": f"WH {i+1} ({wh.get('location')})",
-                                "Type": wh["type"],
-                                "Forcast Annual Demand (Units)": f"{annual_demand_wh:,.0f}",
-                                "Est. Shipments": shipment_type,
-                                "Annual Shipping Cost ($)": f"{wh_shipping_cost:,.0f}"
-                             })
-                             if wh["type"] == "MAIN":
-                                 total_sea_shipping_cost += wh_shipping_cost
-                             else:
-                                 total_land_shipping_cost += wh_shipping_cost
-                        if valid_input:
-                            st.session_state.total_shipping_cost = total_sea_shipping_cost + total_land_shipping_cost
-                            st.session_state.shipping_details_df = pd.DataFrame(shipping_details)
-                            st.session_state.shipping_costs_calculated = True
-                            st.success("Shipping Costs Calculated!")
-                        else:
-                            st.session_state.shipping_costs_calculated = False
-                 if st.session_state.shipping_costs_calculated:
-                     st.metric("Total Annual Shipping Cost", f"${st.session_state.total_shipping_cost:,.0f}")
-                     st.dataframe(st.session_state.shipping_details_df, use_container_width=True, hide_index=True)
-                 else:
-                     st.info("Shipping cost results will appear here after calculation.")
+                 shipping_view()
         with calc_col2:
              with st.container(border=True):
-                 st.markdown("<p class='sub-header-font'><i class='fas fa-coins icon'></i>Inventory Financing Costs</p>", unsafe_allow_html=True)
-                 if st.button("Calculate Inventory Financing", key="calc_inventory", type="primary"):
-                     with st.spinner("Calculating Inventory Financing..."):
-                        time.sleep(0.5)
-                        inventory_details = []
-                        total_inventory_financing_cost = 0.0
-                        total_avg_inventory_units = 0.0
-                        total_safety_stock_units = 0.0
-                        valid_input = True
-                        if interest_rate < 0 or service_level < 0:
-                             st.error("Interest Rate and Service Level must be non-negative.")
-                             valid_input = False
-                        if any(p <= 0 for p in brand_unit_prices.values()):
-                             st.error("All Brand Unit Prices must be positive.")
-                             valid_input = False
-                        if layout_type == "Central and Fronts":
-                            main_wh_list = [wh for wh in warehouse_data if wh["type"] == "MAIN"]
-                            if len(main_wh_list) != 1:
-                                st.error("Exactly one MAIN warehouse must be configured for 'Central and Fronts'.")
-                                valid_input = False
-                            elif valid_input:
-                                main_wh = main_wh_list[0]
-                                breakdown = compute_inventory_breakdown(main_wh, market_area_data, interest_rate, brand_unit_prices, Z_value, layout_type, warehouse_data)
-                                for brand, bdata in breakdown.items():
-                                     inventory_details.append({
-                                        "Warehouse": f"WH {warehouse_data.index(main_wh)+1} ({main_wh.get('location')})",
-                                        "Brand": brand,
-                                        "Safety Stock (Units)": f"{bdata['safety_stock']:.0f}",
-                                        "Avg Inventory (Units)": f"{bdata['avg_inventory']:.0f}",
-                                        "Annual Financing Cost ($)": f"{bdata['financing_cost']:.0f}"
-                                    })
-                                     total_inventory_financing_cost += bdata['financing_cost']
-                                     total_avg_inventory_units += bdata['avg_inventory']
-                                     total_safety_stock_units += bdata['safety_stock']
-                        elif layout_type == "Main Regionals":
-                             for i, wh in enumerate(warehouse_data):
-                                 if wh["type"] == "MAIN" and valid_input:
-                                     breakdown = compute_inventory_breakdown(wh, market_area_data, interest_rate, brand_unit_prices, Z_value, layout_type, warehouse_data)
-                                     for brand, bdata in breakdown.items():
-                                         inventory_details.append({
-                                            "Warehouse": f"WH {i+1} ({wh.get('location')})",
-                                            "Brand": brand,
-                                            "Safety Stock (Units)": f"{bdata['safety_stock']:.0f}",
-                                            "Avg Inventory (Units)": f"{bdata['avg_inventory']:.0f}",
-                                            "Annual Financing Cost ($)": f"{bdata['financing_cost']:.0f}"
-                                        })
-                                         total_inventory_financing_cost += bdata['financing_cost']
-                                         total_avg_inventory_units += bdata['avg_inventory']
-                                         total_safety_stock_units += bdata['safety_stock']
-                        if valid_input:
-                             st.session_state.total_inventory_financing_cost = total_inventory_financing_cost
-                             st.session_state.inventory_details_df = pd.DataFrame(inventory_details)
-                             st.session_state.aggregated_inventory_metrics = {
-                                 "Total Avg Inventory (Units)": total_avg_inventory_units,
-                                 "Total Safety Stock (Units)": total_safety_stock_units
-                             }
-                             st.session_state.inventory_costs_calculated = True
-                             st.success("Inventory Financing Costs Calculated!")
-                        else:
-                             st.session_state.inventory_costs_calculated = False
-                 if st.session_state.inventory_costs_calculated:
-                      col_inv1, col_inv2, col_inv3 = st.columns(3)
-                      with col_inv1:
-                          st.metric("Total Annual Financing Cost", f"${st.session_state.total_inventory_financing_cost:,.0f}")
-                      with col_inv2:
-                          st.metric("Total Avg Inventory", f"{st.session_state.aggregated_inventory_metrics['Total Avg Inventory (Units)']:,.0f} Units")
-                      with col_inv3:
-                          st.metric("Total Safety Stock", f"{st.session_state.aggregated_inventory_metrics['Total Safety Stock (Units)']:,.0f} Units")
-                      st.dataframe(st.session_state.inventory_details_df, use_container_width=True, hide_index=True)
-                      if not st.session_state.inventory_details_df.empty:
-                           df_chart = st.session_state.inventory_details_df.copy()
-                           df_chart['Annual Financing Cost ($)'] = df_chart['Annual Financing Cost ($)'].str.replace('[$,]', '', regex=True).astype(float)
-                           brand_costs = df_chart.groupby('Brand')['Annual Financing Cost ($)'].sum().reset_index()
-                           fig_inv = px.bar(brand_costs, x='Brand', y='Annual Financing Cost ($)',
-                                          title="Annual Inventory Financing Cost by Brand",
-                                          text_auto='.2s',
-                                          labels={'Annual Financing Cost ($)': 'Annual Financing Cost ($)'})
-                           fig_inv.update_layout(yaxis_title="Annual Financing Cost ($)", xaxis_title="Brand", title_x=0.5)
-                           fig_inv.update_traces(textposition='outside')
-                           st.plotly_chart(fig_inv, use_container_width=True)
-                 else:
-                     st.info("Inventory financing results will appear here after calculation.")
+                 inventory_view()
              st.divider()
              with st.container(border=True):
-                st.markdown("<p class='sub-header-font'><i class='fas fa-users icon'></i>Labor Costs</p>", unsafe_allow_html=True)
-                if st.button("Calculate Labor Costs", key="calc_labor", type="primary"):
-                    with st.spinner("Calculating Labor Costs..."):
-                        time.sleep(0.5)
-                        labor_details = []
-                        total_labor_cost = 0.0
-                        valid_input = True
-                        for i, wh in enumerate(warehouse_data):
-                            num_emp = wh.get("num_employees", 0)
-                            salary = wh.get("avg_employee_salary", 0)
-                            if num_emp < 0 or salary < 0:
-                                st.error(f"Employees and salary must be non-negative for Warehouse {i+1}.")
-                                valid_input = False
-                                break
-                            wh_labor_cost = num_emp * salary
-                            labor_details.append({
-                                "Warehouse": f"WH {i+1} ({wh.get('location')})",
-                                "Type": wh["type"],
-                                "# Employees": num_emp,
-                                "Avg Salary ($)": f"{salary:,.0f}",
-                                "Annual Labor Cost ($)": f"{wh_labor_cost:,.0f}"
-                            })
-                            total_labor_cost += wh_labor_cost
-                        if valid_input:
-                            st.session_state.total_labor_cost = total_labor_cost
-                            st.session_state.labor_details_df = pd.DataFrame(labor_details)
-                            st.session_state.labor_costs_calculated = True
-                            st.success("Labor Costs Calculated!")
-                        else:
-                            st.session_state.labor_costs_calculated = False
-                if st.session_state.labor_costs_calculated:
-                    st.metric("Total Annual Labor Cost", f"${st.session_state.total_labor_cost:,.0f}")
-                    st.dataframe(st.session_state.labor_details_df, use_container_width=True, hide_index=True)
-                else:
-                     st.info("Labor cost results will appear here after calculation.")
-        
-        # --- UI Enhancement End ---
-        
-        # --- Additional: Download Combined Excel File ---
+                 labor_view()
+
+        # --- Additional: Download Results with Inputs ---
         st.divider()
-        if st.button("Download Combined Excel"):
-            if (st.session_state.rental_costs_calculated and
-                st.session_state.inventory_costs_calculated and
-                st.session_state.shipping_costs_calculated and
-                st.session_state.labor_costs_calculated):
-                
-                excel_bytes = create_combined_excel(
-                    rental_df=st.session_state.rental_details_df,
-                    inventory_df=st.session_state.inventory_details_df,
-                    shipping_df=st.session_state.shipping_details_df,
-                    labor_df=st.session_state.labor_details_df
-                )
-                st.download_button(
-                    label="Download 4-Sheet Excel",
-                    data=excel_bytes,
-                    file_name="combined_results.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-            else:
-                st.warning("Please calculate all cost components (Rental, Inventory, Shipping, and Labor) before downloading.")
+        export_view()
+
+lap(rerun_profile, "calculations_tab")
 
 # =====================================================
 # TAB 3: Results Summary
 # =====================================================
-with tab_summary:
+@st.fragment(key="summary_view")
+def summary_view():
     st.markdown("<p class='section-header-font'><i class='fas fa-chart-pie icon'></i>Scenario Cost Summary</p>", unsafe_allow_html=True)
-    all_calculated = (st.session_state.rental_costs_calculated and
-                      st.session_state.inventory_costs_calculated and
-                      st.session_state.shipping_costs_calculated and
-                      st.session_state.labor_costs_calculated)
-    if not all_calculated:
+    stored = {component: stored_result(component) for component in COMPONENTS}
+    if any(result is None for result in stored.values()):
+        show_dropped_results(stored)
         st.warning("Please calculate all cost components in the 'Run Calculations' tab to see the full summary.")
     else:
-        st.session_state.grand_total = (st.session_state.total_rental_cost +
-                                         st.session_state.total_inventory_financing_cost +
-                                         st.session_state.total_shipping_cost +
-                                         st.session_state.total_labor_cost)
+        stale_components = [name for name in ("rental", "inventory", "shipping", "labor") if is_stale(name)]
+        if stale_components:
+            st.warning(f"Inputs changed since these components were calculated: {', '.join(stale_components)}. Recalculate them in the 'Run Calculations' tab to refresh the summary.")
+        totals = {component: result["total"] for component, result in stored.items()}
+        grand_total = totals["rental"] + totals["inventory"] + totals["shipping"] + totals["labor"]
         st.markdown("### Total Estimated Annual Costs")
         metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
         with metric_col1:
             st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-            st.metric("Rental Cost", f"${st.session_state.total_rental_cost:,.0f}")
+            st.metric("Rental Cost", f"${totals['rental']:,.0f}")
             st.markdown("</div>", unsafe_allow_html=True)
         with metric_col2:
             st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-            st.metric("Inventory Financing", f"${st.session_state.total_inventory_financing_cost:,.0f}")
+            st.metric("Inventory Financing", f"${totals['inventory']:,.0f}")
             st.markdown("</div>", unsafe_allow_html=True)
         with metric_col3:
             st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-            st.metric("Shipping Cost", f"${st.session_state.total_shipping_cost:,.0f}")
+            st.metric("Shipping Cost", f"${totals['shipping']:,.0f}")
             st.markdown("</div>", unsafe_allow_html=True)
         with metric_col4:
             st.markdown("<div class='metric-card'>", unsafe_allow_html=True)
-            st.metric("Labor Cost", f"${st.session_state.total_labor_cost:,.0f}")
+            st.metric("Labor Cost", f"${totals['labor']:,.0f}")
             st.markdown("</div>", unsafe_allow_html=True)
         st.markdown("---")
         st.markdown("<div style='text-align: center; margin-top: 20px;'>", unsafe_allow_html=True)
-        st.markdown(f"<h2 style='color: #1E3A5F;'>Grand Total Annual Cost: ${st.session_state.grand_total:,.0f}</h2>", unsafe_allow_html=True)
+        st.markdown(f"<h2 style='color: #1E3A5F;'>Grand Total Annual Cost: ${grand_total:,.0f}</h2>", unsafe_allow_html=True)
         st.markdown("</div>", unsafe_allow_html=True)
         st.markdown("---")
         st.markdown("### Cost Component Breakdown")
         cost_data = {
             'Cost Component': ['Rental', 'Inventory Financing', 'Shipping', 'Labor'],
-            'Cost ($)': [st.session_state.total_rental_cost,
-                         st.session_state.total_inventory_financing_cost,
-                         st.session_state.total_shipping_cost,
-                         st.session_state.total_labor_cost]
+            'Cost ($)': [totals["rental"], totals["inventory"], totals["shipping"], totals["labor"]]
         }
         cost_df = pd.DataFrame(cost_data)
         cost_df = cost_df[cost_df['Cost ($)'] > 0]
@@ -822,59 +1079,523 @@ with tab_summary:
                              color_discrete_sequence=px.colors.sequential.Blues_r)
             fig_pie.update_traces(textposition='inside', textinfo='percent+label', hoverinfo='label+percent+value')
             fig_pie.update_layout(title_x=0.5, showlegend=True)
-            st.plotly_chart(fig_pie, use_container_width=True)
+            show_chart(fig_pie)
         else:
             st.info("No cost data to display in the chart.")
         st.markdown("### Summary per Warehouse (Combined Costs)")
-        summary_list = []
-        valid_wh_data_for_summary = warehouse_data
-        for i, wh in enumerate(valid_wh_data_for_summary):
-             wh_label = f"WH {i+1} ({wh.get('location', 'N/A')})"
-             rental_cost = 0.0
-             if not st.session_state.rental_details_df.empty:
-                 rent_row = st.session_state.rental_details_df[st.session_state.rental_details_df['Warehouse'] == wh_label]
-                 if not rent_row.empty:
-                     try: 
-                         rental_cost = float(rent_row.iloc[0]['Annual Rent ($)'].replace(',', ''))
-                     except: 
-                         pass
-             inv_cost = 0.0
-             if not st.session_state.inventory_details_df.empty:
-                  inv_rows = st.session_state.inventory_details_df[st.session_state.inventory_details_df['Warehouse'] == wh_label]
-                  if not inv_rows.empty:
-                       try:
-                           inv_cost = inv_rows['Annual Financing Cost ($)'].str.replace('[$,]', '', regex=True).astype(float).sum()
-                       except:
-                           pass
-             ship_cost = 0.0
-             if not st.session_state.shipping_details_df.empty:
-                 ship_row = st.session_state.shipping_details_df[st.session_state.shipping_details_df['Warehouse'] == wh_label]
-                 if not ship_row.empty:
-                      try:
-                          ship_cost = float(ship_row.iloc[0]['Annual Shipping Cost ($)'].replace(',', ''))
-                      except:
-                          pass
-             labor_cost = 0.0
-             if not st.session_state.labor_details_df.empty:
-                 labor_row = st.session_state.labor_details_df[st.session_state.labor_details_df['Warehouse'] == wh_label]
-                 if not labor_row.empty:
-                      try:
-                          labor_cost = float(labor_row.iloc[0]['Annual Labor Cost ($)'].replace(',', ''))
-                      except:
-                          pass
-             total_cost = rental_cost + inv_cost + ship_cost + labor_cost
-             summary_list.append({
-                 "Warehouse": wh_label,
-                 "Type": wh.get("type", "N/A"),
-                 "Rental ($)": f"{rental_cost:,.0f}",
-                 "Inventory ($)": f"{inv_cost:,.0f}",
-                 "Shipping ($)": f"{ship_cost:,.0f}",
-                 "Labor ($)": f"{labor_cost:,.0f}",
-                 "Total ($)": f"{total_cost:,.0f}"
-             })
-        if summary_list:
-             summary_df = pd.DataFrame(summary_list)
-             st.dataframe(summary_df, hide_index=True, use_container_width=True)
+        with timed(rerun_profile, "summary/per_warehouse_join"):
+            summary_df = summarize_per_warehouse(warehouse_data, stored)
+        if not summary_df.empty:
+             money_columns = ["Rental ($)", "Inventory ($)", "Shipping ($)", "Labor ($)", "Total ($)"]
+             st.dataframe(summary_df.style.format({col: "{:,.0f}" for col in money_columns}), hide_index=True, use_container_width=True)
         else:
              st.info("Warehouse summary data not available.")
+
+with tab_summary:
+    summary_view()
 # --- UI Enhancement End ---
+
+lap(rerun_profile, "summary_tab")
+
+# =====================================================
+# TAB 4: Sensitivity Sweep
+# =====================================================
+with tab_sweep:
+    st.markdown("<p class='section-header-font'><i class='fas fa-th icon'></i>Parameter Sensitivity Sweep</p>", unsafe_allow_html=True)
+    st.info("Evaluate the grand total over a grid of service levels, interest rates and container capacities in one batched computation.")
+    if not warehouse_data:
+        st.error("Cannot run a sweep. Please complete the warehouse setup and resolve any errors.")
+    else:
+        with st.container(border=True):
+            sweep_col1, sweep_col2, sweep_col3 = st.columns(3)
+            with sweep_col1:
+                sweep_sl_range = st.slider("Service Level Range", min_value=0.50, max_value=0.999, value=(0.80, 0.99), step=0.001, format="%.3f", key="sweep_sl_range")
+                sweep_sl_steps = st.number_input("Service Level Steps", min_value=2, max_value=500, value=50, step=1, key="sweep_sl_steps")
+            with sweep_col2:
+                sweep_rate_range = st.slider("Interest Rate Range (%)", min_value=0.0, max_value=30.0, value=(1.0, 15.0), step=0.1, key="sweep_rate_range")
+                sweep_rate_steps = st.number_input("Interest Rate Steps", min_value=2, max_value=500, value=50, step=1, key="sweep_rate_steps")
+            with sweep_col3:
+                sweep_cap_range = st.slider("40ft HC Capacity Range (Units)", min_value=50, max_value=3000, value=(300, 1200), step=10, key="sweep_cap_range")
+                sweep_cap_steps = st.number_input("Capacity Steps", min_value=1, max_value=200, value=20, step=1, key="sweep_cap_steps")
+            sweep_capacities = np.unique(np.linspace(sweep_cap_range[0], sweep_cap_range[1], int(sweep_cap_steps)).round().astype(int))
+            sweep_points = int(sweep_sl_steps) * int(sweep_rate_steps) * len(sweep_capacities)
+            if sweep_points > MAX_GRID_POINTS:
+                st.warning(f"The grid has {sweep_points:,} points; reduce the steps to at most {MAX_GRID_POINTS:,} points to run the sweep.")
+            if st.button("Run Sweep", key="run_sweep", type="primary", disabled=sweep_points > MAX_GRID_POINTS):
+                sweep_levels = np.linspace(sweep_sl_range[0], sweep_sl_range[1], int(sweep_sl_steps))
+                sweep_rates = np.linspace(sweep_rate_range[0], sweep_rate_range[1], int(sweep_rate_steps))
+                sweep_start = time.perf_counter()
+                try:
+                    sweep, sweep_cached = cached_run(
+                        "sweep",
+                        lambda: run_parameter_sweep(
+                            market_area_data, warehouse_data, scenario_params,
+                            service_levels=sweep_levels, interest_rates=sweep_rates, capacities=sweep_capacities,
+                        ),
+                        service_levels=sweep_levels.tolist(), interest_rates=sweep_rates.tolist(), capacities=sweep_capacities.tolist(),
+                    )
+                except CostInputError as e:
+                    st.error(str(e))
+                    drop_result("sweep")
+                else:
+                    source = " (from the shared result cache)" if sweep_cached else ""
+                    st.success(f"Evaluated {sweep['total'].size:,} grid points in {time.perf_counter() - sweep_start:.3f}s{source}.")
+        sweep = stored_result("sweep")
+        if sweep is None:
+            show_missing_result("sweep", "Sweep results will appear here after running the sweep.")
+        else:
+            sweep_caps = [int(c) for c in sweep["capacities"]]
+            base_cap = min(sweep_caps, key=lambda c: abs(c - container_capacity_40))
+            heatmap_cap = st.select_slider("Container Capacity for Heatmap", options=sweep_caps, value=base_cap, key="sweep_heatmap_cap")
+            k = sweep_caps.index(heatmap_cap)
+            fig_heat = px.imshow(
+                sweep["total"][:, :, k],
+                x=np.round(sweep["interest_rates"], 2),
+                y=np.round(sweep["service_levels"], 3),
+                labels={"x": "Interest Rate (%)", "y": "Service Level", "color": "Grand Total ($)"},
+                aspect="auto", origin="lower", color_continuous_scale="Blues",
+                title=f"Grand Total Annual Cost (Capacity {heatmap_cap} Units)"
+            )
+            fig_heat.update_layout(title_x=0.5)
+            show_chart(fig_heat)
+            r = int(np.abs(sweep["interest_rates"] - interest_rate).argmin())
+            sl = int(np.abs(sweep["service_levels"] - service_level).argmin())
+            curve_col1, curve_col2 = st.columns(2)
+            with curve_col1:
+                sl_df = pd.DataFrame({
+                    "Service Level": sweep["service_levels"],
+                    "Rental": sweep["rental"][:, r, k],
+                    "Inventory Financing": sweep["inventory"][:, r, k],
+                    "Grand Total": sweep["total"][:, r, k],
+                }).melt(id_vars="Service Level", var_name="Cost Component", value_name="Cost ($)")
+                fig_sl = px.line(sl_df, x="Service Level", y="Cost ($)", color="Cost Component",
+                                 title=f"Cost vs Service Level ({sweep['interest_rates'][r]:.1f}% Interest)")
+                fig_sl.update_layout(title_x=0.5)
+                show_chart(fig_sl)
+            with curve_col2:
+                cap_df = pd.DataFrame({
+                    "Capacity (Units)": sweep["capacities"],
+                    "Shipping": sweep["shipping"][sl, r, :],
+                    "Grand Total": sweep["total"][sl, r, :],
+                }).melt(id_vars="Capacity (Units)", var_name="Cost Component", value_name="Cost ($)")
+                fig_cap = px.line(cap_df, x="Capacity (Units)", y="Cost ($)", color="Cost Component", markers=True,
+                                  title=f"Cost vs Container Capacity (Service Level {sweep['service_levels'][sl]:.3f})")
+                fig_cap.update_layout(title_x=0.5)
+                show_chart(fig_cap)
+
+        st.markdown("<p class='section-header-font'><i class='fas fa-sliders-h icon'></i>Cost Drivers</p>", unsafe_allow_html=True)
+        st.info("Rank every input by its effect on the grand total. The derivatives of all cost components with respect to every input come from one analytic pass; the chart shows their first-order effect.")
+        with st.container(border=True):
+            driver_col1, driver_col2, driver_col3 = st.columns([1, 1, 2])
+            with driver_col1:
+                driver_change = st.slider("Input Change (±%)", min_value=1, max_value=50, value=10, step=1, key="driver_change")
+            with driver_col2:
+                driver_top = st.number_input("Inputs to Show", min_value=5, max_value=100, value=20, step=1, key="driver_top")
+            with driver_col3:
+                driver_groups = st.multiselect("Input Groups", options=list(INPUT_GROUPS), default=list(INPUT_GROUPS), key="driver_groups")
+            if st.button("Compute Sensitivities", key="run_sensitivities", type="primary"):
+                try:
+                    drivers, drivers_cached = cached_run("sensitivities", lambda: compute_sensitivities(market_area_data, warehouse_data, scenario_params))
+                except CostInputError as e:
+                    st.error(str(e))
+                    drop_result("sensitivities")
+                else:
+                    source = " (from the shared result cache)" if drivers_cached else ""
+                    st.success(f"Differentiated every cost component with respect to {len(drivers['inputs']):,} inputs in {drivers['elapsed'] * 1000:.0f} ms{source}.")
+        drivers = stored_result("sensitivities")
+        if drivers is None:
+            show_missing_result("sensitivities", "Cost drivers will appear here after computing the sensitivities.")
+        else:
+            drivers_df = pd.DataFrame(drivers["inputs"])
+            drivers_df = drivers_df[drivers_df["group"].isin(driver_groups)]
+            drivers_df["impact"] = drivers_df["total"] * drivers_df["value"] * driver_change / 100.0
+            drivers_df = drivers_df.loc[drivers_df["impact"].abs().sort_values(ascending=False).index].head(int(driver_top))
+            if drivers_df.empty:
+                st.info("No inputs in the selected groups.")
+            else:
+                tornado_df = pd.concat([
+                    pd.DataFrame({"Input": drivers_df["input"], "Input Change": f"-{driver_change}%", "Change in Grand Total ($)": -drivers_df["impact"]}),
+                    pd.DataFrame({"Input": drivers_df["input"], "Input Change": f"+{driver_change}%", "Change in Grand Total ($)": drivers_df["impact"]}),
+                ])
+                fig_tornado = px.bar(tornado_df, x="Change in Grand Total ($)", y="Input", color="Input Change", orientation="h", barmode="overlay",
+                                     height=max(400, 28 * len(drivers_df)),
+                                     title=f"Grand Total Response to ±{driver_change}% Input Changes (Base ${drivers['base']['grand_total']:,.0f})")
+                fig_tornado.update_yaxes(categoryorder="array", categoryarray=drivers_df["input"].tolist()[::-1], title=None)
+                fig_tornado.update_layout(title_x=0.5)
+                show_chart(fig_tornado)
+                st.caption("Derivatives are in $ per unit of the input; demand inputs scale an area's or SKU's forecast, daily demand and std together. Whole containers and orders are taken at their marginal cost per unit.")
+                drivers_table = drivers_df.rename(columns={
+                    "input": "Input", "group": "Group", "value": "Value",
+                    "rental": "dRental", "shipping": "dShipping", "inventory": "dInventory", "labor": "dLabor", "total": "dGrand Total",
+                    "impact": f"Effect of +{driver_change}% ($)",
+                })
+                driver_formats = {col: "{:,.2f}" for col in ["Value", "dRental", "dShipping", "dInventory", "dLabor", "dGrand Total"]}
+                driver_formats[f"Effect of +{driver_change}% ($)"] = "{:,.0f}"
+                st.dataframe(drivers_table.style.format(driver_formats), use_container_width=True, hide_index=True)
+
+lap(rerun_profile, "sweep_tab")
+
+# =====================================================
+# TAB 5: Multi-Year Plan
+# =====================================================
+with tab_timeline:
+    st.markdown("<p class='section-header-font'><i class='fas fa-chart-line icon'></i>Monthly Multi-Year Cost Plan</p>", unsafe_allow_html=True)
+    st.info("Lays every cost component out month by month over several years, following the monthly forecast: inventory and its financing follow the replenishment orders, sea freight is paid when an order ships, land freight follows the monthly demand. Demand growth scales all demand from year to year, cost escalation scales rents, salaries and freight rates.")
+    if not warehouse_data:
+        st.error("Cannot build a plan. Please complete the warehouse setup and resolve any errors.")
+    else:
+        with st.container(border=True):
+            plan_col1, plan_col2 = st.columns([1, 2])
+            with plan_col1:
+                timeline_years = st.number_input("Horizon (Years)", min_value=1, max_value=MAX_HORIZON_YEARS, value=5, step=1, key="timeline_years")
+            with plan_col2:
+                st.caption("Growth into each year, in percent over the year before. Year 1 is the forecast as entered.")
+                growth_table = pd.DataFrame({
+                    "Year": range(2, int(timeline_years) + 1),
+                    "Demand Growth (%)": 0.0,
+                    "Cost Escalation (%)": 0.0,
+                })
+                growth_table = st.data_editor(
+                    growth_table, hide_index=True, use_container_width=True, disabled=["Year"],
+                    key=f"timeline_growth_{int(timeline_years)}",
+                    column_config={
+                        "Demand Growth (%)": st.column_config.NumberColumn(min_value=-99.0, step=0.5, format="%.1f"),
+                        "Cost Escalation (%)": st.column_config.NumberColumn(min_value=-99.0, step=0.5, format="%.1f"),
+                    },
+                )
+            if st.button("Build Plan", key="run_timeline", type="primary"):
+                demand_growth = growth_table["Demand Growth (%)"].fillna(0.0).tolist()
+                cost_escalation = growth_table["Cost Escalation (%)"].fillna(0.0).tolist()
+                try:
+                    timeline, timeline_cached = cached_run(
+                        "timeline",
+                        lambda: run_cost_timeline(
+                            market_area_data, warehouse_data, scenario_params, years=int(timeline_years),
+                            demand_growth=demand_growth, cost_escalation=cost_escalation,
+                        ),
+                        years=int(timeline_years), demand_growth=demand_growth, cost_escalation=cost_escalation,
+                    )
+                except CostInputError as e:
+                    st.error(str(e))
+                    drop_result("timeline")
+                else:
+                    source = " (from the shared result cache)" if timeline_cached else ""
+                    st.success(f"Computed {len(timeline['months'])} months in {timeline['elapsed'] * 1000:.0f} ms{source}.")
+        timeline = stored_result("timeline")
+        if timeline is None:
+            show_missing_result("timeline", "The plan will appear here after building it.")
+        else:
+            yearly_df = pd.DataFrame(timeline["yearly"])
+            plan_cols = st.columns(4)
+            plan_cols[0].metric(f"Total Cost over {timeline['years']} Years", f"${yearly_df['total'].sum():,.0f}")
+            plan_cols[1].metric("Total Cash Outlay", f"${yearly_df['cash_outlay'].sum():,.0f}")
+            plan_cols[2].metric("Peak Inventory Value", f"${timeline['inventory_value'].sum(axis=1).max():,.0f}")
+            plan_cols[3].metric("Final Year Cost", f"${yearly_df['total'].iloc[-1]:,.0f}")
+            month_labels = timeline["months"]
+            cost_df = pd.DataFrame({
+                "Month": month_labels,
+                "Rental": timeline["rental"].sum(axis=1),
+                "Shipping": timeline["shipping"].sum(axis=1),
+                "Inventory Financing": timeline["financing"].sum(axis=1),
+                "Labor": timeline["labor"].sum(axis=1),
+            }).melt(id_vars="Month", var_name="Cost Component", value_name="Cost ($)")
+            fig_costs = px.bar(cost_df, x="Month", y="Cost ($)", color="Cost Component", title="Monthly Cost by Component")
+            fig_costs.update_layout(title_x=0.5, xaxis={"categoryorder": "array", "categoryarray": month_labels})
+            show_chart(fig_costs)
+            series_col1, series_col2 = st.columns(2)
+            with series_col1:
+                stock_value_df = pd.DataFrame(timeline["inventory_value"], columns=timeline["warehouses"])
+                stock_value_df.insert(0, "Month", month_labels)
+                stock_value_df = stock_value_df.melt(id_vars="Month", var_name="Warehouse", value_name="Inventory Value ($)")
+                fig_stock_value = px.line(stock_value_df, x="Month", y="Inventory Value ($)", color="Warehouse", title="Inventory Value by Month")
+                fig_stock_value.update_layout(title_x=0.5)
+                show_chart(fig_stock_value)
+            with series_col2:
+                cash = timeline["cash_outlay"].sum(axis=1)
+                cash_df = pd.DataFrame({"Month": month_labels, "Monthly": cash, "Cumulative": np.cumsum(cash)}).melt(id_vars="Month", var_name="Cash Outlay", value_name="Amount ($)")
+                fig_cash = px.line(cash_df, x="Month", y="Amount ($)", color="Cash Outlay", title="Cash Outlay (Costs plus Inventory Build-Up)")
+                fig_cash.update_layout(title_x=0.5)
+                show_chart(fig_cash)
+            yearly_display = yearly_df.rename(columns={
+                "year": "Year",
+                "demand_factor": "Demand Factor",
+                "cost_factor": "Cost Factor",
+                "demand": "Demand (Units)",
+                "avg_inventory": "Avg Inventory (Units)",
+                "avg_inventory_value": "Avg Inventory Value ($)",
+                "rental": "Rental ($)",
+                "shipping": "Shipping ($)",
+                "financing": "Inventory Financing ($)",
+                "labor": "Labor ($)",
+                "total": "Total Cost ($)",
+                "cash_outlay": "Cash Outlay ($)",
+            })
+            yearly_formats = {col: "{:,.0f}" for col in yearly_display.columns if col.endswith("($)")}
+            yearly_formats.update({"Demand Factor": "{:.3f}", "Cost Factor": "{:.3f}", "Demand (Units)": "{:,.0f}", "Avg Inventory (Units)": "{:,.0f}"})
+            st.dataframe(yearly_display.style.format(yearly_formats), use_container_width=True, hide_index=True)
+
+lap(rerun_profile, "timeline_tab")
+
+# =====================================================
+# TAB 6: Network Optimizer
+# =====================================================
+with tab_optimizer:
+    st.markdown("<p class='section-header-font'><i class='fas fa-project-diagram icon'></i>Warehouse Network Optimizer</p>", unsafe_allow_html=True)
+    st.info(f"Searches warehouse locations and market assignments for the '{layout_type}' layout that minimize the grand total. Cost parameters of locations already configured in the Warehouse Setup are reused; other locations use the setup defaults.")
+    if not market_area_data:
+        st.error("Cannot optimize. Please select and configure at least one market area.")
+    else:
+        with st.container(border=True):
+            candidate_options = [loc for loc in all_warehouse_locations if loc in market_area_data]
+            opt_col1, opt_col2, opt_col3 = st.columns([3, 1, 1])
+            with opt_col1:
+                candidate_locations = st.multiselect("Candidate Warehouse Locations", options=candidate_options, default=candidate_options, key="opt_candidates", help="Only locations that are also selected market areas can host a warehouse.")
+            with opt_col2:
+                opt_top_n = st.number_input("Networks to Return", min_value=1, max_value=10, value=3, step=1, key="opt_top_n")
+            with opt_col3:
+                opt_restarts = st.number_input("Search Restarts", min_value=1, max_value=100, value=8, step=1, key="opt_restarts")
+            if st.button("Optimize Network", key="run_optimizer", type="primary"):
+                opt_start = time.perf_counter()
+                opt_templates = templates_from_warehouses(temp_warehouse_configs.values())
+                try:
+                    _, opt_cached = cached_run(
+                        "optimizer",
+                        lambda: optimize_network(
+                            market_area_data, scenario_params,
+                            candidate_locations=candidate_locations,
+                            templates=opt_templates,
+                            top_n=int(opt_top_n), restarts=int(opt_restarts)
+                        ),
+                        candidate_locations=candidate_locations, templates=opt_templates, top_n=int(opt_top_n), restarts=int(opt_restarts),
+                    )
+                except CostInputError as e:
+                    st.error(str(e))
+                    drop_result("optimizer")
+                else:
+                    source = " (from the shared result cache)" if opt_cached else ""
+                    st.success(f"Optimization finished in {time.perf_counter() - opt_start:.2f}s{source}.")
+        networks = stored_result("optimizer")
+        if not networks:
+            show_missing_result("optimizer", "Optimized networks will appear here after running the optimizer.")
+        else:
+            for rank, network in enumerate(networks, start=1):
+                result = network["result"]
+                with st.expander(f"#{rank}: Grand Total ${network['grand_total']:,.0f}", expanded=rank == 1):
+                    net_cols = st.columns(4)
+                    net_cols[0].metric("Rental", f"${result['rental']['total']:,.0f}")
+                    net_cols[1].metric("Inventory Financing", f"${result['inventory']['total']:,.0f}")
+                    net_cols[2].metric("Shipping", f"${result['shipping']['total']:,.0f}")
+                    net_cols[3].metric("Labor", f"${result['labor']['total']:,.0f}")
+                    network_labels = {wh["id"]: f"WH {i+1} ({wh['location']})" for i, wh in enumerate(network["warehouse_data"])}
+                    network_df = pd.DataFrame([{
+                        "Warehouse": network_labels[wh["id"]],
+                        "Type": wh["type"],
+                        "Served Markets": ", ".join(wh["served_markets"]),
+                        "Serving MAIN": network_labels.get(wh.get("serving_main_id"), "")
+                    } for wh in network["warehouse_data"]])
+                    st.dataframe(network_df, use_container_width=True, hide_index=True)
+            st.download_button(
+                label="Download Networks (Excel)",
+                data=lambda: timed_export(
+                    [{"name": f"Network {rank}", "market_area_data": market_area_data, "warehouse_data": network["warehouse_data"], "params": scenario_params, "result": network["result"]}
+                     for rank, network in enumerate(networks, start=1)]
+                ),
+                file_name="optimized_networks.xlsx",
+                mime=EXPORT_FORMATS["xlsx"][0],
+                key="export_networks"
+            )
+
+lap(rerun_profile, "optimizer_tab")
+
+# =====================================================
+# TAB 7: Simulation
+# =====================================================
+with tab_simulation:
+    st.markdown("<p class='section-header-font'><i class='fas fa-dice icon'></i>Monte Carlo Service Level Check</p>", unsafe_allow_html=True)
+    st.info("Draws daily demand per market area and brand over each warehouse's replenishment lead time and measures how often the analytic reorder point (expected demand plus safety stock) is exceeded. MAIN warehouses use the ocean lead time; FRONT warehouses use the transfer lead time.")
+    if not warehouse_data:
+        st.error("Cannot run a simulation. Please complete the warehouse setup and resolve any errors.")
+    else:
+        with st.container(border=True):
+            mc_col1, mc_col2, mc_col3 = st.columns(3)
+            with mc_col1:
+                mc_paths = st.selectbox("Simulated Cycles", options=[10_000, 100_000, 1_000_000], index=1, format_func=lambda n: f"{n:,}", key="mc_paths")
+            with mc_col2:
+                mc_seed = st.number_input("Random Seed", min_value=0, value=0, step=1, key="mc_seed")
+            with mc_col3:
+                mc_workers = st.number_input("Worker Processes", min_value=1, max_value=32, value=1, step=1, key="mc_workers", help="Values above 1 spread the simulation over a process pool.")
+            if st.button("Run Monte Carlo", key="run_montecarlo", type="primary"):
+                try:
+                    # Results only depend on the seed, not on the number of worker processes.
+                    mc, mc_cached = cached_run(
+                        "montecarlo",
+                        lambda: simulate_service_levels(
+                            market_area_data, warehouse_data, scenario_params,
+                            n_paths=int(mc_paths), seed=int(mc_seed), max_workers=int(mc_workers)
+                        ),
+                        n_paths=int(mc_paths), seed=int(mc_seed),
+                    )
+                except CostInputError as e:
+                    st.error(str(e))
+                    drop_result("montecarlo")
+                else:
+                    if mc_cached:
+                        st.success(f"Took {mc['paths']:,} simulated cycles from the shared result cache.")
+                    else:
+                        st.success(f"Simulated {mc['paths']:,} cycles in {mc['elapsed']:.2f}s.")
+        mc = stored_result("montecarlo")
+        if mc is None:
+            show_missing_result("montecarlo", "Simulation results will appear here after running the Monte Carlo check.")
+        elif mc["details"]:
+            mc_df = pd.DataFrame(mc["details"])
+            mc_cols = st.columns(3)
+            mc_cols[0].metric("Target Service Level", f"{mc['target_service_level']:.1%}")
+            mc_cols[1].metric("Lowest Simulated Service Level", f"{mc_df['cycle_service_level'].min():.1%}")
+            mc_cols[2].metric("Lowest Simulated Fill Rate", f"{mc_df['fill_rate'].min():.2%}")
+            mc_display = mc_df.rename(columns={
+                "warehouse": "Warehouse",
+                "type": "Type",
+                "brand": "Brand",
+                "lead_time": "Lead Time (days)",
+                "mean_lead_time_demand": "Expected Lead-Time Demand (Units)",
+                "safety_stock": "Safety Stock (Units)",
+                "reorder_point": "Reorder Point (Units)",
+                "stockout_probability": "Stock-Out Probability",
+                "cycle_service_level": "Simulated Service Level",
+                "fill_rate": "Fill Rate",
+            }).drop(columns=["index", "warehouse_id"])
+            st.dataframe(mc_display.style.format({
+                "Expected Lead-Time Demand (Units)": "{:,.0f}",
+                "Safety Stock (Units)": "{:,.0f}",
+                "Reorder Point (Units)": "{:,.0f}",
+                "Stock-Out Probability": "{:.2%}",
+                "Simulated Service Level": "{:.2%}",
+                "Fill Rate": "{:.2%}",
+            }), use_container_width=True, hide_index=True)
+            fig_mc = px.bar(mc_df, x="warehouse", y="cycle_service_level", color="brand", barmode="group",
+                            title="Simulated Cycle Service Level vs Target",
+                            labels={"warehouse": "Warehouse", "cycle_service_level": "Simulated Service Level", "brand": "Brand"})
+            fig_mc.add_hline(y=mc["target_service_level"], line_dash="dash", annotation_text="Target")
+            fig_mc.update_layout(title_x=0.5, yaxis_tickformat=".0%")
+            show_chart(fig_mc)
+        else:
+            st.info("No warehouse has demand to simulate.")
+        st.divider()
+        st.markdown("<p class='section-header-font'><i class='fas fa-calendar-alt icon'></i>Day-by-Day Inventory Simulation</p>", unsafe_allow_html=True)
+        st.info("Steps through each day of the forecast: MAIN warehouses reorder containers at their reorder point and receive them after the ocean lead time, FRONT warehouses are replenished weekly from their MAIN. Demand that cannot be filled from stock is lost.")
+        with st.container(border=True):
+            sim_col1, sim_col2, sim_col3 = st.columns(3)
+            with sim_col1:
+                sim_days = st.number_input("Days to Simulate", min_value=30, max_value=3650, value=365, step=30, key="sim_days")
+            with sim_col2:
+                sim_noise = st.checkbox("Add Daily Demand Noise", value=False, key="sim_noise", help="Adds normal noise with each brand's Std Dev Daily Demand to the forecast.")
+            with sim_col3:
+                sim_seed = st.number_input("Random Seed", min_value=0, value=0, step=1, key="sim_seed", disabled=not sim_noise)
+            if st.button("Run Inventory Simulation", key="run_inventory_sim", type="primary"):
+                sim_seed_value = int(sim_seed) if sim_noise else None
+                try:
+                    sim, sim_cached = cached_run(
+                        "inventory_sim",
+                        lambda: simulate_inventory(
+                            market_area_data, warehouse_data, scenario_params,
+                            days=int(sim_days), seed=sim_seed_value
+                        ),
+                        days=int(sim_days), seed=sim_seed_value,
+                    )
+                except CostInputError as e:
+                    st.error(str(e))
+                    drop_result("inventory_sim")
+                else:
+                    if sim_cached:
+                        st.success(f"Took {int(sim_days)} simulated days from the shared result cache.")
+                    else:
+                        st.success(f"Simulated {int(sim_days)} days in {sim['elapsed'] * 1000:.0f} ms.")
+        sim = stored_result("inventory_sim")
+        if sim is None:
+            show_missing_result("inventory_sim", "Simulation results will appear here after running the inventory simulation.")
+        elif sim["details"]:
+            sim_df = pd.DataFrame(sim["details"])
+            sim_cols = st.columns(4)
+            sim_cols[0].metric("Fill Rate", f"{sim_df['shipped'].sum() / max(sim_df['customer_demand'].sum(), 1e-9):.2%}")
+            sim_cols[1].metric("Lost Sales", f"{sim_df['lost_sales'].sum():,.0f} Units")
+            sim_cols[2].metric("Series with Stock-Outs", f"{(sim_df['stockout_days'] > 0).sum()} of {len(sim_df)}")
+            sim_cols[3].metric("Container Arrivals Ordered", f"{sim['containers'].sum():,.0f}")
+            stock_df = pd.DataFrame(sim["inventory"].sum(axis=2), columns=sim["warehouses"])
+            stock_df.index.name = "Day"
+            stock_df = stock_df.reset_index().melt(id_vars="Day", var_name="Warehouse", value_name="On-Hand (Units)")
+            fig_stock = px.line(stock_df, x="Day", y="On-Hand (Units)", color="Warehouse", title="Daily On-Hand Inventory (All Brands)")
+            fig_stock.update_layout(title_x=0.5)
+            show_chart(fig_stock)
+            sim_display = sim_df.rename(columns={
+                "warehouse": "Warehouse",
+                "type": "Type",
+                "brand": "Brand",
+                "customer_demand": "Customer Demand (Units)",
+                "shipped": "Shipped (Units)",
+                "lost_sales": "Lost Sales (Units)",
+                "fill_rate": "Fill Rate",
+                "stockout_days": "Stock-Out Days",
+                "avg_inventory": "Simulated Avg Inventory (Units)",
+                "max_inventory": "Max Inventory (Units)",
+                "analytic_avg_inventory": "Model Avg Inventory (Units)",
+                "orders": "Orders Placed",
+                "transferred_in": "Transferred In (Units)",
+            }).drop(columns=["index", "warehouse_id"])
+            unit_columns = ["Customer Demand (Units)", "Shipped (Units)", "Lost Sales (Units)", "Simulated Avg Inventory (Units)", "Max Inventory (Units)", "Model Avg Inventory (Units)", "Transferred In (Units)"]
+            sim_formats = {col: "{:,.0f}" for col in unit_columns}
+            sim_formats["Fill Rate"] = "{:.2%}"
+            st.dataframe(sim_display.style.format(sim_formats, na_rep="-"), use_container_width=True, hide_index=True)
+        else:
+            st.info("No warehouse has demand to simulate.")
+lap(rerun_profile, "simulation_tab")
+
+# =====================================================
+# Diagnostics
+# =====================================================
+if rerun_profiler is not None:
+    profile_text, profile_stats = stop_cprofile(rerun_profiler)
+    st.session_state.cprofile_report = {"started_at": rerun_profile["started_at"], "text": profile_text, "stats": profile_stats}
+rerun_record = finish_profile(rerun_profile, rerun=len(st.session_state.rerun_profiles) + 1)
+st.session_state.rerun_profiles = (st.session_state.rerun_profiles + [rerun_record])[-50:]
+
+with st.sidebar:
+    with st.expander("Diagnostics", expanded=False):
+        st.caption(f"Rerun {rerun_record['rerun']}: {rerun_record['total_seconds'] * 1000:,.1f} ms in total.")
+        # Sections are laps of the script; "section/name" rows are parts of the section's time.
+        stage_df = pd.DataFrame({"Stage": list(rerun_record["stages"]), "Time (ms)": [seconds * 1000 for seconds in rerun_record["stages"].values()]})
+        st.dataframe(stage_df.style.format({"Time (ms)": "{:,.1f}"}), hide_index=True, use_container_width=True)
+        if rerun_record["counts"]:
+            st.dataframe(pd.DataFrame({"Count": list(rerun_record["counts"]), "Value": list(rerun_record["counts"].values())}), hide_index=True, use_container_width=True)
+        if st.session_state.event_timings:
+            st.caption("Recent calculations and downloads:")
+            event_df = pd.DataFrame([{
+                "Event": record["event"],
+                "Of": record.get("component") or record.get("format"),
+                "Time (ms)": record["seconds"] * 1000,
+            } for record in st.session_state.event_timings[::-1]])
+            st.dataframe(event_df.style.format({"Time (ms)": "{:,.1f}"}), hide_index=True, use_container_width=True)
+        cache_info = cache_stats(result_cache)
+        hit_rate = f", {cache_info['hit_rate']:.0%} hits" if cache_info["hit_rate"] is not None else ""
+        st.caption(f"Shared result cache: {cache_info['entries']:,} entries, {cache_info['bytes'] / 2**20:,.1f} of {cache_info['max_bytes'] / 2**20:,.0f} MiB, "
+                   f"{cache_info['evictions']:,} evicted, {cache_info['oversized']:,} too large to cache{hit_rate}. This session holds {len(st.session_state.result_keys)} keys.")
+        if cache_info["kinds"]:
+            cache_df = pd.DataFrame([{"Kind": kind, "Hits": counts["hits"], "Misses": counts["misses"], "Hit Rate": counts["hit_rate"]} for kind, counts in cache_info["kinds"].items()])
+            st.dataframe(cache_df.style.format({"Hit Rate": "{:.0%}"}), hide_index=True, use_container_width=True)
+        history_df = pd.DataFrame([{"Rerun": record["rerun"], "Total (ms)": record["total_seconds"] * 1000} for record in st.session_state.rerun_profiles])
+        st.line_chart(history_df, x="Rerun", y="Total (ms)", height=150)
+        st.download_button(
+            "Download Timings (JSON lines)",
+            data="".join(json.dumps(record) + "\n" for record in st.session_state.rerun_profiles + st.session_state.event_timings),
+            file_name="sc_timings.jsonl",
+            mime="application/jsonl",
+            key="download_timings",
+        )
+        if st.toggle(f"Append timings to {DIAGNOSTICS_LOG_PATH}", key="diagnostics_log"):
+            append_log(rerun_record, DIAGNOSTICS_LOG_PATH)
+        if st.button("Profile Next Rerun (cProfile)", key="cprofile_next", use_container_width=True):
+            st.session_state.cprofile_armed = True
+            st.info("The next interaction will be profiled.")
+        if st.session_state.cprofile_report:
+            st.caption(f"cProfile of the rerun started at {st.session_state.cprofile_report['started_at']}, by cumulative time:")
+            st.code(st.session_state.cprofile_report["text"], language=None)
+            st.download_button("Download Profile (.prof)", data=st.session_state.cprofile_report["stats"], file_name="sc_rerun.prof", mime="application/octet-stream", key="download_cprofile")
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Command-line batch runner.
+
+Prices scenario definitions without the app and writes one JSON-lines record
+per scenario. A scenario is a JSON object with ``name``, ``market_area_data``,
+``warehouse_data`` and optionally ``params`` (the same shape the export and
+the scenario store use). The input is a ``.jsonl`` file with one scenario per
+line, a ``.json`` file holding one scenario or a list of them, or a directory
+of such files.
+
+    python sc_batch.py scenarios.jsonl -o results.jsonl --workers 8
+
+Scenarios are evaluated in chunks on a process pool and records are written
+as chunks complete, so output order follows completion; each record carries
+the scenario's input ``position``. A scenario that fails (bad JSON, invalid
+inputs, even a crashed worker process) gets a record with ``status`` "error"
+and the batch continues. When a worker dies, the scenarios lost with its pool
+are retried one per task and, if lost again, one at a time, so only the
+scenario that kills its worker is reported. The exit code is 1 if any
+scenario failed.
+"""
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+import json
+import os
+import sys
+import time
+
+from sc_engine import evaluate_scenario
+
+COMPONENTS = ("rental", "shipping", "inventory", "labor")
+DEFAULT_CHUNK_SIZE = 16
+SCENARIO_SUFFIXES = (".json", ".jsonl")
+
+
+def iter_scenarios(source):
+    """
+    Yields ``(label, scenario, error)`` for every scenario in ``source`` (file
+    or directory); unreadable entries come with ``scenario`` None and the error
+    message, so they can be reported like any other failure.
+    """
+    if os.path.isdir(source):
+        paths = sorted(
+            os.path.join(source, name) for name in os.listdir(source)
+            if name.lower().endswith(SCENARIO_SUFFIXES)
+        )
+    else:
+        paths = [source]
+    for path in paths:
+        if path.lower().endswith(".jsonl"):
+            with open(path, encoding="utf-8") as f:
+                for line_no, line in enumerate(f, start=1):
+                    if not line.strip():
+                        continue
+                    label = f"{os.path.basename(path)}:{line_no}"
+                    try:
+                        yield label, json.loads(line), None
+                    except ValueError as e:
+                        yield label, None, f"Invalid JSON: {e}"
+        else:
+            label = os.path.basename(path)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError as e:
+                yield label, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(data, list):
+                for k, scenario in enumerate(data):
+                    yield f"{label}[{k}]", scenario, None
+            else:
+                yield label, data, None
+
+
+def evaluate_record(position, label, scenario, error=None, details=False):
+    """Prices one scenario and returns its output record; never raises."""
+    start = time.perf_counter()
+    name = scenario.get("name", label) if isinstance(scenario, dict) else label
+    record = {"position": position, "name": name}
+    if error is None:
+        try:
+            if not isinstance(scenario, dict):
+                raise ValueError("A scenario must be a JSON object.")
+            result = evaluate_scenario(scenario["market_area_data"], scenario["warehouse_data"], scenario.get("params"))
+        except KeyError as e:
+            error = f"Missing field {e}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    if error is not None:
+        record.update(status="error", error=error)
+    else:
+        record["status"] = "ok"
+        for component in COMPONENTS:
+            record[component] = result[component]["total"]
+        record["grand_total"] = result["grand_total"]
+        if details:
+            record["result"] = result
+    record["elapsed"] = time.perf_counter() - start
+    return record
+
+
+def _evaluate_chunk(chunk, details):
+    return [evaluate_record(position, label, scenario, error, details) for position, label, scenario, error in chunk]
+
+
+def _died(chunk):
+    return [(position, label, scenario, "Worker process died") for position, label, scenario, _ in chunk]
+
+
+def _chunks(entries, chunk_size):
+    numbered = ((position, label, scenario, error) for position, (label, scenario, error) in enumerate(entries))
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch(entries, write, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, details=False, progress=None):
+    """
+    Evaluates ``entries`` (as yielded by ``iter_scenarios``) and calls
+    ``write(record)`` per scenario as results complete. At most ``2 x
+    workers`` chunks are queued at a time, so the input is read lazily.
+    ``progress(done, failed)`` is called after every chunk. Returns the
+    ``(done, failed)`` counts.
+
+    If a worker process dies, every task on its pool is lost. The scenarios
+    of lost chunks are resubmitted to a new pool one per task; a single
+    scenario lost again is run alone, and only a scenario that breaks the
+    pool while running alone is reported as "Worker process died".
+    """
+    workers = workers or os.cpu_count() or 1
+    done = failed = 0
+
+    def emit(records):
+        nonlocal done, failed
+        for record in records:
+            write(record)
+            done += 1
+            failed += record["status"] != "ok"
+        if progress:
+            progress(done, failed)
+
+    chunks = _chunks(entries, chunk_size)
+    if workers == 1:
+        for chunk in chunks:
+            emit(_evaluate_chunk(chunk, details))
+        return done, failed
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = {}
+    retry = deque()  # scenarios of chunks lost with a dead pool, one per task
+    isolate = deque()  # scenarios lost again, run one at a time
+    try:
+        while True:
+            if isolate:
+                if not pending:
+                    entry = isolate.popleft()
+                    pending[pool.submit(_evaluate_chunk, [entry], details)] = ([entry], "alone")
+            else:
+                room = 2 * workers - len(pending)
+                while retry and room > 0:
+                    entry = retry.popleft()
+                    pending[pool.submit(_evaluate_chunk, [entry], details)] = ([entry], "retry")
+                    room -= 1
+                for chunk in islice(chunks, max(room, 0)):
+                    pending[pool.submit(_evaluate_chunk, chunk, details)] = (chunk, "chunk")
+            if not pending:
+                break
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            lost = []
+            broken = False
+            for future in finished:
+                chunk, mode = pending.pop(future)
+                try:
+                    emit(future.result())
+                except BrokenProcessPool:
+                    broken = True
+                    if mode == "alone":
+                        emit(_evaluate_chunk(_died(chunk), details))
+                    else:
+                        lost.append((chunk, mode))
+            if broken:
+                # Every task still queued on the dead pool is lost with it; run those again on a new one.
+                lost.extend(pending.values())
+                pending.clear()
+                for chunk, mode in lost:
+                    (retry if mode == "chunk" else isolate).extend(chunk)
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = ProcessPoolExecutor(max_workers=workers)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    return done, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Price scenario definitions and write one JSON-lines result record per scenario.")
+    parser.add_argument("source", help="A .jsonl or .json file of scenarios, or a directory of such files.")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout).")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="Worker processes (default: all cores; 1 runs in-process).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Scenarios per task sent to a worker.")
+    parser.add_argument("--details", action="store_true", help="Include the per-warehouse details of every component.")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No progress output on stderr.")
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.source):
+        parser.error(f"No such file or directory: {args.source}")
+    if args.chunk_size < 1 or (args.workers is not None and args.workers < 1):
+        parser.error("--workers and --chunk-size must be positive.")
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    start = time.perf_counter()
+    last_report = [0.0]
+
+    def write(record):
+        out.write(json.dumps(record, default=float) + "\n")
+
+    def progress(done, failed, final=False):
+        out.flush()
+        now = time.perf_counter() - start
+        if args.quiet or (not final and now - last_report[0] < 1.0):
+            return
+        last_report[0] = now
+        rate = done / now if now > 0 else 0.0
+        print(f"{done} scenarios, {failed} failed, {now:.1f}s ({rate:,.0f}/s)", file=sys.stderr, flush=True)
+
+    try:
+        done, failed = run_batch(iter_scenarios(args.source), write, args.workers, args.chunk_size, args.details, progress)
+        progress(done, failed, final=True)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks of the cost engine on synthetic networks.
+
+``generate_scenario`` builds a reproducible network of any size (market
+areas x brands x warehouses, and the share of (area, brand) pairs that
+are active) in either layout. Every benchmark case is
+timed stage by stage (demand aggregates, the four cost components, the
+whole ``evaluate_scenario``); wall time is the best of ``repeat`` runs and
+peak memory is measured with tracemalloc in one extra run, so the tracing
+overhead does not distort the timings.
+
+    python sc_bench.py                          # compare with bench_baseline.json
+    python sc_bench.py --save-baseline          # record a new baseline
+    python sc_bench.py --sizes today extreme --repeat 1
+
+A stage regresses when it is slower than ``time_tolerance`` x its baseline
+(and more than MIN_COMPARED_SECONDS in absolute terms, below which timer
+noise dominates) or uses more than ``memory_tolerance`` x its baseline
+peak memory. The exit code is 1 on any regression. Baselines are machine
+specific; record one on the machine that runs the comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from sc_demand import MONTHS
+from sc_engine import (
+    LAYOUT_CENTRAL,
+    LAYOUT_REGIONAL,
+    resolve_params,
+    prepare_aggregates,
+    calculate_rental_costs,
+    calculate_shipping_costs,
+    calculate_inventory_costs,
+    calculate_labor_costs,
+    evaluate_scenario,
+)
+
+# Name -> (market areas, brands, warehouses, share of active area x brand pairs).
+SIZES = {
+    "today": (5, 3, 5, 1.0),
+    "medium": (50, 20, 25, 1.0),
+    "large": (200, 50, 100, 1.0),
+    "catalog": (1000, 500, 100, 0.02),
+    "extreme": (1000, 200, 500, 1.0),
+}
+DEFAULT_SIZES = ("today", "medium", "large", "catalog")
+LAYOUTS = (LAYOUT_CENTRAL, LAYOUT_REGIONAL)
+STAGES = ("aggregates", "rental", "shipping", "inventory", "labor", "evaluate")
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+MIN_COMPARED_SECONDS = 0.005
+
+
+def generate_scenario(n_areas, n_brands, n_warehouses, layout=LAYOUT_CENTRAL, seed=0, density=1.0):
+    """
+    A synthetic, valid network: every area carries a random ``density``
+    share of the brands (at least one) with random demand; areas are split
+    into contiguous blocks, one per warehouse.
+    In 'Central and Fronts' WH1 is the MAIN serving every area and each other
+    warehouse is a FRONT serving its block; in 'Main Regionals' every
+    warehouse is a MAIN serving its block, with land shipping to each
+    area of the block other than its own location.
+    """
+    if n_warehouses > n_areas:
+        raise ValueError("Need at least as many market areas as warehouses.")
+    rng = np.random.default_rng(seed)
+    areas = [f"A{a:04d}" for a in range(n_areas)]
+    brands = [f"B{b:03d}" for b in range(n_brands)]
+    avg_daily = rng.uniform(5.0, 80.0, (n_areas, n_brands)).round(1)
+    std_daily = (avg_daily * rng.uniform(0.1, 0.4, (n_areas, n_brands))).round(1)
+    avg_order = rng.integers(20, 200, (n_areas, n_brands)).astype(float)
+    seasonality = 1.0 + 0.3 * np.sin(np.arange(len(MONTHS)) / len(MONTHS) * 2 * np.pi)
+    forecast = (avg_daily[:, :, None] * 30.0 * seasonality).round()
+    active = np.ones((n_areas, n_brands), dtype=bool)
+    if density < 1.0:
+        active = rng.random((n_areas, n_brands)) < density
+        active[np.arange(n_areas), rng.integers(0, n_brands, n_areas)] = True
+    market_area_data = {
+        area: {
+            brand: {
+                "avg_order_size": float(avg_order[a, b]),
+                "avg_daily_demand": float(avg_daily[a, b]),
+                "std_daily_demand": float(std_daily[a, b]),
+                "forecast_demand": forecast[a, b].tolist(),
+            }
+            for b, brand in enumerate(brands) if active[a, b]
+        }
+        for a, area in enumerate(areas)
+    }
+
+    blocks = np.array_split(np.arange(n_areas), n_warehouses)
+    warehouse_data = []
+    for w, block in enumerate(blocks):
+        served = [areas[a] for a in block]
+        wh = {
+            "id": f"WH{w+1}",
+            "location": served[0],
+            "served_markets": served,
+            "rent_pricing_method": "Square Foot Rent Price" if w % 2 else "Fixed Rent Price",
+            "rent_price": 10.0 if w % 2 else 50000.0,
+            "avg_employee_salary": 50000,
+            "num_employees": 3,
+        }
+        if layout == LAYOUT_CENTRAL and w > 0:
+            wh.update(type="FRONT", serving_main_id="WH1", front_shipping_cost_40=500.0, front_shipping_cost_53=600.0)
+        else:
+            wh.update(type="MAIN", lt_shipping=int(rng.integers(20, 45)), shipping_cost_40hc=5000.0)
+            if layout == LAYOUT_CENTRAL:
+                wh["served_markets"] = list(areas)
+            else:
+                wh["land_shipping_data"] = {
+                    area: {"distance": float(rng.uniform(50, 500)), "cost_for_avg_order": 2.0, "calculated_avg_order_size": 100.0}
+                    for area in served[1:]
+                }
+        warehouse_data.append(wh)
+
+    params = resolve_params({"layout_type": layout, "brand_unit_prices": {brand: 80.0 for brand in brands}})
+    return market_area_data, warehouse_data, params
+
+
+def _stage_functions(market_area_data, warehouse_data, params):
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, params)
+    return {
+        "aggregates": lambda: prepare_aggregates(warehouse_data, market_area_data, params),
+        "rental": lambda: calculate_rental_costs(warehouse_data, market_area_data, params, aggregates),
+        "shipping": lambda: calculate_shipping_costs(warehouse_data, market_area_data, params, aggregates),
+        "inventory": lambda: calculate_inventory_costs(warehouse_data, market_area_data, params, aggregates),
+        "labor": lambda: calculate_labor_costs(warehouse_data, params),
+        "evaluate": lambda: evaluate_scenario(market_area_data, warehouse_data, params),
+    }
+
+
+def measure(fn, repeat=3):
+    """Best wall time of ``repeat`` calls and the peak traced memory of one more, in seconds and bytes."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, layouts=LAYOUTS, repeat=3, report=None):
+    """
+    Times every stage for every (size, layout) case. Returns ``{case:
+    {stage: {"seconds", "peak_bytes"}}}`` with cases named "<size>/<layout>";
+    ``report(case, stage, seconds, peak_bytes)`` is called as stages finish.
+    """
+    results = {}
+    for size in sizes:
+        n_areas, n_brands, n_warehouses, density = SIZES[size]
+        for layout in layouts:
+            case = f"{size}/{layout}"
+            start = time.perf_counter()
+            scenario = generate_scenario(n_areas, n_brands, n_warehouses, layout, density=density)
+            results[case] = {"generate": {"seconds": time.perf_counter() - start, "peak_bytes": None}}
+            for stage, fn in _stage_functions(*scenario).items():
+                seconds, peak = measure(fn, repeat)
+                results[case][stage] = {"seconds": seconds, "peak_bytes": peak}
+                if report:
+                    report(case, stage, seconds, peak)
+    return results
+
+
+def compare_with_baseline(results, baseline, time_tolerance=1.5, memory_tolerance=1.25):
+    """One dict per (case, stage) found in both, with the ratios and whether it regressed."""
+    rows = []
+    for case, stages in results.items():
+        for stage in STAGES:
+            current = stages.get(stage)
+            reference = baseline.get(case, {}).get(stage)
+            if current is None or reference is None:
+                continue
+            time_ratio = current["seconds"] / reference["seconds"] if reference["seconds"] > 0 else 1.0
+            memory_ratio = current["peak_bytes"] / reference["peak_bytes"] if reference["peak_bytes"] else 1.0
+            slower = time_ratio > time_tolerance and current["seconds"] - reference["seconds"] > MIN_COMPARED_SECONDS
+            rows.append({
+                "case": case,
+                "stage": stage,
+                "seconds": current["seconds"],
+                "baseline_seconds": reference["seconds"],
+                "time_ratio": time_ratio,
+                "memory_ratio": memory_ratio,
+                "regressed": slower or memory_ratio > memory_tolerance,
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the cost engine on synthetic networks.")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(DEFAULT_SIZES), help="Network sizes to run.")
+    parser.add_argument("--layouts", nargs="+", choices=list(LAYOUTS), default=list(LAYOUTS), help="Layouts to run.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best one counts.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline instead of comparing.")
+    parser.add_argument("--time-tolerance", type=float, default=1.5, help="Allowed slowdown factor per stage.")
+    parser.add_argument("--memory-tolerance", type=float, default=1.25, help="Allowed peak memory growth factor per stage.")
+    parser.add_argument("-o", "--output", help="Also write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    def report(case, stage, seconds, peak):
+        print(f"{case:<32} {stage:<11} {seconds * 1000:>10.2f} ms {peak / 2**20:>9.1f} MiB", flush=True)
+
+    results = run_benchmarks(args.sizes, args.layouts, args.repeat, report)
+    document = {
+        "machine": {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=1)
+    if args.save_baseline:
+        # Cases not run this time keep their old baseline.
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                previous = json.load(f)
+            document["results"] = dict(previous.get("results", {}), **results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=1)
+        print(f"Baseline written to {args.baseline}.")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare_with_baseline(results, baseline["results"], args.time_tolerance, args.memory_tolerance)
+    regressions = [row for row in rows if row["regressed"]]
+    for row in regressions:
+        print(f"REGRESSION {row['case']} {row['stage']}: {row['seconds'] * 1000:.2f} ms vs {row['baseline_seconds'] * 1000:.2f} ms "
+              f"(time x{row['time_ratio']:.2f}, memory x{row['memory_ratio']:.2f})")
+    print(f"{len(rows)} stages compared with {args.baseline}, {len(regressions)} regressed.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Process-wide cache of calculation results, bounded by a memory budget.
+
+A Streamlit server runs the app script once per session and rerun, but the
+modules it imports are loaded once per process, so the cache returned by
+``shared_cache`` is shared by every session: a result computed for one
+planner is served to all others asking for the same configuration, and a
+session keeps only the keys of its results.
+
+A cache is a plain dict holding an ordered mapping of key -> (value, size)
+plus counters. Keys are "<kind>:<hash>" strings, the hash being a canonical
+hash of every input (see ``result_key``); hits and misses are counted per
+kind. Sizes are estimated when a value is stored, and the least recently
+used entries are evicted while the total exceeds ``max_bytes``. A value
+larger than the whole budget is not stored at all, so one oversized result
+cannot flush everyone else's; callers use the value they hold rather than
+reading back what they just stored. Values are shared between sessions and
+must not be modified after ``cache_put``.
+"""
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_BYTES = 512 * 2**20
+MAX_BYTES_ENV = "SC_RESULT_CACHE_MB"  # memory budget of the shared cache, in MiB
+SIZE_SAMPLE = 200  # long lists are sized from this many items
+
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def new_cache(max_bytes=DEFAULT_MAX_BYTES):
+    return {
+        "entries": OrderedDict(),
+        "lock": threading.Lock(),
+        "max_bytes": int(max_bytes),
+        "bytes": 0,
+        "hits": {},
+        "misses": {},
+        "evictions": 0,
+        "oversized": 0,
+    }
+
+
+def shared_cache():
+    """The cache of this process, created on first use with a budget of $SC_RESULT_CACHE_MB MiB (default 512)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            megabytes = os.environ.get(MAX_BYTES_ENV)
+            _shared = new_cache(float(megabytes) * 2**20 if megabytes else DEFAULT_MAX_BYTES)
+        return _shared
+
+
+def result_key(kind, config_digest, **settings):
+    """Key of a ``kind`` of result for the configuration hash ``config_digest`` and any run ``settings``."""
+    if not settings:
+        return f"{kind}:{config_digest}"
+    digest = hashlib.blake2b(json.dumps(settings, sort_keys=True, default=str).encode("utf-8"), digest_size=8).hexdigest()
+    return f"{kind}:{config_digest}:{digest}"
+
+
+def estimate_size(obj):
+    """
+    Approximate bytes held by ``obj``: arrays and frames by their buffers,
+    containers recursively. A view is sized by the array it views, and a
+    broadcast view (stride 0 along a repeated axis) holds no data of its own.
+    """
+    if isinstance(obj, np.ndarray):
+        if obj.base is None or any(stride == 0 and n > 1 for stride, n in zip(obj.strides, obj.shape)):
+            return sys.getsizeof(obj)
+        return sys.getsizeof(obj) + estimate_size(obj.base)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_size(k) + estimate_size(v) for k, v in obj.items())
+    if isinstance(obj, (list, tuple)):
+        size = sys.getsizeof(obj)
+        if len(obj) <= SIZE_SAMPLE:
+            return size + sum(estimate_size(item) for item in obj)
+        sample = obj[:: len(obj) // SIZE_SAMPLE][:SIZE_SAMPLE]
+        return size + sum(estimate_size(item) for item in sample) * len(obj) // len(sample)
+    return sys.getsizeof(obj)
+
+
+def _kind(key):
+    return key.split(":", 1)[0]
+
+
+def cache_get(cache, key, default=None, count=True):
+    """
+    The value under ``key`` (marked as recently used), or ``default``.
+    With ``count``, the lookup is booked as a hit or miss of the key's
+    kind; rereading a result that is already known is not.
+    """
+    with cache["lock"]:
+        entry = cache["entries"].get(key)
+        if count:
+            tally = cache["hits"] if entry is not None else cache["misses"]
+            tally[_kind(key)] = tally.get(_kind(key), 0) + 1
+        if entry is None:
+            return default
+        cache["entries"].move_to_end(key)
+        return entry[0]
+
+
+def cache_put(cache, key, value, size=None):
+    """
+    Stores ``value`` under ``key`` and evicts least recently used entries
+    until the cache fits its budget. A value larger than the budget is not
+    stored (any older value under ``key`` is dropped). Returns ``value``.
+    """
+    size = estimate_size(value) if size is None else int(size)
+    with cache["lock"]:
+        old = cache["entries"].pop(key, None)
+        if old is not None:
+            cache["bytes"] -= old[1]
+        if size > cache["max_bytes"]:
+            cache["oversized"] += 1
+            return value
+        cache["entries"][key] = (value, size)
+        cache["bytes"] += size
+        _evict(cache)
+    return value
+
+
+def _evict(cache):
+    entries = cache["entries"]
+    while cache["bytes"] > cache["max_bytes"] and entries:
+        _, (_, size) = entries.popitem(last=False)
+        cache["bytes"] -= size
+        cache["evictions"] += 1
+
+
+def resize_cache(cache, max_bytes):
+    with cache["lock"]:
+        cache["max_bytes"] = int(max_bytes)
+        _evict(cache)
+
+
+def clear_cache(cache):
+    with cache["lock"]:
+        cache["entries"].clear()
+        cache["bytes"] = 0
+
+
+def cache_stats(cache):
+    """
+    Entries, estimated bytes and budget, evictions, values too large to
+    store, and hits / misses / hit rate per kind and in total.
+    """
+    with cache["lock"]:
+        kinds = sorted(set(cache["hits"]) | set(cache["misses"]))
+        per_kind = {kind: {"hits": cache["hits"].get(kind, 0), "misses": cache["misses"].get(kind, 0)} for kind in kinds}
+        stats = {
+            "entries": len(cache["entries"]),
+            "bytes": cache["bytes"],
+            "max_bytes": cache["max_bytes"],
+            "evictions": cache["evictions"],
+            "oversized": cache["oversized"],
+            "hits": sum(cache["hits"].values()),
+            "misses": sum(cache["misses"].values()),
+            "kinds": per_kind,
+        }
+    for counts in [stats] + list(per_kind.values()):
+        lookups = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = counts["hits"] / lookups if lookups else None
+    return stats
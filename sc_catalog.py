@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+SKU catalog: unit price and storage footprint per SKU.
+
+A catalog is a table with one row per SKU (the ``brand`` key of the demand
+data): ``sku``, ``unit_price`` and optionally ``sq_ft_per_unit``; a blank
+footprint means the global "Sq Ft per Unit" applies. It can be loaded from a
+CSV, Excel or Parquet file, edited as a grid, and turned into the
+``brand_unit_prices`` / ``brand_sq_ft`` parameters of the cost engine.
+"""
+import pandas as pd
+
+from sc_demand import read_table
+from sc_engine import DEFAULT_PARAMS
+
+CATALOG_COLUMNS = ["sku", "unit_price", "sq_ft_per_unit"]
+REQUIRED_CATALOG_COLUMNS = ["sku", "unit_price"]
+
+
+class CatalogError(ValueError):
+    """Raised when an imported SKU catalog cannot be read or is malformed."""
+
+
+def read_catalog(source, filename=None):
+    """
+    Reads a SKU catalog from a CSV, Excel or Parquet file (path or file-like
+    object) and returns it normalized by ``normalize_catalog``.
+    """
+    return normalize_catalog(read_table(source, filename, "catalog", CatalogError))
+
+
+def normalize_catalog(table):
+    """
+    Validates a catalog: lower-case column names (``brand`` is accepted for
+    ``sku``), unique non-empty SKUs, positive unit prices and positive
+    footprints where one is given.
+    """
+    table = table.rename(columns=lambda c: str(c).strip().lower())
+    if "sku" not in table.columns and "brand" in table.columns:
+        table = table.rename(columns={"brand": "sku"})
+    missing = [c for c in REQUIRED_CATALOG_COLUMNS if c not in table.columns]
+    if missing:
+        raise CatalogError(f"SKU catalog is missing columns: {', '.join(missing)}.")
+    if "sq_ft_per_unit" not in table.columns:
+        table["sq_ft_per_unit"] = None
+    table = table[CATALOG_COLUMNS].copy()
+    table["sku"] = table["sku"].astype(str).str.strip()
+    table = table[(table["sku"] != "") & (table["sku"].str.lower() != "nan")]
+    duplicates = table["sku"][table["sku"].duplicated()].unique()
+    if len(duplicates):
+        raise CatalogError(f"SKUs listed more than once: {', '.join(duplicates[:10])}.")
+    table["unit_price"] = pd.to_numeric(table["unit_price"], errors="coerce")
+    table["sq_ft_per_unit"] = pd.to_numeric(table["sq_ft_per_unit"], errors="coerce")
+    bad_prices = table["sku"][~(table["unit_price"] > 0)]
+    if len(bad_prices):
+        raise CatalogError(f"{len(bad_prices)} SKUs have no positive unit price, e.g. {', '.join(bad_prices[:5])}.")
+    bad_footprints = table["sku"][table["sq_ft_per_unit"] <= 0]
+    if len(bad_footprints):
+        raise CatalogError(f"{len(bad_footprints)} SKUs have a footprint that is not positive, e.g. {', '.join(bad_footprints[:5])}.")
+    return table.reset_index(drop=True)
+
+
+def default_catalog():
+    """The catalog of the default parameters; footprints are left to the global value."""
+    prices = DEFAULT_PARAMS["brand_unit_prices"]
+    return pd.DataFrame({"sku": list(prices), "unit_price": list(prices.values()), "sq_ft_per_unit": [float("nan")] * len(prices)}, columns=CATALOG_COLUMNS)
+
+
+def catalog_to_params(catalog):
+    """
+    ``brand_unit_prices`` and ``brand_sq_ft`` from a catalog grid. Rows
+    without a SKU are ignored, a missing price counts as 0 (which the cost
+    components reject) and a blank footprint is left out.
+    """
+    catalog = catalog.dropna(subset=["sku"]).assign(sku=lambda t: t["sku"].astype(str).str.strip())
+    catalog = catalog[catalog["sku"] != ""].drop_duplicates(subset="sku", keep="last")
+    skus = catalog["sku"].tolist()
+    prices = pd.to_numeric(catalog["unit_price"], errors="coerce").fillna(0.0).astype(float).tolist()
+    footprints = pd.to_numeric(catalog["sq_ft_per_unit"], errors="coerce").astype(float).tolist()
+    brand_unit_prices = dict(zip(skus, prices))
+    brand_sq_ft = {sku: sq_ft for sku, sq_ft in zip(skus, footprints) if pd.notna(sq_ft)}
+    return brand_unit_prices, brand_sq_ft
+
+
+def params_to_catalog(params):
+    """Inverse of ``catalog_to_params``: the catalog grid for a set of parameters."""
+    prices = params["brand_unit_prices"]
+    brand_sq_ft = params.get("brand_sq_ft", {})
+    return pd.DataFrame({
+        "sku": list(prices),
+        "unit_price": list(prices.values()),
+        "sq_ft_per_unit": [brand_sq_ft.get(sku, float("nan")) for sku in prices],
+    }, columns=CATALOG_COLUMNS)
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Container load planning for the sea shipments of MAIN warehouses.
+
+The year is cut into shipments following the monthly forecast: with ``n``
+shipments per year, a divisor of 12 means each shipment carries 12 / n
+consecutive months, a multiple of 12 splits every month into n / 12 equal
+shipments. A shipment's SKU quantities (whole units) are packed by volume
+with next-fit decreasing into the container type with the lowest cost per
+volume; the load of the last, partly filled container then goes into the
+cheapest combination of container types that holds it.
+
+Volumes are in container slots: a unit of a SKU takes ``sq_ft / sq_ft_per_unit``
+slots and a 40ft HC holds ``container_capacity_40`` of them, so with the
+global footprint for every SKU the capacity reads in units as before.
+Container types give capacity and cost relative to a 40ft HC.
+
+All shipments of all warehouses are planned in one batch; the only Python
+loop is over SKUs, so a year of shipments for hundreds of SKUs stays in the
+millisecond range.
+"""
+from itertools import product
+from math import ceil
+
+import numpy as np
+
+DEFAULT_CONTAINER_TYPES = {
+    "20ft": {"capacity": 0.45, "cost": 0.6},
+    "40ft": {"capacity": 0.88, "cost": 0.92},
+    "40HC": {"capacity": 1.0, "cost": 1.0},
+}
+SHIPMENTS_PER_YEAR = (1, 2, 3, 4, 6, 12, 24, 36, 48)
+
+
+class ContainerPlanError(ValueError):
+    """Raised when shipments cannot be planned with the given containers."""
+
+
+def validate_container_types(container_types, shipments_per_year):
+    if shipments_per_year not in SHIPMENTS_PER_YEAR:
+        raise ContainerPlanError(f"Shipments per year must be one of {', '.join(map(str, SHIPMENTS_PER_YEAR))}.")
+    if not container_types:
+        raise ContainerPlanError("At least one container type is needed.")
+    for name, spec in container_types.items():
+        if spec.get("capacity", 0) <= 0 or spec.get("cost", 0) <= 0:
+            raise ContainerPlanError(f"Container type '{name}' needs a positive capacity and cost.")
+
+
+def schedule_shipments(monthly, shipments_per_year):
+    """
+    Cuts ``monthly`` quantities (..., 12, SKUs) into shipments. Returns the
+    quantities per shipment (..., shipments, SKUs) and how many times each
+    shipment is made (more than once when months are split).
+    """
+    if shipments_per_year <= 12:
+        per = 12 // shipments_per_year
+        return monthly.reshape(monthly.shape[:-2] + (shipments_per_year, per, monthly.shape[-1])).sum(axis=-2), 1
+    repeats = shipments_per_year // 12
+    return monthly / repeats, repeats
+
+
+def _tail_combinations(container_types, bulk_capacity):
+    """Every mix of container types up to one bulk container of capacity, cheapest first."""
+    capacities = np.array([spec["capacity"] for spec in container_types.values()])
+    costs = np.array([spec["cost"] for spec in container_types.values()])
+    ranges = [range(ceil(bulk_capacity / c - 1e-9) + 1) for c in capacities]
+    mixes = np.array([counts for counts in product(*ranges) if any(counts)], dtype=float)
+    mix_capacity = mixes @ capacities
+    mix_cost = mixes @ costs
+    order = np.lexsort((-mix_capacity, mix_cost))
+    return mixes[order], mix_capacity[order]
+
+
+def whole_units(quantities):
+    return np.ceil(np.asarray(quantities, dtype=float) - 1e-9)
+
+
+def pack_shipments(quantities, volumes, capacity):
+    """
+    Next-fit decreasing of whole units: SKUs in order of decreasing unit
+    volume fill one container after the other, a SKU continuing in the next
+    container when the current one is full. ``quantities`` is (shipments,
+    SKUs). Returns the number of containers and the volume loaded into the
+    last one, per shipment.
+    """
+    units = whole_units(quantities)
+    n_shipments = units.shape[0]
+    containers = np.zeros(n_shipments)
+    room = np.zeros(n_shipments)
+    for s in np.argsort(-volumes, kind="stable"):
+        q = units[:, s]
+        if not q.any():
+            continue
+        v = volumes[s]
+        per_container = np.floor(capacity / v + 1e-9)
+        now = np.minimum(q, np.floor(room / v + 1e-9))
+        room -= now * v
+        q = q - now
+        opened = np.ceil(q / per_container)
+        containers += opened
+        last = q - (opened - 1) * per_container
+        room = np.where(opened > 0, capacity - last * v, room)
+    last_load = np.where(containers > 0, capacity - room, 0.0)
+    return containers, last_load
+
+
+def plan_shipments(quantities, volumes, capacity, container_types=None):
+    """
+    Container plan of every shipment in ``quantities`` (shipments, SKUs),
+    with SKU unit ``volumes`` and ``capacity`` slots per 40ft HC. Returns the
+    container type names, the containers of each type per shipment, the
+    loaded volume and the capacity of the containers used.
+    """
+    container_types = container_types or DEFAULT_CONTAINER_TYPES
+    names = list(container_types)
+    relative = {name: spec["capacity"] for name, spec in container_types.items()}
+    bulk = min(names, key=lambda name: container_types[name]["cost"] / container_types[name]["capacity"])
+    bulk_capacity = relative[bulk] * capacity
+    volumes = np.asarray(volumes, dtype=float)
+    carried = np.asarray(quantities).any(axis=0)
+    if (volumes[carried] > bulk_capacity + 1e-9).any():
+        raise ContainerPlanError(f"A SKU takes more room than a whole {bulk} container.")
+
+    containers, last_load = pack_shipments(quantities, volumes, bulk_capacity)
+    mixes, mix_capacity = _tail_combinations(container_types, relative[bulk])
+    # The cheapest mix holding the last container's load (one bulk container always does).
+    fits = mix_capacity[None, :] * capacity >= last_load[:, None] - 1e-9
+    counts = np.where((last_load > 0)[:, None], mixes[fits.argmax(axis=1)], 0.0)
+    counts[:, names.index(bulk)] += np.maximum(containers - 1, 0)
+    capacities = np.array([relative[name] for name in names]) * capacity
+    return {
+        "types": names,
+        "counts": counts,
+        "volume": whole_units(quantities) @ volumes,
+        "capacity": counts @ capacities,
+        "costs": np.array([container_types[name]["cost"] for name in names]),
+    }
@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+"""
+Sparse demand representation for the cost engine.
+
+``market_area_data[area][brand]`` is flattened once into one entry per
+active (area, brand) pair, so a catalog of hundreds of SKUs that each sell
+in a few areas costs memory in proportion to the pairs that exist, not to
+areas x brands. Each warehouse's served markets become a (warehouse x area)
+assignment matrix, and every per-warehouse aggregate the cost components
+need is a handful of sparse matrix products instead of a fresh walk over
+the nested dicts per warehouse and per metric. Per-brand aggregates are
+(warehouse x brand) CSR matrices holding only the brands a warehouse
+actually carries.
+
+Safety stock std is pooled over the areas a warehouse serves: with an area
+correlation matrix R (the same for every brand) and per-area stds s, the
+pooled std of a brand is sqrt(s' R s), evaluated for all warehouses and
+brands in one batch. Large matrices are replaced by a low-rank factor.
+
+Demand can also be loaded in bulk from a long-format table with one row per
+(area, brand, month), and edited as a grid with one row per (area, brand).
+"""
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import eigsh
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+DEMAND_TABLE_COLUMNS = ["area", "brand", "month", "forecast", "avg_daily", "std", "avg_order"]
+GRID_KEY_COLUMNS = ["area", "brand"]
+GRID_PARAM_COLUMNS = ["avg_order", "avg_daily", "std"]
+GRID_COLUMNS = GRID_KEY_COLUMNS + GRID_PARAM_COLUMNS + MONTHS
+CORRELATION_TABLE_COLUMNS = ["area", "other_area", "correlation"]
+
+# Same defaults as the per-brand widgets used to have.
+DEFAULT_DEMAND = {"avg_order": 100.0, "avg_daily": 50.0, "std": 10.0, "forecast": 500.0}
+
+# Columns kept by the low-rank factor of a large area correlation matrix.
+DEFAULT_CORRELATION_RANK = 50
+
+
+class DemandTableError(ValueError):
+    """Raised when an imported demand table cannot be read or is malformed."""
+
+
+def build_sparse_demand(market_area_data, brands=None):
+    """
+    Flattens ``market_area_data`` into per-pair arrays: ``pair_area`` and
+    ``pair_brand`` index every active (area, brand) pair, ``forecast`` is
+    (pair x month) and ``avg_daily`` / ``std_daily`` / ``avg_order`` are one
+    value per pair. ``area_pairs`` is the (area x pair) 0/1 matrix that sums
+    pairs up to their area. ``brands`` fixes the brand axis order; brands
+    that only appear in the data are appended after it.
+    """
+    areas = list(market_area_data)
+    brand_index = {brand: b for b, brand in enumerate(brands or [])}
+    n_pairs = sum(len(brand_data) for brand_data in market_area_data.values())
+    pair_area = np.empty(n_pairs, dtype=np.intp)
+    pair_brand = np.empty(n_pairs, dtype=np.intp)
+    forecast = np.zeros((n_pairs, len(MONTHS)))
+    values = np.empty((n_pairs, 3))
+    k = 0
+    for a, brand_data in enumerate(market_area_data.values()):
+        for brand, params in brand_data.items():
+            months = params.get("forecast_demand", [])[:len(MONTHS)]
+            pair_area[k] = a
+            pair_brand[k] = brand_index.setdefault(brand, len(brand_index))
+            forecast[k, :len(months)] = months
+            values[k] = (params.get("avg_daily_demand", 0), params.get("std_daily_demand", 0), params.get("avg_order_size", 0))
+            k += 1
+    return {
+        "areas": areas,
+        "brands": list(brand_index),
+        "area_index": {area: a for a, area in enumerate(areas)},
+        "brand_index": brand_index,
+        "pair_area": pair_area,
+        "pair_brand": pair_brand,
+        "forecast": forecast,
+        "avg_daily": values[:, 0].copy(),
+        "std_daily": values[:, 1].copy(),
+        "avg_order": values[:, 2].copy(),
+        "area_pairs": csr_matrix((np.ones(n_pairs), (pair_area, np.arange(n_pairs))), shape=(len(areas), n_pairs)),
+    }
+
+
+def densify_demand(demand):
+    """
+    The dense (area x brand x month) cube of a sparse demand, with the same
+    keys plus ``active`` marking the pairs that exist. For the simulations,
+    which draw every (area, brand) series anyway.
+    """
+    shape = (len(demand["areas"]), len(demand["brands"]))
+    pairs = (demand["pair_area"], demand["pair_brand"])
+    cube = {key: demand[key] for key in ("areas", "brands", "area_index", "brand_index")}
+    cube["forecast"] = np.zeros(shape + (len(MONTHS),))
+    cube["forecast"][pairs] = demand["forecast"]
+    for key in ("avg_daily", "std_daily", "avg_order"):
+        cube[key] = np.zeros(shape)
+        cube[key][pairs] = demand[key]
+    cube["active"] = np.zeros(shape, dtype=bool)
+    cube["active"][pairs] = True
+    return cube
+
+
+def build_assignment_matrix(warehouse_data, demand):
+    """(warehouse x area) 0/1 matrix of served markets; unknown areas are ignored."""
+    area_index = demand["area_index"]
+    assignment = np.zeros((len(warehouse_data), len(area_index)))
+    for w, wh in enumerate(warehouse_data):
+        for area in wh.get("served_markets", []):
+            a = area_index.get(area)
+            if a is not None:
+                assignment[w, a] = 1.0
+    return assignment
+
+
+def build_front_matrix(num_warehouses, main_of):
+    """
+    (warehouse x warehouse) matrix with ``[main, front] = 1`` for every entry
+    of ``main_of`` (FRONT position -> MAIN position).
+    """
+    fronts = np.zeros((num_warehouses, num_warehouses))
+    for f, m in main_of.items():
+        fronts[m, f] = 1.0
+    return fronts
+
+
+def compute_brand_monthly(demand, assignment, rows):
+    """
+    Monthly forecast per brand of the warehouses ``rows`` (own served areas
+    only), as a dense (rows x 12 x brands) array.
+    """
+    n_pairs = len(demand["pair_brand"])
+    n_brands = len(demand["brands"])
+    n_months = len(MONTHS)
+    columns = (np.arange(n_months)[None, :] * n_brands + demand["pair_brand"][:, None]).ravel()
+    by_month = csr_matrix((demand["forecast"].ravel(), (np.repeat(np.arange(n_pairs), n_months), columns)), shape=(n_pairs, n_months * n_brands))
+    served = csr_matrix(assignment[rows]) @ demand["area_pairs"]
+    return (served @ by_month).toarray().reshape(len(rows), n_months, n_brands)
+
+
+def compute_area_aggregates(demand, sq_ft=None):
+    """
+    Per-area totals over the area's pairs. With ``sq_ft`` (footprint per
+    brand) the peak month, daily demand and std are also given in square
+    feet as ``peak_sq_ft``, ``daily_sq_ft`` and ``std_sq_ft``.
+    """
+    area_pairs = demand["area_pairs"]
+    area_monthly = area_pairs @ demand["forecast"]
+    area = {
+        "monthly": area_monthly,
+        "annual": area_monthly.sum(axis=1),
+        "peak_month": area_monthly.max(axis=1, initial=0.0),
+        "daily": area_pairs @ demand["avg_daily"],
+        "std": area_pairs @ demand["std_daily"],
+    }
+    if sq_ft is not None:
+        footprint = np.asarray(sq_ft, dtype=float)[demand["pair_brand"]]
+        area["peak_sq_ft"] = (area_pairs @ (demand["forecast"] * footprint[:, None])).max(axis=1, initial=0.0)
+        area["daily_sq_ft"] = area_pairs @ (demand["avg_daily"] * footprint)
+        area["std_sq_ft"] = area_pairs @ (demand["std_daily"] * footprint)
+    return area
+
+
+def build_area_correlation(areas, correlation=1.0, area_correlations=None, max_rank=DEFAULT_CORRELATION_RANK):
+    """
+    Correlation model of the demand of ``areas``: ``correlation`` between any
+    two areas, except the pairs listed in ``area_correlations`` ({area:
+    {area: rho}}, either order). Returns None when all areas are fully
+    correlated (stds add up linearly), ``{"uniform": rho}`` when one value
+    holds for all pairs, or ``{"factor": F, "residual": d}`` with
+    R ~ F F' + diag(d): the exact eigendecomposition while the areas fit in
+    ``max_rank`` columns, the ``max_rank`` leading eigenvectors beyond that,
+    with ``d`` restoring the unit diagonal.
+    """
+    area_index = {area: a for a, area in enumerate(areas)}
+    overrides = [
+        (area_index[area], area_index[other], rho)
+        for area, row in (area_correlations or {}).items() for other, rho in row.items()
+        if area in area_index and other in area_index and area != other
+    ]
+    if not overrides:
+        return None if correlation >= 1.0 else {"uniform": float(correlation)}
+    n_areas = len(areas)
+    matrix = np.full((n_areas, n_areas), float(correlation))
+    for a, b, rho in overrides:
+        matrix[a, b] = matrix[b, a] = rho
+    np.fill_diagonal(matrix, 1.0)
+    if n_areas <= max_rank:
+        eigenvalues, vectors = np.linalg.eigh(matrix)
+    else:
+        eigenvalues, vectors = eigsh(matrix, k=max_rank, which="LA")
+    # Negative eigenvalues of an inconsistent matrix are dropped.
+    factor = vectors * np.sqrt(np.clip(eigenvalues, 0.0, None))
+    return {"factor": factor, "residual": np.clip(1.0 - (factor ** 2).sum(axis=1), 0.0, None)}
+
+
+def _pooled_std(correlation, slot, n_entries, area, std):
+    """
+    sqrt(s' R s) per (warehouse, brand) entry, where entry ``slot[k]`` gets
+    std ``std[k]`` from area ``area[k]``.
+    """
+    if "uniform" in correlation:
+        rho = correlation["uniform"]
+        total = np.bincount(slot, weights=std, minlength=n_entries)
+        squares = np.bincount(slot, weights=std ** 2, minlength=n_entries)
+        variance = rho * total ** 2 + (1.0 - rho) * squares
+    else:
+        factor = correlation["factor"]
+        entries = csr_matrix((std, (slot, area)), shape=(n_entries, factor.shape[0]))
+        variance = ((entries @ factor) ** 2).sum(axis=1) + entries.multiply(entries) @ correlation["residual"]
+    return np.sqrt(np.clip(variance, 0.0, None))
+
+
+def compute_std_gradients(demand, assignment, correlation=None):
+    """
+    Derivatives of the pooled per-brand stds of ``compute_brand_aggregates``
+    (own served areas only), one entry per (warehouse, pair) served:
+    ``scale`` is the derivative of the warehouse's std of the pair's brand
+    with respect to a factor scaling the pair's std, i.e. s_a (R s)_a /
+    sqrt(s' R s). ``rho`` is the derivative of every (warehouse, brand)
+    std (``entry_warehouse`` / ``entry_brand``) with respect to the one
+    correlation between all areas, or None when area pairs are overridden.
+    With full correlation it is the derivative from below.
+    """
+    served = (csr_matrix(assignment) @ demand["area_pairs"]).tocoo()
+    pairs = served.col
+    std = served.data * demand["std_daily"][pairs]
+    area = demand["pair_area"][pairs]
+    stride = max(len(demand["brands"]), 1)
+    keys, slot = np.unique(served.row.astype(np.int64) * stride + demand["pair_brand"][pairs], return_inverse=True)
+    total = np.bincount(slot, weights=std, minlength=len(keys))
+    squares = np.bincount(slot, weights=std ** 2, minlength=len(keys))
+    if correlation is None or "uniform" in correlation:
+        rho = 1.0 if correlation is None else correlation["uniform"]
+        pooled = np.sqrt(np.clip(rho * total ** 2 + (1.0 - rho) * squares, 0.0, None))
+        mixed = rho * total[slot] + (1.0 - rho) * std
+    else:
+        factor = correlation["factor"]
+        entries = csr_matrix((std, (slot, area)), shape=(len(keys), factor.shape[0]))
+        projected = entries @ factor
+        pooled = np.sqrt(np.clip((projected ** 2).sum(axis=1) + entries.multiply(entries) @ correlation["residual"], 0.0, None))
+        mixed = (projected[slot] * factor[area]).sum(axis=1) + correlation["residual"][area] * std
+    safe = np.where(pooled > 0, pooled, 1.0)
+    scale = np.where(pooled[slot] > 0, std * mixed / safe[slot], 0.0)
+    rho_gradient = None
+    if correlation is None or "uniform" in correlation:
+        rho_gradient = np.where(pooled > 0, (total ** 2 - squares) / (2.0 * safe), 0.0)
+    return {
+        "warehouse": served.row,
+        "pair": pairs,
+        "scale": scale,
+        "entry_warehouse": (keys // stride).astype(np.intp),
+        "entry_brand": (keys % stride).astype(np.intp),
+        "rho": rho_gradient,
+    }
+
+
+def compute_brand_aggregates(demand, assignment, fronts, correlation=None):
+    """
+    (warehouse x brand) CSR matrices ``brand_annual``, ``brand_daily``,
+    ``brand_std`` and ``front_brand_daily`` (the daily demand of the FRONTs
+    a MAIN supplies). All four share one sparsity pattern: an entry for every
+    brand active in an area the warehouse or one of its FRONTs serves, kept
+    even when its demand is zero, and nothing else. ``brand_std`` is pooled
+    with ``correlation`` (see ``build_area_correlation``) unless it is None.
+    """
+    n_wh = assignment.shape[0]
+    n_brands = len(demand["brands"])
+    served = csr_matrix(assignment) @ demand["area_pairs"]
+    supplied = (csr_matrix(fronts) @ served).tocoo()
+    served = served.tocoo()
+    rows = np.concatenate([served.row, supplied.row]).astype(np.int64)
+    pairs = np.concatenate([served.col, supplied.col])
+    weights = np.concatenate([served.data, supplied.data])
+    own = np.arange(len(pairs)) < served.nnz
+    # One key per (warehouse, brand) entry; sorted keys are CSR order.
+    stride = max(n_brands, 1)
+    keys, slot = np.unique(rows * stride + demand["pair_brand"][pairs], return_inverse=True)
+    indices = (keys % stride).astype(np.int32)
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(keys // stride, minlength=n_wh))]).astype(np.int32)
+
+    def matrix(values, mask):
+        data = np.bincount(slot, weights=np.where(mask, weights * values[pairs], 0.0), minlength=len(keys))
+        return csr_matrix((data, indices, indptr), shape=(n_wh, n_brands))
+
+    brand_std = matrix(demand["std_daily"], own)
+    if correlation is not None:
+        own_pairs = pairs[own]
+        pooled = _pooled_std(correlation, slot[own], len(keys), demand["pair_area"][own_pairs], weights[own] * demand["std_daily"][own_pairs])
+        brand_std = csr_matrix((pooled, indices, indptr), shape=(n_wh, n_brands))
+    return {
+        "brand_annual": matrix(demand["forecast"].sum(axis=1), own),
+        "brand_daily": matrix(demand["avg_daily"], own),
+        "brand_std": brand_std,
+        "front_brand_daily": matrix(demand["avg_daily"], ~own),
+    }
+
+
+def compute_warehouse_aggregates(demand, assignment, fronts=None, sq_ft=None, correlation=None):
+    """
+    Per-warehouse demand aggregates. ``front_*`` arrays hold the demand of the
+    FRONTs each MAIN supplies; the per-brand ones come from
+    ``compute_brand_aggregates``. With ``sq_ft`` (footprint per brand) the
+    ``*_sq_ft`` counterparts used to size rental space are added. With a
+    ``correlation`` model, ``std`` and ``std_sq_ft`` are sums of the pooled
+    per-brand stds, since safety stock is held per brand.
+    """
+    area = compute_area_aggregates(demand, sq_ft)
+    if fronts is None:
+        fronts = np.zeros((assignment.shape[0], assignment.shape[0]))
+    # Peak sizing takes the busiest single served area, not the busiest summed month.
+    peak_month = (assignment * area["peak_month"]).max(axis=1, initial=0.0)
+    daily = assignment @ area["daily"]
+    aggregates = {
+        "annual": assignment @ area["annual"],
+        "monthly": assignment @ area["monthly"],
+        "peak_month": peak_month,
+        "daily": daily,
+        "std": assignment @ area["std"],
+        "front_daily": fronts @ daily,
+        "area_annual": area["annual"],
+        "area_monthly": area["monthly"],
+    }
+    if sq_ft is not None:
+        daily_sq_ft = assignment @ area["daily_sq_ft"]
+        aggregates["peak_sq_ft"] = (assignment * area["peak_sq_ft"]).max(axis=1, initial=0.0)
+        aggregates["daily_sq_ft"] = daily_sq_ft
+        aggregates["std_sq_ft"] = assignment @ area["std_sq_ft"]
+        aggregates["front_daily_sq_ft"] = fronts @ daily_sq_ft
+    aggregates.update(compute_brand_aggregates(demand, assignment, fronts, correlation))
+    if correlation is not None:
+        aggregates["std"] = np.asarray(aggregates["brand_std"].sum(axis=1)).ravel()
+        if sq_ft is not None:
+            aggregates["std_sq_ft"] = aggregates["brand_std"] @ np.asarray(sq_ft, dtype=float)
+    return aggregates
+
+
+# =====================================================
+# Bulk Import and Grid Editing
+# =====================================================
+def read_table(source, filename=None, kind="data", error=None):
+    """
+    Reads a table from a CSV, Excel or Parquet file (path or file-like object),
+    picking the reader from the extension of ``filename`` or the source's name.
+    An unsupported type or a missing optional reader raises ``error`` (a
+    ``DemandTableError`` by default), naming the file ``kind``.
+    """
+    error = error or DemandTableError
+    name = filename or getattr(source, "name", None) or str(source)
+    ext = os.path.splitext(name)[1].lower()
+    try:
+        if ext in (".csv", ".txt"):
+            return pd.read_csv(source)
+        if ext in (".xlsx", ".xls"):
+            return pd.read_excel(source)
+        if ext in (".parquet", ".pq"):
+            return pd.read_parquet(source)
+    except ImportError as e:
+        raise error(f"Reading '{ext}' files requires an optional package that is not installed: {e}")
+    raise error(f"Unsupported {kind} file type '{ext}'. Use CSV, Excel or Parquet.")
+
+
+def read_demand_table(source, filename=None):
+    """
+    Reads a long-format demand table from a CSV, Excel or Parquet file (path or
+    file-like object) and returns it normalized by ``normalize_demand_table``.
+    """
+    return normalize_demand_table(read_table(source, filename, "demand"))
+
+
+def read_area_correlations(source, filename=None):
+    """
+    Reads area pair correlations (columns ``area``, ``other_area``,
+    ``correlation``; one row per pair, in either order) from a CSV, Excel or
+    Parquet file and returns them as ``{area: {other_area: rho}}``.
+    """
+    table = read_table(source, filename, "correlation").rename(columns=lambda c: str(c).strip().lower())
+    missing = [c for c in CORRELATION_TABLE_COLUMNS if c not in table.columns]
+    if missing:
+        raise DemandTableError(f"Correlation table is missing columns: {', '.join(missing)}.")
+    areas = table["area"].astype(str).str.strip().str.upper()
+    others = table["other_area"].astype(str).str.strip().str.upper()
+    rho = pd.to_numeric(table["correlation"], errors="coerce")
+    bad = rho.isna() | (rho < -1.0) | (rho > 1.0)
+    if bad.any():
+        raise DemandTableError(f"{int(bad.sum())} correlation rows are not a number between -1 and 1.")
+    correlations = {}
+    for area, other, value in zip(areas, others, rho):
+        if area != other:
+            correlations.setdefault(area, {})[other] = float(value)
+    return correlations
+
+
+def _parse_months(values):
+    month_lookup = {m.lower(): i for i, m in enumerate(MONTHS, start=1)}
+    as_text = values.astype(str).str.strip().str.lower().str[:3]
+    by_name = as_text.map(month_lookup)
+    by_number = pd.to_numeric(values, errors="coerce")
+    return by_name.fillna(by_number)
+
+
+def normalize_demand_table(table):
+    """
+    Validates a long demand table: lower-case column names, upper-case area
+    codes, months as 1-12 (numbers or month names), numeric value columns.
+    """
+    table = table.rename(columns=lambda c: str(c).strip().lower())
+    missing = [c for c in DEMAND_TABLE_COLUMNS if c not in table.columns]
+    if missing:
+        raise DemandTableError(f"Demand table is missing columns: {', '.join(missing)}.")
+    table = table[DEMAND_TABLE_COLUMNS].copy()
+    table["area"] = table["area"].astype(str).str.strip().str.upper()
+    table["brand"] = table["brand"].astype(str).str.strip()
+    table["month"] = _parse_months(table["month"])
+    bad_months = table["month"].isna() | ~table["month"].isin(range(1, 13))
+    if bad_months.any():
+        raise DemandTableError(f"{int(bad_months.sum())} demand rows have a month outside 1-12.")
+    table["month"] = table["month"].astype(int)
+    for col in ("forecast", "avg_daily", "std", "avg_order"):
+        table[col] = pd.to_numeric(table[col], errors="coerce").fillna(0.0).clip(lower=0.0)
+    return table.reset_index(drop=True)
+
+
+def demand_table_to_grid(table):
+    """Pivots a long demand table into the (area, brand) grid the editor shows."""
+    if table.empty:
+        return pd.DataFrame(columns=GRID_COLUMNS)
+    params = table.groupby(GRID_KEY_COLUMNS, sort=False)[GRID_PARAM_COLUMNS].first()
+    forecast = table.pivot_table(index=GRID_KEY_COLUMNS, columns="month", values="forecast", aggfunc="sum", fill_value=0.0, sort=False)
+    forecast = forecast.reindex(columns=range(1, 13), fill_value=0.0)
+    forecast.columns = MONTHS
+    return params.join(forecast).reset_index()[GRID_COLUMNS]
+
+
+def grid_to_demand_table(grid):
+    """Melts the editor grid back into the long table format used for import and export."""
+    long = grid.melt(id_vars=GRID_KEY_COLUMNS + GRID_PARAM_COLUMNS, value_vars=MONTHS, var_name="month", value_name="forecast")
+    long["month"] = long["month"].map({m: i for i, m in enumerate(MONTHS, start=1)})
+    return long.sort_values(GRID_KEY_COLUMNS + ["month"], kind="stable")[DEMAND_TABLE_COLUMNS].reset_index(drop=True)
+
+
+def default_demand_grid(areas, brands):
+    rows = [
+        dict({"area": area, "brand": brand}, **{c: DEFAULT_DEMAND[c] for c in GRID_PARAM_COLUMNS}, **{m: DEFAULT_DEMAND["forecast"] for m in MONTHS})
+        for area in areas for brand in brands
+    ]
+    return pd.DataFrame(rows, columns=GRID_COLUMNS)
+
+
+def merge_demand_grids(base, update):
+    """Rows of ``update`` replace rows of ``base`` with the same (area, brand)."""
+    combined = pd.concat([base, update], ignore_index=True)
+    return combined.drop_duplicates(subset=GRID_KEY_COLUMNS, keep="last").reset_index(drop=True)[GRID_COLUMNS]
+
+
+def grid_to_market_data(grid, areas=None):
+    """
+    Builds ``market_area_data`` from the editor grid. Rows without an area or
+    brand are ignored; ``areas`` restricts the result to the selected areas.
+    """
+    grid = grid.dropna(subset=GRID_KEY_COLUMNS)
+    grid = grid[(grid["area"].astype(str).str.strip() != "") & (grid["brand"].astype(str).str.strip() != "")]
+    if areas is not None:
+        grid = grid[grid["area"].isin(areas)]
+    grid = grid.drop_duplicates(subset=GRID_KEY_COLUMNS, keep="last")
+    values = grid[GRID_PARAM_COLUMNS + MONTHS].apply(pd.to_numeric, errors="coerce").fillna(0.0).clip(lower=0.0).to_numpy(dtype=float)
+    market_area_data = {area: {} for area in (areas or [])}
+    for area, brand, row in zip(grid["area"], grid["brand"], values.tolist()):
+        market_area_data.setdefault(area, {})[brand] = {
+            "avg_order_size": row[0],
+            "avg_daily_demand": row[1],
+            "std_daily_demand": row[2],
+            "forecast_demand": row[3:],
+        }
+    return market_area_data
+
+
+def market_data_to_grid(market_area_data):
+    """Inverse of ``grid_to_market_data``: one editor row per (area, brand)."""
+    rows = [
+        dict({"area": area, "brand": brand, "avg_order": values.get("avg_order_size", 0.0),
+              "avg_daily": values.get("avg_daily_demand", 0.0), "std": values.get("std_daily_demand", 0.0)},
+             **dict(zip(MONTHS, (list(values.get("forecast_demand", [])) + [0.0] * len(MONTHS))[:len(MONTHS)])))
+        for area, brand_data in market_area_data.items() for brand, values in brand_data.items()
+    ]
+    return pd.DataFrame(rows, columns=GRID_COLUMNS)
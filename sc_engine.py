@@ -0,0 +1,559 @@
+# -*- coding: utf-8 -*-
+"""
+Headless cost engine for the supply chain model.
+
+Takes the same ``market_area_data`` / ``warehouse_data`` structures that the
+Setup tab of SC!MODEL.py builds, plus a dict of global parameters, and returns
+rental, shipping, inventory and labor results as plain numbers. Nothing here
+imports Streamlit, so scenarios can be priced from scripts and batch jobs.
+"""
+from functools import lru_cache
+from math import sqrt, ceil
+
+import numpy as np
+from scipy.stats import norm
+
+from sc_demand import (
+    build_sparse_demand,
+    build_assignment_matrix,
+    build_front_matrix,
+    build_area_correlation,
+    compute_brand_monthly,
+    compute_warehouse_aggregates,
+    DEFAULT_CORRELATION_RANK,
+)
+from sc_containers import (
+    ContainerPlanError,
+    DEFAULT_CONTAINER_TYPES,
+    validate_container_types,
+    schedule_shipments,
+    plan_shipments,
+)
+from sc_routing import DEFAULT_DELIVERIES_PER_YEAR, build_distance_matrix, plan_routes
+from sc_geo import DEFAULT_ROAD_FACTOR, road_distance
+
+LAYOUT_CENTRAL = "Central and Fronts"
+LAYOUT_REGIONAL = "Main Regionals"
+
+TRANSFER_LEAD_TIME = 12          # days of FRONT demand buffered at the MAIN warehouse
+TRUCK_53_CAPACITY_FACTOR = 1.37  # 53ft truckload capacity relative to a 40ft one
+TRUCK_FILL_RATE = 0.85           # normalization for partially filled truckloads
+FINANCING_MARKUP = 1.08          # landed-cost markup applied to financed inventory
+MAIN_ORDERS_PER_YEAR = 6         # MAIN cycle stock is half an order of annual / 6
+
+DEFAULT_PARAMS = {
+    "interest_rate": 5.0,
+    "service_level": 0.95,
+    "layout_type": LAYOUT_CENTRAL,
+    "container_capacity_40": 600,
+    "brand_unit_prices": {"Heliocol": 80.0, "SunStar": 80.0, "SunValue": 80.0},
+    "sq_ft_per_unit": 0.8,
+    # Per-brand footprint in sq ft; brands not listed take sq_ft_per_unit.
+    "brand_sq_ft": {},
+    "overhead_factor_main": 1.2,
+    "overhead_factor_front": 1.5,
+    # Correlation of demand between market areas, for pooling safety stock:
+    # 1 adds the stds of the areas a warehouse serves up, 0 pools them as
+    # independent. area_correlations ({area: {area: rho}}) overrides pairs.
+    "demand_correlation": 1.0,
+    "area_correlations": {},
+    "correlation_rank": DEFAULT_CORRELATION_RANK,
+    # Container load planning: MAIN sea freight from shipments_per_year
+    # shipments packed into a mix of container_types (capacity and cost
+    # relative to a 40ft HC), instead of ceil(annual / capacity) 40ft HCs.
+    # MAIN cycle stock then follows the shipment size.
+    "shipment_planning": False,
+    "shipments_per_year": MAIN_ORDERS_PER_YEAR,
+    "container_types": DEFAULT_CONTAINER_TYPES,
+    # Regional delivery routes ('Main Regionals'): land orders consolidated
+    # into multi-stop truck routes, deliveries_per_year rounds a year, trucks
+    # of route_truck_capacity units (None: container_capacity_40).
+    # area_distances ({area: {area: miles}}) gives the miles between areas.
+    "land_routing": False,
+    "deliveries_per_year": DEFAULT_DELIVERIES_PER_YEAR,
+    "route_truck_capacity": None,
+    "area_distances": {},
+    # Coordinates ({location: [lat, lon]}) give road miles (great-circle miles
+    # x road_factor) wherever land_shipping_data has no distance.
+    "coordinates": {},
+    "road_factor": DEFAULT_ROAD_FACTOR,
+}
+
+
+class CostInputError(ValueError):
+    """Raised when the inputs of a cost component are invalid."""
+
+
+def resolve_params(params=None):
+    resolved = dict(DEFAULT_PARAMS)
+    if params:
+        resolved.update(params)
+    return resolved
+
+
+@lru_cache(maxsize=256)
+def compute_z_value(service_level):
+    if service_level >= 1.0:
+        return 5
+    if service_level <= 0.0:
+        return -5
+    return float(norm.ppf(service_level))
+
+
+def compute_brand_footprints(brands, params):
+    """Sq ft per unit of each brand in ``brands``: its ``brand_sq_ft`` entry, else ``sq_ft_per_unit``."""
+    brand_sq_ft = params["brand_sq_ft"]
+    return np.array([brand_sq_ft.get(brand, params["sq_ft_per_unit"]) for brand in brands], dtype=float)
+
+
+def validate_correlation_inputs(params):
+    p = params
+    if not 0.0 <= p["demand_correlation"] <= 1.0:
+        raise CostInputError("Demand Correlation between areas must be between 0 and 1.")
+    if any(not -1.0 <= rho <= 1.0 for row in p["area_correlations"].values() for rho in row.values()):
+        raise CostInputError("All area correlations must be between -1 and 1.")
+    if p["correlation_rank"] < 1:
+        raise CostInputError("Correlation rank must be at least 1.")
+
+
+def validate_planning_inputs(params):
+    try:
+        validate_container_types(params["container_types"], params["shipments_per_year"])
+    except ContainerPlanError as e:
+        raise CostInputError(str(e))
+
+
+def main_orders_per_year(params):
+    """Replenishment orders per year of a MAIN warehouse: its planned shipments, if any."""
+    return params["shipments_per_year"] if params["shipment_planning"] else MAIN_ORDERS_PER_YEAR
+
+
+def warehouse_label(index, warehouse):
+    return f"WH {index+1} ({warehouse.get('location')})"
+
+
+def warehouse_id(index, warehouse):
+    """Stable ID of a warehouse: its ``id`` field, or ``WH<n>`` from its position when unset."""
+    return warehouse.get("id") or f"WH{index+1}"
+
+
+def build_network_index(warehouse_data):
+    """
+    Resolves warehouse IDs and the MAIN -> FRONT links once, so every lookup
+    afterwards is a dict access. Returns ``ids`` (per position), ``position``
+    (ID -> position), ``main_of`` (FRONT position -> MAIN position),
+    ``fronts`` (MAIN position -> FRONT positions) and ``unresolved`` (FRONTs
+    whose ``serving_main_id`` does not name a MAIN).
+    """
+    ids = [warehouse_id(i, wh) for i, wh in enumerate(warehouse_data)]
+    position = {}
+    for i, wid in enumerate(ids):
+        if wid in position:
+            raise CostInputError(f"Warehouse ID '{wid}' is used by more than one warehouse.")
+        position[wid] = i
+    main_of = {}
+    fronts = {}
+    unresolved = []
+    for f, wh in enumerate(warehouse_data):
+        if wh.get("type") != "FRONT":
+            continue
+        m = position.get(wh.get("serving_main_id"))
+        if m is None or warehouse_data[m].get("type") != "MAIN":
+            unresolved.append(f)
+            continue
+        main_of[f] = m
+        fronts.setdefault(m, []).append(f)
+    return {"ids": ids, "position": position, "main_of": main_of, "fronts": fronts, "unresolved": unresolved}
+
+
+# =====================================================
+# Demand Aggregates
+# =====================================================
+def prepare_aggregates(warehouse_data, market_area_data, params=None, network=None):
+    """
+    Builds the sparse demand of a scenario and reduces it to the
+    per-warehouse aggregates shared by all cost components. ``network`` is
+    the result of ``build_network_index`` when the caller already has it.
+    """
+    p = resolve_params(params)
+    validate_correlation_inputs(p)
+    if network is None:
+        network = build_network_index(warehouse_data)
+    demand = build_sparse_demand(market_area_data, brands=p["brand_unit_prices"])
+    sq_ft = compute_brand_footprints(demand["brands"], p)
+    assignment = build_assignment_matrix(warehouse_data, demand)
+    fronts = build_front_matrix(len(warehouse_data), network["main_of"]) if p["layout_type"] == LAYOUT_CENTRAL else None
+    correlation = build_area_correlation(demand["areas"], p["demand_correlation"], p["area_correlations"], p["correlation_rank"])
+    aggregates = compute_warehouse_aggregates(demand, assignment, fronts, sq_ft, correlation)
+    aggregates["demand"] = demand
+    aggregates["sq_ft"] = sq_ft
+    aggregates["network"] = network
+    aggregates["correlation"] = correlation
+    if p["shipment_planning"]:
+        validate_planning_inputs(p)
+        aggregates["shipments"] = build_main_shipments(warehouse_data, demand, assignment, sq_ft, p)
+        aggregates["container_plan"] = plan_main_containers(aggregates["shipments"], len(warehouse_data), p)
+    return aggregates
+
+
+def build_main_shipments(warehouse_data, demand, assignment, sq_ft, params):
+    """
+    The shipments of every MAIN warehouse, cut from the monthly forecast of
+    the areas it serves, and the volume of a unit of each brand in container
+    slots (its footprint over ``sq_ft_per_unit``).
+    """
+    p = params
+    if p["sq_ft_per_unit"] <= 0 or (sq_ft <= 0).any():
+        raise CostInputError("Sq Ft per Unit must be positive for every SKU to plan container loads.")
+    rows = np.array([i for i, wh in enumerate(warehouse_data) if wh["type"] == "MAIN"], dtype=np.intp)
+    quantities, repeats = schedule_shipments(compute_brand_monthly(demand, assignment, rows), p["shipments_per_year"])
+    return {"rows": rows, "quantities": quantities, "repeats": repeats, "volumes": sq_ft / p["sq_ft_per_unit"]}
+
+
+def plan_main_containers(shipments, num_warehouses, params, capacity=None):
+    """
+    Containers of each type a year of shipments takes per warehouse (none
+    for FRONTs), with their loaded volume and capacity, for a 40ft HC of
+    ``capacity`` slots (default ``container_capacity_40``).
+    """
+    p = params
+    capacity = p["container_capacity_40"] if capacity is None else capacity
+    quantities = shipments["quantities"]
+    n_main, n_shipments, n_brands = quantities.shape
+    try:
+        plan = plan_shipments(quantities.reshape(-1, n_brands), shipments["volumes"], capacity, p["container_types"])
+    except ContainerPlanError as e:
+        raise CostInputError(str(e))
+
+    def per_warehouse(values):
+        totals = np.zeros((num_warehouses,) + values.shape[1:])
+        totals[shipments["rows"]] = values.reshape((n_main, n_shipments) + values.shape[1:]).sum(axis=1) * shipments["repeats"]
+        return totals
+
+    return {
+        "types": plan["types"],
+        "costs": plan["costs"],
+        "counts": per_warehouse(plan["counts"]),
+        "volume": per_warehouse(plan["volume"]),
+        "capacity": per_warehouse(plan["capacity"]),
+    }
+
+
+def compute_safety_stock_main(aggregates, w, lead_time, Z_val, layout, sq_ft=False):
+    """Safety stock a MAIN holds, in units or, with ``sq_ft``, in the square feet it occupies."""
+    suffix = "_sq_ft" if sq_ft else ""
+    safety_stock_main = aggregates["std" + suffix][w] * sqrt(lead_time) * Z_val if lead_time > 0 else 0
+    if layout == LAYOUT_CENTRAL:
+        safety_stock_main += TRANSFER_LEAD_TIME * aggregates["front_daily" + suffix][w]
+    return safety_stock_main
+
+
+def compute_inventory_breakdown(aggregates, w, lead_time, interest_rt, brand_prices, Z_val, layout, orders_per_year=MAIN_ORDERS_PER_YEAR):
+    """
+    Per-brand figures of warehouse ``w``, for the brands it carries only.
+    Cycle stock is half of an order of ``annual / orders_per_year``.
+    """
+    brands = aggregates["demand"]["brands"]
+    brand_annual = aggregates["brand_annual"]
+    entries = slice(brand_annual.indptr[w], brand_annual.indptr[w + 1])
+    carried = brand_annual.indices[entries]
+    annual = brand_annual.data[entries]
+    safety = aggregates["brand_std"].data[entries] * sqrt(lead_time) * Z_val
+    if layout == LAYOUT_CENTRAL:
+        safety = safety + TRANSFER_LEAD_TIME * aggregates["front_brand_daily"].data[entries]
+    avg_inventory = annual / (2.0 * orders_per_year) + safety
+    prices = np.array([brand_prices.get(brands[b], 0) for b in carried], dtype=float)
+    financing = avg_inventory * FINANCING_MARKUP * (interest_rt / 100.0) * prices
+    return {
+        brands[b]: {
+            "annual_forecast": float(annual[k]),
+            "safety_stock": float(safety[k]),
+            "avg_inventory": float(avg_inventory[k]),
+            "financing_cost": float(financing[k]),
+        }
+        for k, b in enumerate(carried)
+    }
+
+
+# =====================================================
+# Cost Components
+# =====================================================
+def compute_rental_row(i, wh, aggregates, params):
+    p = params
+    Z_val = compute_z_value(p["service_level"])
+    rent_method = wh["rent_pricing_method"]
+    rent_price = wh["rent_price"]
+    wh_type = wh["type"]
+    overhead = p["overhead_factor_main"] if wh_type == "MAIN" else p["overhead_factor_front"]
+    # Space is sized in square feet, each brand at its own footprint.
+    max_monthly = aggregates["peak_sq_ft"][i]
+    if wh_type == "MAIN":
+        safety_stock_main = compute_safety_stock_main(aggregates, i, wh.get("lt_shipping", 0), Z_val, p["layout_type"], sq_ft=True)
+        calculated_sq_ft = max_monthly + safety_stock_main
+    else:
+        calculated_sq_ft = (max_monthly / 4.0) + (aggregates["daily_sq_ft"][i] * 12.0)
+    wh_area = float(overhead * calculated_sq_ft)
+    if rent_method == "Fixed Rent Price":
+        wh_rental_cost = rent_price
+    else:
+        if aggregates["sq_ft"].min(initial=p["sq_ft_per_unit"]) <= 0 or rent_price <= 0:
+            raise CostInputError(f"Invalid rental parameters for Warehouse {i+1}.")
+        wh_rental_cost = rent_price * wh_area
+    return {
+        "index": i,
+        "warehouse_id": warehouse_id(i, wh),
+        "warehouse": warehouse_label(i, wh),
+        "type": wh_type,
+        "pricing_method": rent_method,
+        "sq_ft": wh_area,
+        "annual_rent": wh_rental_cost,
+    }
+
+
+def summarize_rental(details):
+    return {"total": float(sum(row["annual_rent"] for row in details)), "details": details}
+
+
+def calculate_rental_costs(warehouse_data, market_area_data, params=None, aggregates=None):
+    """Annual rent per warehouse, sized from peak monthly forecast plus safety stock."""
+    p = resolve_params(params)
+    if aggregates is None:
+        aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    return summarize_rental([compute_rental_row(i, wh, aggregates, p) for i, wh in enumerate(warehouse_data)])
+
+
+def validate_shipping_inputs(params):
+    if params["container_capacity_40"] <= 0:
+        raise CostInputError("Container Capacity must be positive.")
+    if params["land_routing"]:
+        if params["deliveries_per_year"] < 1:
+            raise CostInputError("Deliveries per Year must be at least 1.")
+        if params["route_truck_capacity"] is not None and params["route_truck_capacity"] <= 0:
+            raise CostInputError("Route Truck Capacity must be positive.")
+
+
+def resolve_land_distance(wh, area, ship_data, params):
+    """Miles from ``wh`` to ``area``: the entered distance, else road miles from the coordinates, else 0."""
+    distance = ship_data.get("distance")
+    if distance is None:
+        distance = road_distance(params["coordinates"], wh["location"], area, params["road_factor"])
+    return distance or 0
+
+
+def compute_land_routes(wh, aggregates, params):
+    """
+    Regional land freight of a MAIN delivered in multi-stop routes: the areas
+    of its ``land_shipping_data`` that have a cost and distance, priced per
+    route mile at the rate that makes out-and-back orders cost the per-order
+    estimate.
+    """
+    p = params
+    area_index = aggregates["demand"]["area_index"]
+    areas, distances, loads = [], [], []
+    estimate = out_and_back = 0.0
+    for area, ship_data in wh["land_shipping_data"].items():
+        a = area_index.get(area)
+        avg_order = ship_data.get("calculated_avg_order_size", 1)
+        cost_per_avg_order = ship_data.get("cost_for_avg_order", 0)
+        distance_val = resolve_land_distance(wh, area, ship_data, p)
+        if a is None or not (avg_order > 0 and cost_per_avg_order > 0 and distance_val > 0):
+            continue
+        num_orders = ceil(aggregates["area_annual"][a] / avg_order)
+        estimate += num_orders * cost_per_avg_order * distance_val
+        out_and_back += num_orders * 2.0 * distance_val
+        areas.append(area)
+        distances.append(distance_val)
+        loads.append(aggregates["area_monthly"][a])
+    if out_and_back <= 0:
+        return {"cost": 0.0, "miles": 0.0, "trips": 0.0}
+    capacity = p["route_truck_capacity"] or p["container_capacity_40"]
+    dist = build_distance_matrix(areas, distances, p["area_distances"], p["coordinates"], p["road_factor"])
+    routes = plan_routes(dist, np.array(loads), capacity, p["deliveries_per_year"])
+    return {"cost": routes["miles"] * estimate / out_and_back, "miles": routes["miles"], "trips": routes["trips"]}
+
+
+def compute_shipping_row(i, wh, aggregates, params):
+    """Returns the shipping row of one warehouse and any warnings raised while pricing it."""
+    p = params
+    capacity = p["container_capacity_40"]
+    layout = p["layout_type"]
+    area_index = aggregates["demand"]["area_index"]
+    warnings = []
+    annual_demand_wh = float(aggregates["annual"][i])
+    wh_shipping_cost = 0.0
+    num_containers = None
+    regional_land_cost = None
+    extra = {}
+    if wh["type"] == "MAIN":
+        cost_per_40hc = wh.get("shipping_cost_40hc", 0)
+        if cost_per_40hc <= 0 and annual_demand_wh > 0:
+            raise CostInputError(f"International Shipping Cost for WH {i+1} must be positive if demand exists.")
+        plan = aggregates.get("container_plan")
+        if plan is None:
+            num_containers = ceil(annual_demand_wh / capacity)
+            wh_shipping_cost = num_containers * cost_per_40hc
+        else:
+            counts = plan["counts"][i]
+            num_containers = int(counts.sum())
+            wh_shipping_cost = float(counts @ plan["costs"]) * cost_per_40hc
+            extra = {f"containers_{name}": int(n) for name, n in zip(plan["types"], counts)}
+            extra["container_fill_rate"] = float(plan["volume"][i] / plan["capacity"][i]) if plan["capacity"][i] > 0 else None
+        if layout == LAYOUT_REGIONAL and "land_shipping_data" in wh:
+            regional_land_cost = 0.0
+            for area, ship_data in wh["land_shipping_data"].items():
+                a = area_index.get(area)
+                area_annual_demand = aggregates["area_annual"][a] if a is not None else 0
+                area_avg_order_size = ship_data.get("calculated_avg_order_size", 1)
+                cost_per_avg_order = ship_data.get("cost_for_avg_order", 0)
+                distance_val = resolve_land_distance(wh, area, ship_data, p)
+                if area_avg_order_size > 0 and cost_per_avg_order > 0 and distance_val > 0:
+                    num_orders = ceil(area_annual_demand / area_avg_order_size)
+                    regional_land_cost += num_orders * cost_per_avg_order * distance_val
+                elif area_annual_demand > 0 and cost_per_avg_order <= 0:
+                    warnings.append(f"Missing regional shipping cost for {area} from {wh['location']}.")
+            if p["land_routing"]:
+                routes = compute_land_routes(wh, aggregates, p)
+                extra.update(regional_land_estimate=regional_land_cost, route_miles=routes["miles"], route_trips=routes["trips"])
+                regional_land_cost = routes["cost"]
+            wh_shipping_cost += regional_land_cost
+    elif wh["type"] == "FRONT" and layout == LAYOUT_CENTRAL:
+        # Weekly transfers of monthly_forecast / 4, costed at the average normalized
+        # per-unit rate of a 40ft and a 53ft truckload.
+        cost_40_unit = wh.get("front_shipping_cost_40", 0) / capacity
+        cost_53_unit = wh.get("front_shipping_cost_53", 0) / (capacity * TRUCK_53_CAPACITY_FACTOR)
+        normalized_cost = ((cost_40_unit + cost_53_unit) / 2.0) / TRUCK_FILL_RATE
+        weekly_demand = aggregates["monthly"][i] / 4.0
+        wh_shipping_cost = float((weekly_demand * normalized_cost * 4.0).sum())
+    row = {
+        "index": i,
+        "warehouse_id": warehouse_id(i, wh),
+        "warehouse": warehouse_label(i, wh),
+        "type": wh["type"],
+        "annual_demand": annual_demand_wh,
+        "num_containers": num_containers,
+        "regional_land_cost": regional_land_cost,
+        "annual_shipping_cost": wh_shipping_cost,
+    }
+    row.update(extra)
+    return row, warnings
+
+
+def summarize_shipping(details, warnings):
+    total_sea = float(sum(row["annual_shipping_cost"] for row in details if row["type"] == "MAIN"))
+    total_land = float(sum(row["annual_shipping_cost"] for row in details if row["type"] != "MAIN"))
+    return {
+        "total": total_sea + total_land,
+        "total_sea": total_sea,
+        "total_land": total_land,
+        "details": details,
+        "warnings": warnings,
+    }
+
+
+def calculate_shipping_costs(warehouse_data, market_area_data, params=None, aggregates=None):
+    """Ocean freight for MAIN warehouses plus regional and MAIN→FRONT land freight."""
+    p = resolve_params(params)
+    validate_shipping_inputs(p)
+    if aggregates is None:
+        aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    details = []
+    warnings = []
+    for i, wh in enumerate(warehouse_data):
+        row, row_warnings = compute_shipping_row(i, wh, aggregates, p)
+        details.append(row)
+        warnings.extend(row_warnings)
+    return summarize_shipping(details, warnings)
+
+
+def validate_inventory_inputs(warehouse_data, params):
+    p = params
+    if p["interest_rate"] < 0 or p["service_level"] < 0:
+        raise CostInputError("Interest Rate and Service Level must be non-negative.")
+    if any(price <= 0 for price in p["brand_unit_prices"].values()):
+        raise CostInputError("All Brand Unit Prices must be positive.")
+    main_indices = [i for i, wh in enumerate(warehouse_data) if wh["type"] == "MAIN"]
+    if p["layout_type"] == LAYOUT_CENTRAL and len(main_indices) != 1:
+        raise CostInputError("Exactly one MAIN warehouse must be configured for 'Central and Fronts'.")
+    return main_indices
+
+
+def compute_inventory_rows(i, wh, aggregates, params):
+    p = params
+    Z_val = compute_z_value(p["service_level"])
+    breakdown = compute_inventory_breakdown(aggregates, i, wh.get("lt_shipping", 0), p["interest_rate"], p["brand_unit_prices"], Z_val, p["layout_type"], main_orders_per_year(p))
+    return [{
+        "index": i,
+        "warehouse_id": warehouse_id(i, wh),
+        "warehouse": warehouse_label(i, wh),
+        "brand": brand,
+        "annual_forecast": bdata["annual_forecast"],
+        "safety_stock": bdata["safety_stock"],
+        "avg_inventory": bdata["avg_inventory"],
+        "financing_cost": bdata["financing_cost"],
+    } for brand, bdata in breakdown.items()]
+
+
+def summarize_inventory(details):
+    return {
+        "total": float(sum(row["financing_cost"] for row in details)),
+        "total_avg_inventory": float(sum(row["avg_inventory"] for row in details)),
+        "total_safety_stock": float(sum(row["safety_stock"] for row in details)),
+        "details": details,
+    }
+
+
+def calculate_inventory_costs(warehouse_data, market_area_data, params=None, aggregates=None):
+    """Per-brand safety stock, average inventory and financing cost of MAIN warehouses, one row per brand carried."""
+    p = resolve_params(params)
+    main_indices = validate_inventory_inputs(warehouse_data, p)
+    if aggregates is None:
+        aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    details = []
+    for i in main_indices:
+        details.extend(compute_inventory_rows(i, warehouse_data[i], aggregates, p))
+    return summarize_inventory(details)
+
+
+def compute_labor_row(i, wh):
+    num_emp = wh.get("num_employees", 0)
+    salary = wh.get("avg_employee_salary", 0)
+    if num_emp < 0 or salary < 0:
+        raise CostInputError(f"Employees and salary must be non-negative for Warehouse {i+1}.")
+    return {
+        "index": i,
+        "warehouse_id": warehouse_id(i, wh),
+        "warehouse": warehouse_label(i, wh),
+        "type": wh["type"],
+        "num_employees": num_emp,
+        "avg_salary": salary,
+        "annual_labor_cost": num_emp * salary,
+    }
+
+
+def summarize_labor(details):
+    return {"total": float(sum(row["annual_labor_cost"] for row in details)), "details": details}
+
+
+def calculate_labor_costs(warehouse_data, params=None):
+    """Headcount times average salary per warehouse."""
+    return summarize_labor([compute_labor_row(i, wh) for i, wh in enumerate(warehouse_data)])
+
+
+def evaluate_scenario(market_area_data, warehouse_data, params=None):
+    """
+    Prices one network. Returns a dict with the four component results and the
+    grand total; raises CostInputError if any component's inputs are invalid.
+    """
+    p = resolve_params(params)
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    rental = calculate_rental_costs(warehouse_data, market_area_data, p, aggregates)
+    shipping = calculate_shipping_costs(warehouse_data, market_area_data, p, aggregates)
+    inventory = calculate_inventory_costs(warehouse_data, market_area_data, p, aggregates)
+    labor = calculate_labor_costs(warehouse_data, p)
+    return {
+        "rental": rental,
+        "shipping": shipping,
+        "inventory": inventory,
+        "labor": labor,
+        "grand_total": rental["total"] + shipping["total"] + inventory["total"] + labor["total"],
+    }
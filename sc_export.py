@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming export of scenarios to Excel, CSV or Parquet.
+
+A scenario is a dict with ``name``, ``market_area_data``, ``warehouse_data``,
+``params`` and optionally ``result`` (the dict returned by
+``evaluate_scenario``; it is computed when missing). Scenarios are consumed
+one at a time from any iterable and turned into rows of a fixed set of
+tables: the input configuration (parameters, demand, warehouses, land
+shipping) plus a summary and the four cost components. Rows are written as
+they are produced, so exporting a generator of thousands of scenarios never
+holds more than one scenario (or one Parquet batch) in memory.
+
+Every column has a fixed type; costs and quantities are written as numbers,
+never as formatted strings.
+"""
+import csv
+import io
+import math
+import os
+import tempfile
+import zipfile
+
+import xlsxwriter
+
+from sc_demand import MONTHS
+from sc_engine import resolve_params, warehouse_id, evaluate_scenario
+
+# Table -> [(column, type)], type one of "str", "float", "int".
+EXPORT_TABLES = {
+    "Summary": [
+        ("scenario", "str"), ("rental", "float"), ("shipping", "float"),
+        ("inventory", "float"), ("labor", "float"), ("grand_total", "float"),
+    ],
+    "Parameters": [("scenario", "str"), ("parameter", "str"), ("value", "str")],
+    "Demand": [
+        ("scenario", "str"), ("area", "str"), ("brand", "str"), ("month", "int"),
+        ("forecast", "float"), ("avg_daily", "float"), ("std", "float"), ("avg_order", "float"),
+    ],
+    "Warehouses": [
+        ("scenario", "str"), ("warehouse_id", "str"), ("location", "str"), ("type", "str"),
+        ("served_markets", "str"), ("serving_main_id", "str"), ("rent_pricing_method", "str"),
+        ("rent_price", "float"), ("num_employees", "int"), ("avg_employee_salary", "float"),
+        ("lt_shipping", "int"), ("shipping_cost_40hc", "float"),
+        ("front_shipping_cost_40", "float"), ("front_shipping_cost_53", "float"),
+    ],
+    "LandShipping": [
+        ("scenario", "str"), ("warehouse_id", "str"), ("area", "str"), ("distance", "float"),
+        ("cost_for_avg_order", "float"), ("calculated_avg_order_size", "float"),
+    ],
+    "RentalCosts": [
+        ("scenario", "str"), ("warehouse_id", "str"), ("warehouse", "str"), ("type", "str"),
+        ("pricing_method", "str"), ("sq_ft", "float"), ("annual_rent", "float"),
+    ],
+    "ShippingCosts": [
+        ("scenario", "str"), ("warehouse_id", "str"), ("warehouse", "str"), ("type", "str"),
+        ("annual_demand", "float"), ("num_containers", "int"), ("regional_land_cost", "float"),
+        ("annual_shipping_cost", "float"),
+    ],
+    "InventoryCosts": [
+        ("scenario", "str"), ("warehouse_id", "str"), ("warehouse", "str"), ("brand", "str"),
+        ("annual_forecast", "float"), ("safety_stock", "float"), ("avg_inventory", "float"),
+        ("financing_cost", "float"),
+    ],
+    "LaborCosts": [
+        ("scenario", "str"), ("warehouse_id", "str"), ("warehouse", "str"), ("type", "str"),
+        ("num_employees", "int"), ("avg_salary", "float"), ("annual_labor_cost", "float"),
+    ],
+}
+
+COMPONENT_TABLES = {
+    "rental": "RentalCosts",
+    "shipping": "ShippingCosts",
+    "inventory": "InventoryCosts",
+    "labor": "LaborCosts",
+}
+
+EXPORT_FORMATS = {
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", ".xlsx"),
+    "csv": ("application/zip", "_csv.zip"),
+    "parquet": ("application/zip", "_parquet.zip"),
+}
+
+XLSX_MAX_ROWS = 1_048_576
+
+
+def _typed(value, kind):
+    """Coerces a value to its column type; missing values (None, NaN) become None."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if kind == "float":
+        return float(value)
+    if kind == "int":
+        return int(value)
+    return str(value)
+
+
+def _parameter_rows(params):
+    for key, value in params.items():
+        if isinstance(value, dict):
+            for sub_key, sub_value in value.items():
+                yield f"{key}.{sub_key}", sub_value
+        else:
+            yield key, value
+
+
+def scenario_rows(scenario):
+    """Yields ``(table, row)`` pairs for one scenario, rows as typed tuples in column order."""
+    name = scenario["name"]
+    market_area_data = scenario["market_area_data"]
+    warehouse_data = scenario["warehouse_data"]
+    params = resolve_params(scenario.get("params"))
+    result = scenario.get("result") or evaluate_scenario(market_area_data, warehouse_data, params)
+
+    def row(table, values):
+        return table, tuple(_typed(values.get(col), kind) for col, kind in EXPORT_TABLES[table])
+
+    yield row("Summary", {
+        "scenario": name,
+        "rental": result["rental"]["total"],
+        "shipping": result["shipping"]["total"],
+        "inventory": result["inventory"]["total"],
+        "labor": result["labor"]["total"],
+        "grand_total": result.get("grand_total", sum(result[c]["total"] for c in COMPONENT_TABLES)),
+    })
+    for key, value in _parameter_rows(params):
+        yield row("Parameters", {"scenario": name, "parameter": key, "value": value})
+    for area, brand_data in market_area_data.items():
+        for brand, values in brand_data.items():
+            forecast = list(values.get("forecast_demand", []))[:len(MONTHS)]
+            for m, qty in enumerate(forecast, start=1):
+                yield row("Demand", {
+                    "scenario": name, "area": area, "brand": brand, "month": m, "forecast": qty,
+                    "avg_daily": values.get("avg_daily_demand"), "std": values.get("std_daily_demand"),
+                    "avg_order": values.get("avg_order_size"),
+                })
+    for i, wh in enumerate(warehouse_data):
+        wid = warehouse_id(i, wh)
+        yield row("Warehouses", dict(wh, scenario=name, warehouse_id=wid, served_markets=", ".join(wh.get("served_markets", []))))
+        for area, land in wh.get("land_shipping_data", {}).items():
+            yield row("LandShipping", dict(land, scenario=name, warehouse_id=wid, area=area))
+    for component, table in COMPONENT_TABLES.items():
+        for detail in result[component]["details"]:
+            yield row(table, dict(detail, scenario=name))
+
+
+# =====================================================
+# Writers
+# =====================================================
+def export_xlsx(scenarios, target, constant_memory=True):
+    """
+    Writes one sheet per table to ``target`` (path or binary file object).
+    In constant-memory mode xlsxwriter flushes each row to disk as soon as the
+    next one starts. Tables longer than Excel's row limit continue on
+    "<table> (2)", "<table> (3)", ...
+    """
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": constant_memory})
+    header_format = workbook.add_format({"bold": True})
+    sheets = {}
+
+    def new_sheet(table, part):
+        sheet = workbook.add_worksheet(table if part == 1 else f"{table} ({part})")
+        sheet.write_row(0, 0, [col for col, _ in EXPORT_TABLES[table]], header_format)
+        sheets[table] = [sheet, 1, part]
+
+    for table in EXPORT_TABLES:
+        new_sheet(table, 1)
+    for scenario in scenarios:
+        for table, values in scenario_rows(scenario):
+            sheet, r, part = sheets[table]
+            if r >= XLSX_MAX_ROWS:
+                new_sheet(table, part + 1)
+                sheet, r, part = sheets[table]
+            for c, value in enumerate(values):
+                if value is None:
+                    continue
+                if isinstance(value, str):
+                    sheet.write_string(r, c, value)
+                else:
+                    sheet.write_number(r, c, value)
+            sheets[table][1] = r + 1
+    workbook.close()
+
+
+def export_csv(scenarios, directory):
+    """Writes ``<table>.csv`` per table into ``directory``; missing values are empty fields."""
+    os.makedirs(directory, exist_ok=True)
+    files = {table: open(os.path.join(directory, f"{table}.csv"), "w", newline="", encoding="utf-8") for table in EXPORT_TABLES}
+    try:
+        writers = {table: csv.writer(f) for table, f in files.items()}
+        for table, writer in writers.items():
+            writer.writerow([col for col, _ in EXPORT_TABLES[table]])
+        for scenario in scenarios:
+            for table, values in scenario_rows(scenario):
+                writers[table].writerow(["" if v is None else v for v in values])
+    finally:
+        for f in files.values():
+            f.close()
+
+
+def export_parquet(scenarios, directory, batch_rows=50_000):
+    """
+    Writes ``<table>.parquet`` per table into ``directory``, buffering at most
+    ``batch_rows`` rows per table before each row group is written.
+    Requires the optional ``pyarrow`` package.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet export requires the optional 'pyarrow' package.") from e
+    arrow_types = {"str": pa.string(), "float": pa.float64(), "int": pa.int64()}
+    schemas = {table: pa.schema([(col, arrow_types[kind]) for col, kind in cols]) for table, cols in EXPORT_TABLES.items()}
+    os.makedirs(directory, exist_ok=True)
+    writers = {table: pq.ParquetWriter(os.path.join(directory, f"{table}.parquet"), schema) for table, schema in schemas.items()}
+    buffers = {table: [] for table in EXPORT_TABLES}
+
+    def flush(table):
+        if buffers[table]:
+            columns = list(zip(*buffers[table]))
+            writers[table].write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schemas[table])], schema=schemas[table]))
+            buffers[table] = []
+
+    try:
+        for scenario in scenarios:
+            for table, values in scenario_rows(scenario):
+                buffers[table].append(values)
+                if len(buffers[table]) >= batch_rows:
+                    flush(table)
+        for table in EXPORT_TABLES:
+            flush(table)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+
+def export_scenarios(scenarios, target, fmt="xlsx"):
+    """Exports to a path: a workbook for "xlsx", a directory of files for "csv" and "parquet"."""
+    if fmt == "xlsx":
+        export_xlsx(scenarios, target)
+    elif fmt == "csv":
+        export_csv(scenarios, target)
+    elif fmt == "parquet":
+        export_parquet(scenarios, target)
+    else:
+        raise ValueError(f"Unknown export format '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+
+
+def export_to_bytes(scenarios, fmt="xlsx"):
+    """Exports for a download: the workbook itself, or the CSV/Parquet files zipped."""
+    if fmt == "xlsx":
+        output = io.BytesIO()
+        export_xlsx(scenarios, output)
+        return output.getvalue()
+    output = io.BytesIO()
+    with tempfile.TemporaryDirectory() as directory:
+        export_scenarios(scenarios, directory, fmt)
+        with zipfile.ZipFile(output, "w", zipfile.ZIP_DEFLATED) as archive:
+            for file_name in sorted(os.listdir(directory)):
+                archive.write(os.path.join(directory, file_name), file_name)
+    return output.getvalue()
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Coordinates of market areas and warehouse locations, and road distances.
+
+A coordinate table has one row per location (``location``, ``lat``, ``lon``
+in decimal degrees) and can be loaded from a CSV, Excel or Parquet file or
+edited as a grid; as a parameter it is ``{location: [lat, lon]}``. Road
+miles are great-circle (haversine) miles times a road factor for the
+detours of the road network. Whole matrices are computed in one vectorized
+pass and cached per coordinate set, so hundreds of pairs cost well under a
+millisecond once the table is known.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from sc_demand import read_table
+
+EARTH_RADIUS_MILES = 3958.8
+DEFAULT_ROAD_FACTOR = 1.2  # typical ratio of road to great-circle distance
+
+COORDINATE_COLUMNS = ["location", "lat", "lon"]
+
+# A representative city for each default market area.
+DEFAULT_COORDINATES = {
+    "FL": [28.54, -81.38],        # Orlando
+    "CA_SOUTH": [34.05, -118.24],  # Los Angeles
+    "CA_NORTH": [37.77, -122.42],  # San Francisco
+    "TX": [32.78, -96.80],        # Dallas
+    "NJ": [40.74, -74.17],        # Newark
+}
+
+
+class CoordinateError(ValueError):
+    """Raised when an imported coordinate table cannot be read or is malformed."""
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """Great-circle miles between points given in degrees; arguments broadcast."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    h = np.sin((lat2 - lat1) / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def _freeze(coordinates):
+    return tuple(sorted((str(loc), float(lat), float(lon)) for loc, (lat, lon) in coordinates.items()))
+
+
+@lru_cache(maxsize=32)
+def _cached_matrix(frozen, road_factor):
+    locations = [loc for loc, _, _ in frozen]
+    lat = np.array([lat for _, lat, _ in frozen])
+    lon = np.array([lon for _, _, lon in frozen])
+    matrix = haversine_miles(lat[:, None], lon[:, None], lat[None, :], lon[None, :]) * road_factor
+    matrix.setflags(write=False)
+    return {loc: k for k, loc in enumerate(locations)}, matrix
+
+
+def distance_matrix(coordinates, road_factor=DEFAULT_ROAD_FACTOR):
+    """``(index, matrix)``: road miles between all located places, ``index`` mapping a location to its row."""
+    return _cached_matrix(_freeze(coordinates or {}), float(road_factor))
+
+
+def road_distances(coordinates, origins, destinations, road_factor=DEFAULT_ROAD_FACTOR):
+    """(origins x destinations) road miles, NaN where a location has no coordinates."""
+    index, matrix = distance_matrix(coordinates, road_factor)
+    rows = np.array([index.get(loc, -1) for loc in origins], dtype=np.intp)
+    cols = np.array([index.get(loc, -1) for loc in destinations], dtype=np.intp)
+    out = np.full((len(rows), len(cols)), np.nan)
+    known_rows, known_cols = rows >= 0, cols >= 0
+    out[np.ix_(known_rows, known_cols)] = matrix[np.ix_(rows[known_rows], cols[known_cols])]
+    return out
+
+
+def road_distance(coordinates, origin, destination, road_factor=DEFAULT_ROAD_FACTOR):
+    """Road miles between two locations, or None if either has no coordinates."""
+    miles = road_distances(coordinates, [origin], [destination], road_factor)[0, 0]
+    return None if np.isnan(miles) else float(miles)
+
+
+def read_coordinates(source, filename=None):
+    """
+    Reads a coordinate table from a CSV, Excel or Parquet file (path or
+    file-like object) and returns it normalized by ``normalize_coordinates``.
+    """
+    return normalize_coordinates(read_table(source, filename, "coordinate", CoordinateError))
+
+
+def normalize_coordinates(table):
+    """
+    Validates a coordinate table: lower-case column names (``area``,
+    ``latitude`` and ``longitude`` are accepted too), unique upper-case
+    locations, latitudes within ±90 and longitudes within ±180 degrees.
+    """
+    table = table.rename(columns=lambda c: str(c).strip().lower())
+    table = table.rename(columns={"area": "location", "latitude": "lat", "longitude": "lon", "lng": "lon"})
+    missing = [c for c in COORDINATE_COLUMNS if c not in table.columns]
+    if missing:
+        raise CoordinateError(f"Coordinate table is missing columns: {', '.join(missing)}.")
+    table = table[COORDINATE_COLUMNS].copy()
+    table["location"] = table["location"].astype(str).str.strip().str.upper()
+    table = table[(table["location"] != "") & (table["location"] != "NAN")]
+    duplicates = table["location"][table["location"].duplicated()].unique()
+    if len(duplicates):
+        raise CoordinateError(f"Locations listed more than once: {', '.join(duplicates[:10])}.")
+    table["lat"] = pd.to_numeric(table["lat"], errors="coerce")
+    table["lon"] = pd.to_numeric(table["lon"], errors="coerce")
+    bad = table["location"][~(table["lat"].abs() <= 90) | ~(table["lon"].abs() <= 180)]
+    if len(bad):
+        raise CoordinateError(f"{len(bad)} locations have no valid latitude/longitude, e.g. {', '.join(bad[:5])}.")
+    return table.reset_index(drop=True)
+
+
+def coordinates_to_table(coordinates):
+    return pd.DataFrame(
+        [[loc, lat, lon] for loc, (lat, lon) in coordinates.items()],
+        columns=COORDINATE_COLUMNS,
+    )
+
+
+def table_to_coordinates(table):
+    """``{location: [lat, lon]}`` from a coordinate grid; incomplete rows are left out."""
+    table = table.dropna(subset=COORDINATE_COLUMNS)
+    return {
+        str(loc).strip().upper(): [float(lat), float(lon)]
+        for loc, lat, lon in zip(table["location"], table["lat"], table["lon"])
+        if str(loc).strip()
+    }
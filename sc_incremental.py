@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Dependency-tracked incremental recalculation of the cost components.
+
+Each component declares which global parameters, warehouse fields and demand
+it reads. A warehouse's row is cached under a hash of exactly those inputs, so
+after an edit only the rows whose inputs changed are recomputed: changing one
+warehouse's salary re-prices one labor row and nothing else, while changing a
+market area's forecast re-prices the warehouses that serve it (and, in
+'Central and Fronts', the MAIN supplying them).
+
+Rows live in a result cache (see sc_cache) under "<component>-row:<hash>"
+keys, so sessions sharing the process-wide cache also share rows.
+
+The same hashes give a fingerprint per component, which the app stores next
+to each result so results whose inputs have since changed can be flagged as
+stale instead of being shown as current.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import time
+
+from sc_cache import cache_get, cache_put
+from sc_engine import (
+    CostInputError,
+    LAYOUT_CENTRAL,
+    resolve_params,
+    warehouse_id,
+    build_network_index,
+    prepare_aggregates,
+    compute_rental_row,
+    compute_shipping_row,
+    compute_inventory_rows,
+    compute_labor_row,
+    validate_shipping_inputs,
+    validate_inventory_inputs,
+    summarize_rental,
+    summarize_shipping,
+    summarize_inventory,
+    summarize_labor,
+)
+
+COMPONENTS = ("rental", "shipping", "inventory", "labor")
+
+# What each component reads. "demand" covers the served markets of the
+# warehouse and its land-shipping areas (hashed separately, since the engine
+# treats them differently) and, for a MAIN in 'Central and Fronts', the
+# markets of its FRONTs.
+COMPONENT_INPUTS = {
+    "rental": {
+        "params": ("service_level", "layout_type", "sq_ft_per_unit", "brand_sq_ft", "overhead_factor_main", "overhead_factor_front",
+                   "demand_correlation", "area_correlations", "correlation_rank"),
+        "warehouse": ("location", "type", "rent_pricing_method", "rent_price", "lt_shipping"),
+        "demand": True,
+    },
+    "shipping": {
+        "params": ("container_capacity_40", "layout_type", "shipment_planning", "shipments_per_year", "container_types",
+                   "sq_ft_per_unit", "brand_sq_ft", "land_routing", "deliveries_per_year", "route_truck_capacity", "area_distances",
+                   "coordinates", "road_factor"),
+        "warehouse": ("location", "type", "shipping_cost_40hc", "land_shipping_data", "front_shipping_cost_40", "front_shipping_cost_53"),
+        "demand": True,
+    },
+    "inventory": {
+        "params": ("interest_rate", "service_level", "layout_type", "brand_unit_prices",
+                   "demand_correlation", "area_correlations", "correlation_rank", "shipment_planning", "shipments_per_year"),
+        "warehouse": ("location", "type", "lt_shipping"),
+        "demand": True,
+    },
+    "labor": {
+        "params": (),
+        "warehouse": ("location", "type", "num_employees", "avg_employee_salary"),
+        "demand": False,
+    },
+}
+
+
+def _digest(obj):
+    return hashlib.blake2b(json.dumps(obj, sort_keys=True, default=str).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _demand_inputs(warehouse_data, params, area_digests):
+    """Per warehouse, the demand its rows depend on: own areas plus each supplied FRONT's areas."""
+    def digests(areas):
+        return sorted((area, area_digests.get(area)) for area in areas)
+
+    own = [[digests(wh.get("served_markets", [])), digests(wh.get("land_shipping_data", {}))] for wh in warehouse_data]
+    fronts = [[] for _ in warehouse_data]
+    if params["layout_type"] == LAYOUT_CENTRAL:
+        for f, m in build_network_index(warehouse_data)["main_of"].items():
+            fronts[m].append(digests(warehouse_data[f].get("served_markets", [])))
+    return [[own[i], sorted(fronts[i])] for i in range(len(warehouse_data))]
+
+
+def compute_row_keys(component, warehouse_data, market_area_data, params=None, area_digests=None):
+    """One input hash per warehouse for ``component``."""
+    p = resolve_params(params)
+    spec = COMPONENT_INPUTS[component]
+    param_values = [p[name] for name in spec["params"]]
+    if spec["demand"]:
+        if area_digests is None:
+            area_digests = {area: _digest(data) for area, data in market_area_data.items()}
+        demand_inputs = _demand_inputs(warehouse_data, p, area_digests)
+    keys = []
+    for i, wh in enumerate(warehouse_data):
+        inputs = [i, warehouse_id(i, wh), param_values, [wh.get(name) for name in spec["warehouse"]]]
+        if spec["demand"]:
+            inputs.append(demand_inputs[i])
+        keys.append(_digest(inputs))
+    return keys
+
+
+def compute_fingerprints(warehouse_data, market_area_data, params=None):
+    """Component -> hash of all of its inputs; compare with a stored value to detect stale results."""
+    p = resolve_params(params)
+    area_digests = {area: _digest(data) for area, data in market_area_data.items()}
+    return {
+        component: _digest(compute_row_keys(component, warehouse_data, market_area_data, p, area_digests))
+        for component in COMPONENTS
+    }
+
+
+def recalculate_component(component, warehouse_data, market_area_data, params, cache, aggregates=None):
+    """
+    Prices ``component`` reusing every cached row whose inputs are unchanged.
+    ``cache`` is a result cache (``sc_cache.new_cache`` or the shared one);
+    new rows are added to it. ``aggregates`` may be passed in to share them
+    between components. Returns the same result dict
+    as the matching ``calculate_*`` function plus ``recomputed`` / ``reused``
+    row counts.
+    """
+    p = resolve_params(params)
+    if component == "shipping":
+        validate_shipping_inputs(p)
+        indices = range(len(warehouse_data))
+    elif component == "inventory":
+        indices = validate_inventory_inputs(warehouse_data, p)
+    else:
+        indices = range(len(warehouse_data))
+    keys = compute_row_keys(component, warehouse_data, market_area_data, p)
+    rows = []
+    recomputed = 0
+    for i in indices:
+        key = f"{component}-row:{keys[i]}"
+        row = cache_get(cache, key)
+        if row is None:
+            wh = warehouse_data[i]
+            if component == "labor":
+                row = compute_labor_row(i, wh)
+            else:
+                if aggregates is None:
+                    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+                if component == "rental":
+                    row = compute_rental_row(i, wh, aggregates, p)
+                elif component == "shipping":
+                    row = compute_shipping_row(i, wh, aggregates, p)
+                else:
+                    row = compute_inventory_rows(i, wh, aggregates, p)
+            cache_put(cache, key, row)
+            recomputed += 1
+        rows.append(row)
+
+    if component == "rental":
+        result = summarize_rental(rows)
+    elif component == "shipping":
+        details = [row for row, _ in rows]
+        warnings = [msg for _, row_warnings in rows for msg in row_warnings]
+        result = summarize_shipping(details, warnings)
+    elif component == "inventory":
+        result = summarize_inventory([row for brand_rows in rows for row in brand_rows])
+    else:
+        result = summarize_labor(rows)
+    result["recomputed"] = recomputed
+    result["reused"] = len(rows) - recomputed
+    return result
+
+
+def recalculate_all(warehouse_data, market_area_data, params, cache, max_workers=len(COMPONENTS), components=COMPONENTS):
+    """
+    Prices ``components`` (all four by default) in one pass: the demand
+    aggregates are built once and shared, and the components run
+    concurrently. A component with invalid inputs does not stop the others; its message is returned under
+    ``errors``. ``elapsed`` is the wall time of the whole pipeline in seconds.
+    """
+    start = time.perf_counter()
+    p = resolve_params(params)
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            component: pool.submit(recalculate_component, component, warehouse_data, market_area_data, p, cache, aggregates)
+            for component in components
+        }
+        for component, future in futures.items():
+            try:
+                results[component] = future.result()
+            except CostInputError as e:
+                errors[component] = str(e)
+    return {"results": results, "errors": errors, "elapsed": time.perf_counter() - start}
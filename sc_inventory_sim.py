@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Day-by-day inventory simulation of the warehouse network.
+
+The cost engine works with annual averages (average inventory is
+``annual / 12 + safety_stock``). This module steps through the year one day
+at a time instead, driven by the 12-month ``forecast_demand`` profile, and
+tracks on-hand stock, container arrivals, MAIN -> FRONT transfers and lost
+sales for every (warehouse, brand) series at once. The loop runs over days
+only; each step is a handful of array operations over all series.
+
+- Customer demand of an area is served by the FRONTs serving it, or by its
+  MAINs when no FRONT does; several such warehouses split it evenly.
+- MAIN: continuous review. When stock on hand plus on order falls to the
+  reorder point (expected lead-time outflow plus the engine's safety stock),
+  whole order quantities of ``annual / 6`` (``annual / shipments_per_year``
+  with container load planning) are ordered and arrive as
+  containers after ``lt_shipping`` days.
+- FRONT: weekly review. Each week it orders up to the expected demand over
+  the week plus the transfer lead time; its MAIN ships what it has on hand,
+  pro rata when several FRONTs ask for more than that, and the goods
+  arrive after TRANSFER_LEAD_TIME days.
+
+Unfilled demand is lost, not backordered. With ``seed`` set, daily demand
+gets normal noise with ``std_daily_demand`` (truncated at zero); otherwise
+the forecast is followed exactly.
+"""
+import time
+
+import numpy as np
+
+from sc_demand import MONTHS, build_assignment_matrix, densify_demand
+from sc_engine import (
+    CostInputError,
+    LAYOUT_CENTRAL,
+    TRANSFER_LEAD_TIME,
+    resolve_params,
+    main_orders_per_year,
+    compute_z_value,
+    warehouse_id,
+    warehouse_label,
+    prepare_aggregates,
+    build_front_matrix,
+)
+
+DAYS_PER_MONTH = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+FRONT_REVIEW_DAYS = 7
+
+
+def build_allocation_matrix(warehouse_data, assignment, network, layout):
+    """
+    (warehouse x area) share of each area's customer demand served from each
+    warehouse: FRONTs first (in 'Central and Fronts'), otherwise MAINs.
+    """
+    is_front = np.array([wh.get("type") == "FRONT" for wh in warehouse_data])
+    leaf = assignment.copy()
+    if layout == LAYOUT_CENTRAL:
+        fronts_linked = np.zeros(len(warehouse_data), dtype=bool)
+        fronts_linked[list(network["main_of"])] = True
+        covered = (assignment[fronts_linked] > 0).any(axis=0)
+        leaf[~is_front] *= ~covered
+        leaf[is_front & ~fronts_linked] = 0.0
+    else:
+        leaf[is_front] = 0.0
+    counts = leaf.sum(axis=0)
+    return leaf / np.where(counts > 0, counts, 1.0)
+
+
+def daily_demand_profile(cube, days, seed=None):
+    """
+    (day x area x brand) customer demand: each month's forecast spread evenly
+    over its days, repeated beyond one year; with ``seed``, plus daily noise.
+    """
+    month_of_day = np.repeat(np.arange(len(MONTHS)), DAYS_PER_MONTH)
+    month_of_day = np.resize(month_of_day, days)
+    per_day = cube["forecast"] / np.array(DAYS_PER_MONTH, dtype=float)
+    demand = np.moveaxis(per_day, 2, 0)[month_of_day]
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        demand = np.maximum(demand + rng.standard_normal(demand.shape) * cube["std_daily"], 0.0)
+    return demand
+
+
+def simulate_inventory(market_area_data, warehouse_data, params=None, days=365, seed=None):
+    """
+    Simulates ``days`` days for every (warehouse, brand) series. Returns the
+    daily on-hand stock ``inventory`` (day x warehouse x brand), per-series
+    ``details`` rows and ``elapsed`` seconds.
+    """
+    if days <= 0:
+        raise CostInputError("Number of simulated days must be positive.")
+    start = time.perf_counter()
+    p = resolve_params(params)
+    capacity = p["container_capacity_40"]
+    if capacity <= 0:
+        raise CostInputError("Container Capacity must be positive.")
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    # Every (warehouse, brand) series is stepped through, so the simulation works on dense arrays.
+    cube = densify_demand(aggregates["demand"])
+    network = aggregates["network"]
+    n_wh = len(warehouse_data)
+    n_brands = len(cube["brands"])
+    central = p["layout_type"] == LAYOUT_CENTRAL
+    is_main = np.array([wh.get("type") == "MAIN" for wh in warehouse_data])
+    is_front = np.array([wh.get("type") == "FRONT" for wh in warehouse_data]) & central
+    fronts = build_front_matrix(n_wh, network["main_of"]) if central else np.zeros((n_wh, n_wh))
+    main_of = np.array([network["main_of"].get(w, w) for w in range(n_wh)])
+
+    allocation = build_allocation_matrix(warehouse_data, build_assignment_matrix(warehouse_data, cube), network, p["layout_type"])
+    area_demand = daily_demand_profile(cube, days, seed)
+    customer_demand = np.einsum("wa,dab->dwb", allocation, area_demand)
+
+    # Planning rates from the forecast: a MAIN ships to its customers and its FRONTs.
+    annual_profile = allocation @ cube["forecast"].sum(axis=2)
+    outflow_rate = (annual_profile + fronts @ annual_profile) / 365.0
+    Z_val = compute_z_value(p["service_level"])
+    lt_shipping = np.array([int(wh.get("lt_shipping", 0)) if is_main[w] else 0 for w, wh in enumerate(warehouse_data)])
+    if (lt_shipping < 0).any():
+        raise CostInputError("Lead times must be non-negative.")
+    # Goods ordered today arrive tomorrow at the earliest.
+    lead_times = np.where(is_main, np.maximum(lt_shipping, 1), TRANSFER_LEAD_TIME)
+    safety = np.where(is_main[:, None], aggregates["brand_std"].toarray() * np.sqrt(lt_shipping)[:, None] * Z_val, 0.0)
+    if central:
+        safety = safety + TRANSFER_LEAD_TIME * aggregates["front_brand_daily"].toarray()
+    reorder_point = np.where(is_main[:, None], outflow_rate * lead_times[:, None] + safety, 0.0)
+    # Order quantity matching the engine's cycle stock.
+    order_months = 12.0 / main_orders_per_year(p)
+    order_qty = np.where(is_main[:, None], outflow_rate * 365.0 * order_months / 12.0, 0.0)
+    order_up_to = np.where(is_front[:, None], outflow_rate * (FRONT_REVIEW_DAYS + TRANSFER_LEAD_TIME), 0.0)
+
+    # Ring buffer of goods in transit, indexed by arrival day.
+    horizon = int(lead_times.max()) + 1
+    incoming = np.zeros((horizon, n_wh, n_brands))
+    arrival_slot = lead_times % horizon
+    rows = np.arange(n_wh)
+    on_hand = np.where(is_main[:, None], reorder_point + order_qty, order_up_to)
+    on_order = np.zeros((n_wh, n_brands))
+    inventory = np.empty((days, n_wh, n_brands))
+    shipped = np.zeros((n_wh, n_brands))
+    lost = np.zeros((n_wh, n_brands))
+    stockout_days = np.zeros((n_wh, n_brands))
+    orders = np.zeros((n_wh, n_brands))
+    containers = np.zeros(n_wh)
+    transferred = np.zeros((n_wh, n_brands))
+    for day in range(days):
+        slot = day % horizon
+        on_hand += incoming[slot]
+        on_order -= incoming[slot]
+        incoming[slot] = 0.0
+
+        demand = customer_demand[day]
+        filled = np.minimum(on_hand, demand)
+        on_hand -= filled
+        shipped += filled
+        lost += demand - filled
+        stockout_days += demand - filled > 1e-9
+
+        if central and day % FRONT_REVIEW_DAYS == 0:
+            need = np.where(is_front[:, None], np.maximum(order_up_to - on_hand - on_order, 0.0), 0.0)
+            requested = fronts @ need
+            ratio = np.where(requested > 0, np.minimum(on_hand / np.where(requested > 0, requested, 1.0), 1.0), 0.0)
+            transfer = need * ratio[main_of]
+            on_hand -= fronts @ transfer
+            on_order += transfer
+            transferred += transfer
+            incoming[(day + arrival_slot) % horizon, rows] += transfer
+
+        position = on_hand + on_order
+        short = np.where(is_main[:, None] & (order_qty > 0), reorder_point - position, -1.0)
+        n_orders = np.where(short >= 0, np.floor(short / np.where(order_qty > 0, order_qty, 1.0)) + 1.0, 0.0)
+        order = n_orders * order_qty
+        if order.any():
+            on_order += order
+            orders += n_orders
+            containers += np.ceil(order.sum(axis=1) / capacity)
+            incoming[(day + arrival_slot) % horizon, rows] += order
+        inventory[day] = on_hand
+
+    total_demand = customer_demand.sum(axis=0)
+    avg_inventory = inventory.mean(axis=0)
+    analytic_avg = aggregates["brand_annual"].toarray() / (2.0 * main_orders_per_year(p)) + safety
+    details = []
+    for w, wh in enumerate(warehouse_data):
+        for b, brand in enumerate(cube["brands"]):
+            if total_demand[w, b] <= 0 and outflow_rate[w, b] <= 0:
+                continue
+            details.append({
+                "index": w,
+                "warehouse_id": warehouse_id(w, wh),
+                "warehouse": warehouse_label(w, wh),
+                "type": wh.get("type"),
+                "brand": brand,
+                "customer_demand": float(total_demand[w, b]),
+                "shipped": float(shipped[w, b]),
+                "lost_sales": float(lost[w, b]),
+                "fill_rate": float(shipped[w, b] / total_demand[w, b]) if total_demand[w, b] > 0 else 1.0,
+                "stockout_days": int(stockout_days[w, b]),
+                "avg_inventory": float(avg_inventory[w, b]),
+                "max_inventory": float(inventory[:, w, b].max()),
+                "analytic_avg_inventory": float(analytic_avg[w, b]) if is_main[w] else None,
+                "orders": int(orders[w, b]),
+                "transferred_in": float(transferred[w, b]),
+            })
+    return {
+        "days": days,
+        "brands": cube["brands"],
+        "warehouses": [warehouse_label(w, wh) for w, wh in enumerate(warehouse_data)],
+        "inventory": inventory,
+        "containers": containers,
+        "details": details,
+        "elapsed": time.perf_counter() - start,
+    }
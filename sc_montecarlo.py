@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""
+Monte Carlo check of the analytic safety stock.
+
+The cost engine sizes safety stock as ``std * sqrt(LT) * Z`` (plus the
+12-day transfer buffer the MAIN holds for its FRONTs in 'Central and
+Fronts'), with ``std`` pooled over the warehouse's areas. This module draws
+daily demand per area and brand from ``avg_daily_demand`` /
+``std_daily_demand`` (normal, truncated at zero, independent between areas
+whatever ``demand_correlation`` the engine pooled with), sums
+it over each warehouse's replenishment lead time and measures, per warehouse
+and brand, how often that lead-time demand exceeds the reorder point and
+which share of demand is filled from stock.
+
+- MAIN: lead time ``lt_shipping``; reorder point is the expected lead-time
+  demand plus the engine's safety stock; the order quantity follows from the
+  engine's average inventory ``annual / 12 + safety_stock``, i.e. Q = annual / 6
+  (annual / shipments_per_year with container load planning).
+- FRONT: lead time TRANSFER_LEAD_TIME; it holds the expected transfer
+  demand and is replenished weekly, Q = annual / 52.
+
+Paths are processed in chunks with one child seed per chunk, so results only
+depend on ``seed`` and ``chunk_size``, not on how many processes ran them.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from math import sqrt
+import time
+
+import numpy as np
+
+from sc_demand import build_assignment_matrix, densify_demand
+from sc_engine import (
+    CostInputError,
+    LAYOUT_CENTRAL,
+    TRANSFER_LEAD_TIME,
+    resolve_params,
+    main_orders_per_year,
+    compute_z_value,
+    warehouse_id,
+    warehouse_label,
+    prepare_aggregates,
+)
+
+DEFAULT_PATHS = 100_000
+DEFAULT_CHUNK_SIZE = 20_000
+
+# Series with avg >= 4 std lose < 0.004% of days to the truncation at zero,
+# so their lead-time demand is drawn directly as N(L * avg, sqrt(L) * std)
+# instead of day by day.
+TRUNCATION_FREE_RATIO = 4.0
+
+
+def build_simulation_inputs(market_area_data, warehouse_data, params=None):
+    """
+    Collects everything the path simulation needs as arrays: per-area demand
+    (area x brand), the assignment matrix and, per warehouse, its lead time,
+    and per warehouse and brand its reorder point and order quantity.
+    """
+    p = resolve_params(params)
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    # Every (area, brand) series is drawn, so the simulation works on dense arrays.
+    cube = densify_demand(aggregates["demand"])
+    brand_annual = aggregates["brand_annual"].toarray()
+    brand_std = aggregates["brand_std"].toarray()
+    front_brand_daily = aggregates["front_brand_daily"].toarray()
+    Z_val = compute_z_value(p["service_level"])
+    central = p["layout_type"] == LAYOUT_CENTRAL
+    lead_times = []
+    safety = []
+    order_qty = []
+    for i, wh in enumerate(warehouse_data):
+        if wh.get("type") == "MAIN":
+            lead_time = int(wh.get("lt_shipping", 0))
+            ss = brand_std[i] * sqrt(lead_time) * Z_val
+            if central:
+                ss = ss + TRANSFER_LEAD_TIME * front_brand_daily[i]
+            q = brand_annual[i] / main_orders_per_year(p)
+        else:
+            lead_time = TRANSFER_LEAD_TIME
+            ss = np.zeros(len(cube["brands"]))
+            q = brand_annual[i] / 52.0
+        lead_times.append(lead_time)
+        safety.append(ss)
+        order_qty.append(q)
+    lead_times = np.array(lead_times, dtype=int)
+    if (lead_times < 0).any():
+        raise CostInputError("Lead times must be non-negative.")
+    safety = np.array(safety).reshape(len(warehouse_data), len(cube["brands"]))
+    mean_lt_demand = aggregates["brand_daily"].toarray() * lead_times[:, None]
+    return {
+        "brands": cube["brands"],
+        "avg_daily": cube["avg_daily"],
+        "std_daily": cube["std_daily"],
+        "assignment": build_assignment_matrix(warehouse_data, cube),
+        "lead_times": lead_times,
+        "safety_stock": safety,
+        "reorder_point": mean_lt_demand + safety,
+        "order_qty": np.array(order_qty).reshape(safety.shape),
+        "mean_lt_demand": mean_lt_demand,
+        "target_service_level": p["service_level"],
+    }
+
+
+def _simulate_chunk(inputs, n_paths, seed):
+    """
+    Simulates ``n_paths`` lead-time cycles. Demand is accumulated segment by
+    segment between the distinct lead times, so memory is bounded by
+    ``n_paths x longest segment x areas x brands``. Returns per (warehouse,
+    brand) stock-out counts and summed shortages.
+    """
+    rng = np.random.default_rng(seed)
+    shape = inputs["avg_daily"].shape
+    mu = inputs["avg_daily"].ravel().astype(np.float32)
+    sigma = inputs["std_daily"].ravel().astype(np.float32)
+    direct = np.flatnonzero(mu >= TRUNCATION_FREE_RATIO * sigma)
+    daily = np.flatnonzero(mu < TRUNCATION_FREE_RATIO * sigma)
+    assignment = inputs["assignment"]
+    lead_times = inputs["lead_times"]
+    reorder_point = inputs["reorder_point"]
+    stockouts = np.zeros(reorder_point.shape)
+    shortage = np.zeros(reorder_point.shape)
+    # Running lead-time demand per path and (area, brand) series.
+    series_demand = np.zeros((n_paths, mu.size), dtype=np.float32)
+    day = 0
+    for lead_time in np.unique(lead_times):
+        days = int(lead_time) - day
+        if days > 0:
+            if direct.size:
+                draws = rng.standard_normal((n_paths, direct.size), dtype=np.float32)
+                series_demand[:, direct] += np.maximum(draws * (sigma[direct] * np.float32(sqrt(days))) + mu[direct] * days, 0.0)
+            if daily.size:
+                draws = rng.standard_normal((n_paths, days, daily.size), dtype=np.float32)
+                draws *= sigma[daily]
+                draws += mu[daily]
+                np.maximum(draws, 0.0, out=draws)
+                series_demand[:, daily] += draws.sum(axis=1)
+            day = int(lead_time)
+        rows = np.flatnonzero(lead_times == lead_time)
+        area_demand = series_demand.reshape((n_paths,) + shape)
+        # (paths, brands, areas) @ (areas, warehouses) -> lead-time demand per warehouse and brand.
+        demand = np.swapaxes(area_demand, 1, 2) @ assignment[rows].T.astype(np.float32)
+        excess = demand - reorder_point[rows].T[None, :, :].astype(np.float32)
+        stockouts[rows] += (excess > 0).sum(axis=0).T
+        shortage[rows] += np.maximum(excess, 0.0).sum(axis=0, dtype=np.float64).T
+    return stockouts, shortage
+
+
+def simulate_service_levels(market_area_data, warehouse_data, params=None, n_paths=DEFAULT_PATHS,
+                            seed=0, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None):
+    """
+    Estimates the realized stock-out probability and fill rate per warehouse
+    and brand over ``n_paths`` replenishment cycles. ``max_workers`` > 1
+    spreads the chunks over a process pool. Returns ``details`` rows (one per
+    warehouse and active brand), the path count and ``elapsed`` seconds.
+    """
+    if n_paths <= 0 or chunk_size <= 0:
+        raise CostInputError("Number of paths and chunk size must be positive.")
+    start = time.perf_counter()
+    inputs = build_simulation_inputs(market_area_data, warehouse_data, params)
+    sizes = [min(chunk_size, n_paths - offset) for offset in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    stockouts = np.zeros(inputs["reorder_point"].shape)
+    shortage = np.zeros(inputs["reorder_point"].shape)
+    if max_workers and max_workers > 1 and len(sizes) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            chunks = pool.map(_simulate_chunk, [inputs] * len(sizes), sizes, seeds)
+            for chunk_stockouts, chunk_shortage in chunks:
+                stockouts += chunk_stockouts
+                shortage += chunk_shortage
+    else:
+        for size, child_seed in zip(sizes, seeds):
+            chunk_stockouts, chunk_shortage = _simulate_chunk(inputs, size, child_seed)
+            stockouts += chunk_stockouts
+            shortage += chunk_shortage
+
+    stockout_prob = stockouts / n_paths
+    expected_shortage = shortage / n_paths
+    order_qty = inputs["order_qty"]
+    fill_rate = np.where(order_qty > 0, 1.0 - expected_shortage / np.where(order_qty > 0, order_qty, 1.0), 1.0)
+    fill_rate = np.clip(fill_rate, 0.0, 1.0)
+    details = []
+    for i, wh in enumerate(warehouse_data):
+        for b, brand in enumerate(inputs["brands"]):
+            if inputs["mean_lt_demand"][i, b] <= 0 and order_qty[i, b] <= 0:
+                continue
+            details.append({
+                "index": i,
+                "warehouse_id": warehouse_id(i, wh),
+                "warehouse": warehouse_label(i, wh),
+                "type": wh.get("type"),
+                "brand": brand,
+                "lead_time": int(inputs["lead_times"][i]),
+                "mean_lead_time_demand": float(inputs["mean_lt_demand"][i, b]),
+                "safety_stock": float(inputs["safety_stock"][i, b]),
+                "reorder_point": float(inputs["reorder_point"][i, b]),
+                "stockout_probability": float(stockout_prob[i, b]),
+                "cycle_service_level": float(1.0 - stockout_prob[i, b]),
+                "fill_rate": float(fill_rate[i, b]),
+            })
+    return {
+        "details": details,
+        "target_service_level": inputs["target_service_level"],
+        "paths": n_paths,
+        "elapsed": time.perf_counter() - start,
+    }
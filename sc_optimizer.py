@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+"""
+Warehouse location and market-assignment optimizer.
+
+Searches over which candidate locations to open and which market areas each
+warehouse serves, minimizing the grand total of the four cost components.
+Every cost component is a sum of per-warehouse terms, so a candidate network is
+priced from per-warehouse costs that are memoized by (location, role, served
+set). A move (reassign a market, open or close a site) only re-prices the
+warehouses it touches, which keeps a single evaluation in the microsecond range.
+
+The search is a best-improvement local search with random restarts. The best
+networks found are re-priced through ``evaluate_scenario`` before they are
+returned, so reported totals are exactly what the calculation tab would show.
+"""
+from math import sqrt, ceil
+import random
+
+import numpy as np
+
+from sc_demand import build_sparse_demand, compute_area_aggregates
+from sc_geo import road_distances
+from sc_engine import (
+    CostInputError,
+    LAYOUT_CENTRAL,
+    LAYOUT_REGIONAL,
+    TRANSFER_LEAD_TIME,
+    TRUCK_53_CAPACITY_FACTOR,
+    TRUCK_FILL_RATE,
+    FINANCING_MARKUP,
+    resolve_params,
+    main_orders_per_year,
+    compute_z_value,
+    compute_brand_footprints,
+    warehouse_id,
+    evaluate_scenario,
+)
+
+# Same defaults as the Warehouse Setup widgets.
+DEFAULT_TEMPLATE = {
+    "rent_pricing_method": "Fixed Rent Price",
+    "rent_price": 50000.0,
+    "avg_employee_salary": 50000,
+    "lt_shipping": 30,
+    "shipping_cost_40hc": 5000.0,
+    "front_shipping_cost_40": 500.0,
+    "front_shipping_cost_53": 600.0,
+}
+DEFAULT_LAND_DISTANCE = 100.0
+DEFAULT_LAND_COST = 50.0
+
+TEMPLATE_KEYS = list(DEFAULT_TEMPLATE) + ["num_employees", "land_shipping_data"]
+
+
+def default_num_employees(wh_type, num_served):
+    return 3 if wh_type == "MAIN" and num_served <= 1 else (4 if wh_type == "MAIN" else 2)
+
+
+def templates_from_warehouses(warehouse_configs):
+    """Per-location cost templates taken from already configured warehouses."""
+    templates = {}
+    for wh in warehouse_configs:
+        if wh.get("location"):
+            templates[wh["location"]] = {k: wh[k] for k in TEMPLATE_KEYS if k in wh}
+    return templates
+
+
+def build_cost_model(market_area_data, params=None, candidate_locations=None, templates=None):
+    """Precomputes the per-area arrays and per-location templates the search prices from."""
+    p = resolve_params(params)
+    if p["container_capacity_40"] <= 0:
+        raise CostInputError("Container Capacity must be positive.")
+    if p["interest_rate"] < 0 or p["service_level"] < 0:
+        raise CostInputError("Interest Rate and Service Level must be non-negative.")
+    if any(price <= 0 for price in p["brand_unit_prices"].values()):
+        raise CostInputError("All Brand Unit Prices must be positive.")
+    demand = build_sparse_demand(market_area_data, brands=p["brand_unit_prices"])
+    sq_ft = compute_brand_footprints(demand["brands"], p)
+    area = compute_area_aggregates(demand, sq_ft)
+    areas = demand["areas"]
+    if not areas:
+        raise CostInputError("At least one market area is required to optimize the network.")
+    templates = templates or {}
+    if candidate_locations is None:
+        candidate_locations = areas
+    # A warehouse must serve its own location, so only market areas are valid sites.
+    candidates = [loc for loc in dict.fromkeys(candidate_locations) if loc in demand["area_index"]]
+    if not candidates:
+        raise CostInputError("No candidate warehouse location is one of the selected market areas.")
+
+    area_pairs = demand["area_pairs"]
+    daily = area["daily"]
+    weighted_order = area_pairs @ (demand["avg_order"] * demand["avg_daily"])
+    avg_order = np.divide(weighted_order, daily, out=np.zeros_like(daily), where=daily > 0)
+
+    # Road miles from every candidate to every area where both have coordinates.
+    road_miles = road_distances(p["coordinates"], candidates, areas, p["road_factor"])
+    location_templates = {}
+    land_costs = {}
+    land_distances = {}
+    for c, loc in enumerate(candidates):
+        template = dict(DEFAULT_TEMPLATE)
+        template.update(templates.get(loc, {}))
+        location_templates[loc] = template
+        land = np.zeros(len(areas))
+        distances = np.where(np.isnan(road_miles[c]), DEFAULT_LAND_DISTANCE, road_miles[c])
+        land_data = template.get("land_shipping_data", {})
+        for a, area_name in enumerate(areas):
+            if area_name == loc:
+                continue
+            ship = land_data.get(area_name, {})
+            if ship.get("distance") is not None:
+                distances[a] = ship["distance"]
+            distance = distances[a]
+            cost = ship.get("cost_for_avg_order", DEFAULT_LAND_COST)
+            if avg_order[a] > 0 and cost > 0 and distance > 0:
+                land[a] = ceil(area["annual"][a] / avg_order[a]) * cost * distance
+        land_costs[loc] = land
+        land_distances[loc] = distances
+
+    # Inventory financing is linear in every brand's stock, so each area only
+    # needs its demand valued at unit prices, not one column per brand.
+    pair_price = np.array([p["brand_unit_prices"].get(b, 0) for b in demand["brands"]], dtype=float)[demand["pair_brand"]]
+    return {
+        "params": p,
+        "layout": p["layout_type"],
+        "z": compute_z_value(p["service_level"]),
+        "areas": areas,
+        "area_index": demand["area_index"],
+        "candidates": candidates,
+        "templates": location_templates,
+        "land_costs": land_costs,
+        "land_distances": land_distances,
+        "avg_order": avg_order,
+        "area_peak_sq_ft": area["peak_sq_ft"],
+        "min_sq_ft": sq_ft.min(initial=p["sq_ft_per_unit"]),
+        # One row per area so that a served set is reduced with a single sum.
+        # Stds add up linearly, the upper bound of the pooled std the engine
+        # uses when demand_correlation < 1; final networks are re-priced exactly.
+        # [annual, daily sq ft, std sq ft, annual value, std value, daily value]
+        "area_rows": np.column_stack([
+            area["annual"], area["daily_sq_ft"], area["std_sq_ft"],
+            area_pairs @ (demand["forecast"].sum(axis=1) * pair_price),
+            area_pairs @ (demand["std_daily"] * pair_price),
+            area_pairs @ (demand["avg_daily"] * pair_price),
+        ]),
+    }
+
+
+def warehouse_cost(model, location, wh_type, served, covered=None):
+    """
+    Grand-total contribution of one warehouse serving the area indices in
+    ``served``. For a MAIN in 'Central and Fronts', ``covered`` holds the areas
+    also served by its FRONTs, which drive the transfer buffer.
+    """
+    p = model["params"]
+    t = model["templates"][location]
+    z = model["z"]
+    idx = np.fromiter(served, dtype=int, count=len(served))
+    annual, daily_sq_ft, std_sq_ft, annual_value, std_value, _ = model["area_rows"][idx].sum(axis=0)
+    peak_sq_ft = model["area_peak_sq_ft"][idx].max() if len(idx) else 0.0
+    lead_time = t["lt_shipping"]
+    capacity = p["container_capacity_40"]
+
+    inventory = 0.0
+    if wh_type == "MAIN":
+        overhead = p["overhead_factor_main"]
+        sq_ft = peak_sq_ft + (std_sq_ft * sqrt(lead_time) * z if lead_time > 0 else 0.0)
+        stock_value = annual_value / (2.0 * main_orders_per_year(p)) + std_value * sqrt(lead_time) * z
+        if covered is not None:
+            cidx = np.fromiter(covered, dtype=int, count=len(covered))
+            front_rows = model["area_rows"][cidx].sum(axis=0)
+            sq_ft += TRANSFER_LEAD_TIME * front_rows[1]
+            stock_value += TRANSFER_LEAD_TIME * front_rows[5]
+        inventory = float(stock_value) * FINANCING_MARKUP * (p["interest_rate"] / 100.0)
+        # Pooled containers also with shipment_planning; final networks get planned loads.
+        shipping = ceil(annual / capacity) * t["shipping_cost_40hc"]
+        if model["layout"] == LAYOUT_REGIONAL:
+            shipping += model["land_costs"][location][idx].sum()
+    else:
+        overhead = p["overhead_factor_front"]
+        sq_ft = peak_sq_ft / 4.0 + daily_sq_ft * 12.0
+        per_capacity = (t["front_shipping_cost_40"] + t["front_shipping_cost_53"] / TRUCK_53_CAPACITY_FACTOR) / 2.0 / TRUCK_FILL_RATE
+        shipping = annual * per_capacity / capacity
+
+    if t["rent_pricing_method"] == "Fixed Rent Price":
+        rental = t["rent_price"]
+    else:
+        if model["min_sq_ft"] <= 0 or t["rent_price"] <= 0:
+            raise CostInputError(f"Invalid rental parameters for candidate location {location}.")
+        rental = t["rent_price"] * overhead * sq_ft
+    num_employees = t.get("num_employees", default_num_employees(wh_type, len(idx)))
+    labor = num_employees * t["avg_employee_salary"]
+    return float(rental + shipping + inventory + labor)
+
+
+def build_network(model, main_location, owners):
+    """Turns a search state into ``warehouse_data`` the engine and the UI understand."""
+    areas = model["areas"]
+
+    def config(location, wh_type, served):
+        t = model["templates"][location]
+        served_markets = [areas[a] for a in sorted(served)]
+        wh = {
+            "location": location,
+            "type": wh_type,
+            "served_markets": served_markets,
+            "rent_pricing_method": t["rent_pricing_method"],
+            "rent_price": t["rent_price"],
+            "avg_employee_salary": t["avg_employee_salary"],
+            "num_employees": t.get("num_employees", default_num_employees(wh_type, len(served))),
+        }
+        if wh_type == "MAIN":
+            wh["lt_shipping"] = t["lt_shipping"]
+            wh["shipping_cost_40hc"] = t["shipping_cost_40hc"]
+            if model["layout"] == LAYOUT_REGIONAL:
+                land_data = t.get("land_shipping_data", {})
+                wh["land_shipping_data"] = {
+                    area: {
+                        "distance": float(model["land_distances"][location][model["area_index"][area]]),
+                        "cost_for_avg_order": land_data.get(area, {}).get("cost_for_avg_order", DEFAULT_LAND_COST),
+                        "calculated_avg_order_size": float(model["avg_order"][model["area_index"][area]]),
+                    }
+                    for area in served_markets if area != location
+                }
+        else:
+            wh["front_shipping_cost_40"] = t["front_shipping_cost_40"]
+            wh["front_shipping_cost_53"] = t["front_shipping_cost_53"]
+        return wh
+
+    warehouse_data = []
+    if main_location is not None:
+        main_wh = config(main_location, "MAIN", range(len(areas)))
+        warehouse_data.append(main_wh)
+        for location in sorted(owners):
+            front_wh = config(location, "FRONT", owners[location])
+            front_wh["serving_main_id"] = warehouse_id(0, main_wh)
+            warehouse_data.append(front_wh)
+    else:
+        for location in sorted(owners):
+            warehouse_data.append(config(location, "MAIN", owners[location]))
+    for i, wh in enumerate(warehouse_data):
+        wh["id"] = warehouse_id(i, wh)
+    return warehouse_data
+
+
+def _search(model, main_location, owners, memo, visited):
+    """
+    Best-improvement local search from ``owners`` (location -> frozenset of
+    area indices). In 'Central and Fronts' the owners are the FRONTs and areas
+    without an owner are served by the MAIN alone.
+    """
+    areas = model["areas"]
+    area_index = model["area_index"]
+    central = main_location is not None
+    all_areas = frozenset(range(len(areas)))
+    own_type = "FRONT" if central else "MAIN"
+
+    def cost(location, served):
+        key = (location, served)
+        if key not in memo:
+            memo[key] = warehouse_cost(model, location, own_type, served)
+        return memo[key]
+
+    def main_cost(covered):
+        key = (main_location, "MAIN", covered)
+        if key not in memo:
+            memo[key] = warehouse_cost(model, main_location, "MAIN", all_areas, covered)
+        return memo[key]
+
+    def covered_of(state):
+        return frozenset().union(*state.values()) if state else frozenset()
+
+    def delta(changes):
+        # changes: location -> new served set, or None to close the site
+        d = 0.0
+        for location, served in changes.items():
+            if location in owners:
+                d -= cost(location, owners[location])
+            if served is not None:
+                d += cost(location, served)
+        if central:
+            new_state = dict(owners)
+            for location, served in changes.items():
+                if served is None:
+                    new_state.pop(location, None)
+                else:
+                    new_state[location] = served
+            d += main_cost(covered_of(new_state)) - main_cost(covered)
+        return d
+
+    def record():
+        total = sum(cost(loc, s) for loc, s in owners.items()) + (main_cost(covered) if central else 0.0)
+        signature = (main_location, tuple(sorted((loc, tuple(sorted(s))) for loc, s in owners.items())))
+        visited[signature] = total
+
+    covered = covered_of(owners)
+    record()
+    while True:
+        owner_of = {}
+        for location, served in owners.items():
+            for a in served:
+                owner_of[a] = location
+        best_delta, best_changes = -1e-9, None
+
+        def consider(changes):
+            nonlocal best_delta, best_changes
+            d = delta(changes)
+            if d < best_delta:
+                best_delta, best_changes = d, changes
+
+        for a in range(len(areas)):
+            current = owner_of.get(a)
+            if current is not None and area_index[current] == a:
+                continue
+            targets = [loc for loc in owners if loc != current]
+            if central and current is not None:
+                targets.append(None)
+            for target in targets:
+                changes = {}
+                if current is not None:
+                    changes[current] = owners[current] - {a}
+                if target is not None:
+                    changes[target] = owners[target] | {a}
+                consider(changes)
+        for location in model["candidates"]:
+            if location in owners or location == main_location:
+                continue
+            a = area_index[location]
+            changes = {location: frozenset([a])}
+            current = owner_of.get(a)
+            if current is not None:
+                changes[current] = owners[current] - {a}
+            consider(changes)
+        for location in owners:
+            if central:
+                consider({location: None})
+            elif len(owners) > 1:
+                changes = {location: None}
+                for a in sorted(owners[location]):
+                    options = [loc for loc in owners if loc != location]
+                    target = min(options, key=lambda loc: cost(loc, changes.get(loc, owners[loc]) | {a}) - cost(loc, changes.get(loc, owners[loc])))
+                    changes[target] = changes.get(target, owners[target]) | {a}
+                consider(changes)
+
+        if best_changes is None:
+            break
+        for location, served in best_changes.items():
+            if served is None:
+                owners.pop(location)
+            else:
+                owners[location] = served
+        covered = covered_of(owners)
+        record()
+    return owners
+
+
+def optimize_network(market_area_data, params=None, candidate_locations=None, templates=None,
+                     top_n=3, restarts=8, seed=0):
+    """
+    Searches warehouse locations and market assignments for the layout in
+    ``params``. Returns up to ``top_n`` networks sorted by grand total, each as
+    ``{"grand_total", "warehouse_data", "result"}``.
+    """
+    model = build_cost_model(market_area_data, params, candidate_locations, templates)
+    rng = random.Random(seed)
+    candidates = model["candidates"]
+    area_index = model["area_index"]
+    num_areas = len(model["areas"])
+    memo = {}
+    visited = {}
+
+    if model["layout"] == LAYOUT_CENTRAL:
+        for main_location in candidates:
+            others = [loc for loc in candidates if loc != main_location]
+            for r in range(max(1, restarts)):
+                opened = [] if r == 0 else rng.sample(others, rng.randint(0, len(others)))
+                owners = {loc: frozenset([area_index[loc]]) for loc in opened}
+                _search(model, main_location, owners, memo, visited)
+    else:
+        for r in range(max(1, restarts)):
+            opened = list(candidates) if r == 0 else rng.sample(candidates, rng.randint(1, len(candidates)))
+            assignment = {loc: {area_index[loc]} for loc in opened}
+            for a in range(num_areas):
+                if not any(a in served for served in assignment.values()):
+                    assignment[rng.choice(opened)].add(a)
+            owners = {loc: frozenset(served) for loc, served in assignment.items()}
+            _search(model, None, owners, memo, visited)
+
+    ranked = sorted(visited.items(), key=lambda item: item[1])
+    networks = []
+    for (main_location, owner_items), _ in ranked[:max(top_n * 3, top_n)]:
+        owners = {loc: frozenset(served) for loc, served in owner_items}
+        warehouse_data = build_network(model, main_location, owners)
+        result = evaluate_scenario(market_area_data, warehouse_data, model["params"])
+        networks.append({"grand_total": result["grand_total"], "warehouse_data": warehouse_data, "result": result})
+    networks.sort(key=lambda n: n["grand_total"])
+    return networks[:top_n]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Per-rerun timings for the Streamlit app.
+
+A profile is a plain dict created at the top of every script run. The script
+calls ``lap`` at the end of each top-level section (the time since the
+previous lap is booked to that section) and wraps individual hot spots,
+such as a cost component, in ``timed`` blocks named "<section>/<name>", or
+with a plain name (e.g. "charts") for work spread over several sections.
+Timed blocks are also part of the lap they run in.
+``count`` keeps per-rerun counters (warehouses, charts, rows, ...).
+
+``finish_profile`` turns a profile into a JSON-serializable record, which
+``append_log`` writes as one line of a JSON-lines log. ``start_cprofile`` /
+``stop_cprofile`` capture a cProfile of a whole rerun.
+"""
+from contextlib import contextmanager
+import cProfile
+from datetime import datetime, timezone
+import io
+import json
+import marshal
+import pstats
+import time
+
+
+def new_profile():
+    now = time.perf_counter()
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "start": now,
+        "last": now,
+        "stages": {},
+        "counts": {},
+    }
+
+
+def lap(profile, section):
+    """Books the time since the previous lap (or the start) to ``section``."""
+    now = time.perf_counter()
+    profile["stages"][section] = profile["stages"].get(section, 0.0) + now - profile["last"]
+    profile["last"] = now
+
+
+@contextmanager
+def timed(profile, name):
+    """Adds the time spent in the block to ``name``; repeated blocks accumulate."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile["stages"][name] = profile["stages"].get(name, 0.0) + time.perf_counter() - start
+
+
+def count(profile, name, n=1):
+    profile["counts"][name] = profile["counts"].get(name, 0) + n
+
+
+def finish_profile(profile, **extra):
+    """The profile as a record: start time, total and per-stage seconds, counts, plus ``extra`` fields."""
+    record = {
+        "started_at": profile["started_at"],
+        "total_seconds": time.perf_counter() - profile["start"],
+        "stages": dict(profile["stages"]),
+        "counts": dict(profile["counts"]),
+    }
+    record.update(extra)
+    return record
+
+
+def append_log(record, path):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+
+def start_cprofile():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_cprofile(profiler, limit=40):
+    """
+    Stops ``profiler`` and returns the ``limit`` most expensive functions by
+    cumulative time as text, and the raw statistics in the ``.prof`` format
+    ``pstats`` and snakeviz read.
+    """
+    profiler.disable()
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats("cumulative").print_stats(limit)
+    profiler.create_stats()
+    return text.getvalue(), marshal.dumps(profiler.stats)
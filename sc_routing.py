@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Multi-stop delivery routes for the regional land shipping of MAIN warehouses.
+
+The per-order estimate of 'Main Regionals' sends every average order out and
+back on its own. Routing consolidates instead: the year is cut into
+``deliveries_per_year`` delivery rounds following the monthly forecast, full
+truckloads of an area go direct, and the remaining loads of a round are
+routed from the warehouse with the Clarke-Wright savings heuristic, then
+improved by relocating stops between routes and by 2-opt within routes.
+
+Distances come from a matrix over the warehouse (index 0) and its areas:
+warehouse to area from ``land_shipping_data``, area to area from
+``area_distances`` ({area: {area: miles}}, either order), else road miles
+from the coordinate table (see sc_geo). A pair with neither is taken as the
+way through the warehouse, so it never yields savings.
+Matrices are cached, and rounds with the same loads are routed once.
+
+Route miles are priced at the warehouse's rate per mile: the rate at which
+sending every order out and back costs exactly the per-order estimate.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from sc_geo import DEFAULT_ROAD_FACTOR, road_distances
+
+DEFAULT_DELIVERIES_PER_YEAR = 52
+MAX_IMPROVEMENT_PASSES = 50
+
+
+def _freeze(area_distances, areas):
+    wanted = set(areas)
+    return tuple(sorted(
+        (area, other, float(miles))
+        for area, row in (area_distances or {}).items() if area in wanted
+        for other, miles in row.items() if other in wanted and other != area
+    ))
+
+
+@lru_cache(maxsize=256)
+def _cached_matrix(depot_distances, pairs, areas, located, road_factor):
+    n = len(areas)
+    to_depot = np.array((0.0,) + depot_distances)
+    # Via the warehouse unless a direct distance is known.
+    via_depot = to_depot[:, None] + to_depot[None, :]
+    matrix = via_depot.copy()
+    if located:
+        coordinates = {area: (lat, lon) for area, lat, lon in located}
+        matrix[1:, 1:] = np.fmin(via_depot[1:, 1:], road_distances(coordinates, areas, areas, road_factor))
+    index = {area: k + 1 for k, area in enumerate(areas)}
+    for area, other, miles in pairs:
+        a, b = index[area], index[other]
+        matrix[a, b] = matrix[b, a] = min(miles, via_depot[a, b])
+    matrix[np.arange(n + 1), np.arange(n + 1)] = 0.0
+    matrix.setflags(write=False)
+    return matrix
+
+
+def build_distance_matrix(areas, depot_distances, area_distances=None, coordinates=None, road_factor=DEFAULT_ROAD_FACTOR):
+    """(areas + 1) square matrix of miles, the warehouse first."""
+    areas = tuple(areas)
+    located = tuple((area, float(coordinates[area][0]), float(coordinates[area][1])) for area in areas if area in (coordinates or {}))
+    return _cached_matrix(tuple(float(d) for d in depot_distances), _freeze(area_distances, areas), areas, located, float(road_factor))
+
+
+def route_length(route, dist):
+    stops = [0] + list(route) + [0]
+    return float(dist[stops[:-1], stops[1:]].sum())
+
+
+def clarke_wright(dist, loads, capacity):
+    """
+    Savings construction: start with one route per stop (stops are
+    ``dist`` indices 1..n, ``loads`` their loads) and merge route ends in
+    order of decreasing savings while the merged load fits.
+    """
+    n = len(loads)
+    routes = {k: [k] for k in range(1, n + 1)}
+    route_load = {k: loads[k - 1] for k in range(1, n + 1)}
+    route_of = list(range(n + 1))
+    savings = dist[0, 1:, None] + dist[0, None, 1:] - dist[1:, 1:]
+    i, j = np.triu_indices(n, k=1)
+    positive = savings[i, j] > 1e-9
+    i, j, s = i[positive] + 1, j[positive] + 1, savings[i[positive], j[positive]]
+    for k in np.argsort(-s, kind="stable"):
+        a, b = int(i[k]), int(j[k])
+        ra, rb = route_of[a], route_of[b]
+        if ra == rb or route_load[ra] + route_load[rb] > capacity + 1e-9:
+            continue
+        first, second = routes[ra], routes[rb]
+        if first[-1] == a and second[0] == b:
+            merged = first + second
+        elif first[0] == a and second[-1] == b:
+            merged = second + first
+        elif first[-1] == a and second[-1] == b:
+            merged = first + second[::-1]
+        elif first[0] == a and second[0] == b:
+            merged = first[::-1] + second
+        else:
+            continue
+        routes[ra] = merged
+        route_load[ra] += route_load.pop(rb)
+        del routes[rb]
+        for stop in second:
+            route_of[stop] = ra
+    return list(routes.values())
+
+
+def two_opt(route, dist):
+    """Reverses route segments while that shortens the route."""
+    tour = [0] + list(route) + [0]
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        for a in range(1, len(tour) - 2):
+            for b in range(a + 1, len(tour) - 1):
+                delta = dist[tour[a - 1], tour[b]] + dist[tour[a], tour[b + 1]] - dist[tour[a - 1], tour[a]] - dist[tour[b], tour[b + 1]]
+                if delta < -1e-9:
+                    tour[a:b + 1] = tour[a:b + 1][::-1]
+                    improved = True
+        if not improved:
+            break
+    return tour[1:-1]
+
+
+def relocate(routes, dist, loads, capacity):
+    """Moves single stops to the cheapest position in another route while that saves miles."""
+    routes = [list(route) for route in routes]
+    route_load = [sum(loads[stop - 1] for stop in route) for route in routes]
+    for _ in range(MAX_IMPROVEMENT_PASSES):
+        improved = False
+        for r, route in enumerate(routes):
+            for pos, stop in enumerate(route):
+                prev, nxt = ([0] + route)[pos], (route + [0])[pos + 1]
+                removal = dist[prev, stop] + dist[stop, nxt] - dist[prev, nxt]
+                best = None
+                for t, target in enumerate(routes):
+                    if t == r or route_load[t] + loads[stop - 1] > capacity + 1e-9:
+                        continue
+                    tour = [0] + target + [0]
+                    costs = dist[tour[:-1], stop] + dist[stop, tour[1:]] - dist[tour[:-1], tour[1:]]
+                    k = int(costs.argmin())
+                    if costs[k] < removal - 1e-9 and (best is None or costs[k] < best[0]):
+                        best = (costs[k], t, k)
+                if best is not None:
+                    _, t, k = best
+                    route.pop(pos)
+                    routes[t].insert(k, stop)
+                    route_load[r] -= loads[stop - 1]
+                    route_load[t] += loads[stop - 1]
+                    improved = True
+                    break
+            if improved:
+                break
+        if not improved:
+            break
+    return [route for route in routes if route]
+
+
+def route_round(dist, loads, capacity):
+    """
+    Miles and trips of one delivery round with ``loads`` per area (in
+    ``dist`` order after the warehouse): direct full truckloads plus routes
+    for what is left.
+    """
+    loads = np.asarray(loads, dtype=float)
+    full = np.floor(loads / capacity + 1e-9)
+    miles = float(2.0 * dist[0, 1:] @ full)
+    trips = int(full.sum())
+    rest = np.where(loads - full * capacity > 1e-9, loads - full * capacity, 0.0)
+    stops = np.flatnonzero(rest) + 1
+    if len(stops):
+        sub = dist[np.ix_(np.r_[0, stops], np.r_[0, stops])]
+        sub_loads = rest[stops - 1].tolist()
+        routes = clarke_wright(sub, sub_loads, capacity)
+        # Stops no merge could join cannot be relocated either.
+        if len(routes) < len(stops):
+            routes = relocate(routes, sub, sub_loads, capacity)
+        routes = [two_opt(route, sub) for route in routes]
+        miles += sum(route_length(route, sub) for route in routes)
+        trips += len(routes)
+    return miles, trips
+
+
+def plan_routes(dist, monthly_loads, capacity, deliveries_per_year=DEFAULT_DELIVERIES_PER_YEAR):
+    """
+    Annual route miles and trips for ``monthly_loads`` (areas x 12): each
+    month's demand is delivered in equal rounds, ``deliveries_per_year`` in
+    the year. Rounds with equal loads are routed once.
+    """
+    per_round = np.asarray(monthly_loads, dtype=float).T * (12.0 / deliveries_per_year)
+    rounds_per_month = deliveries_per_year / 12.0
+    routed = {}
+    miles = trips = 0.0
+    for loads in per_round:
+        key = loads.tobytes()
+        if key not in routed:
+            routed[key] = route_round(dist, loads, capacity)
+        miles += routed[key][0] * rounds_per_month
+        trips += routed[key][1] * rounds_per_month
+    return {"miles": miles, "trips": trips}
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Analytic sensitivities of the annual costs to the inputs of a scenario.
+
+Every cost component is closed-form in its inputs, so the derivatives of
+each component are written out by hand from the aggregates the engine
+prices with. The scenario is priced once, and one pass over the warehouses
+gives the gradient with respect to every input. Finite differences would
+need a full recalculation per input.
+
+Demand inputs scale the forecast, daily demand and std of a market area or
+a SKU together; their derivative is per unit of annual forecast. Steps are
+differentiated at their marginal cost: whole containers and orders cost
+their share per unit (ceil(d / c) as d / c), planned container loads cost
+the same per loaded volume, and the busiest area and month that size
+rental space stay where they are. Route miles come from a combinatorial
+search and are held fixed, so routed regional freight only responds to
+the cost per order. Safety stock grows with the square root of the lead
+time, which has no derivative at 0, so lead times of 0 are left out, as
+are discrete settings like shipments per year.
+"""
+from math import ceil, sqrt
+import time
+
+import numpy as np
+from scipy.stats import norm
+
+from sc_demand import build_assignment_matrix, build_front_matrix, compute_std_gradients
+from sc_engine import (
+    LAYOUT_CENTRAL,
+    LAYOUT_REGIONAL,
+    TRANSFER_LEAD_TIME,
+    TRUCK_53_CAPACITY_FACTOR,
+    TRUCK_FILL_RATE,
+    FINANCING_MARKUP,
+    resolve_params,
+    main_orders_per_year,
+    compute_z_value,
+    warehouse_label,
+    prepare_aggregates,
+    resolve_land_distance,
+    calculate_rental_costs,
+    calculate_shipping_costs,
+    calculate_inventory_costs,
+    calculate_labor_costs,
+)
+
+COMPONENTS = ("rental", "shipping", "inventory", "labor")
+INPUT_GROUPS = ("Global", "Warehouse", "Regional Freight", "SKU", "Area Demand", "SKU Demand")
+
+
+def z_value_derivative(service_level):
+    """dZ / d service level; 0 where ``compute_z_value`` is clamped."""
+    if not 0.0 < service_level < 1.0:
+        return 0.0
+    return float(1.0 / norm.pdf(compute_z_value(service_level)))
+
+
+def _add(inputs, group, name, value, component, derivative):
+    row = inputs.get((group, name))
+    if row is None:
+        row = inputs[(group, name)] = {"group": group, "input": name, "value": float(value), **dict.fromkeys(COMPONENTS, 0.0)}
+    row[component] += float(derivative)
+
+
+def compute_sensitivities(market_area_data, warehouse_data, params=None):
+    """
+    Derivatives of every cost component with respect to every input of a
+    scenario. Returns ``base`` (the component totals and ``grand_total``),
+    ``inputs`` (one row per input: ``group`` from INPUT_GROUPS, ``input``,
+    its ``value`` and the derivative of each component and of the
+    ``total``, in $ per unit of the input) and ``elapsed`` seconds.
+    Raises CostInputError like the engine when inputs are invalid.
+    """
+    start = time.perf_counter()
+    p = resolve_params(params)
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    results = {
+        "rental": calculate_rental_costs(warehouse_data, market_area_data, p, aggregates),
+        "shipping": calculate_shipping_costs(warehouse_data, market_area_data, p, aggregates),
+        "inventory": calculate_inventory_costs(warehouse_data, market_area_data, p, aggregates),
+        "labor": calculate_labor_costs(warehouse_data, p),
+    }
+
+    demand = aggregates["demand"]
+    brands = demand["brands"]
+    layout = p["layout_type"]
+    capacity = p["container_capacity_40"]
+    z = compute_z_value(p["service_level"])
+    dz = z_value_derivative(p["service_level"])
+    orders = main_orders_per_year(p)
+    sq_ft = aggregates["sq_ft"]
+    prices = np.array([p["brand_unit_prices"].get(brand, 0) for brand in brands], dtype=float)
+    unit_financing = FINANCING_MARKUP * (p["interest_rate"] / 100.0) * prices
+    assignment = build_assignment_matrix(warehouse_data, demand)
+    if layout == LAYOUT_CENTRAL:
+        supplied = build_front_matrix(len(warehouse_data), aggregates["network"]["main_of"]) @ assignment
+    else:
+        supplied = np.zeros_like(assignment)
+
+    pair_area = demand["pair_area"]
+    pair_brand = demand["pair_brand"]
+    pair_annual = demand["forecast"].sum(axis=1)
+    pair_daily = demand["avg_daily"]
+    footprint = sq_ft[pair_brand]
+    # Peak sizing: each area's busiest month in square feet, each warehouse's busiest area.
+    area_sq_ft = demand["area_pairs"] @ (demand["forecast"] * footprint[:, None])
+    area_peak = area_sq_ft.max(axis=1, initial=0.0)
+    pair_peak = demand["forecast"][np.arange(len(pair_area)), area_sq_ft.argmax(axis=1)[pair_area]] if len(pair_area) else np.zeros(0)
+
+    inputs = {}
+    by_pair = {component: np.zeros(len(pair_area)) for component in COMPONENTS}
+    by_footprint = {component: np.zeros(len(brands)) for component in COMPONENTS}
+    by_price = np.zeros(len(brands))
+    # d cost / d pooled std of each (warehouse, brand)
+    by_std = {component: np.zeros((len(warehouse_data), len(brands))) for component in COMPONENTS}
+
+    for i, wh in enumerate(warehouse_data):
+        label = warehouse_label(i, wh)
+        is_main = wh["type"] == "MAIN"
+        lead_time = wh.get("lt_shipping", 0)
+        root = sqrt(lead_time) if lead_time > 0 else 0.0
+        own = assignment[i, pair_area]
+        brand_std = aggregates["brand_std"][i].toarray().ravel()
+
+        # Rental
+        rental_row = results["rental"]["details"][i]
+        if wh["rent_pricing_method"] == "Fixed Rent Price":
+            _add(inputs, "Warehouse", f"{label}: Fixed Rent Price ($/year)", wh["rent_price"], "rental", 1.0)
+        else:
+            overhead = p["overhead_factor_main"] if is_main else p["overhead_factor_front"]
+            rate = wh["rent_price"] * overhead
+            _add(inputs, "Warehouse", f"{label}: Rent Price per Sq Ft ($/year)", wh["rent_price"], "rental", rental_row["sq_ft"])
+            _add(inputs, "Global", "Overhead (MAIN)" if is_main else "Overhead (FRONT)", overhead, "rental", rental_row["sq_ft"] / overhead * wh["rent_price"])
+            if aggregates["peak_sq_ft"][i] > 0:
+                in_peak = pair_area == int((assignment[i] * area_peak).argmax())
+                peak_rate = rate if is_main else rate / 4.0
+                by_pair["rental"] += peak_rate * np.where(in_peak, pair_peak * footprint, 0.0)
+                by_footprint["rental"] += peak_rate * np.bincount(pair_brand[in_peak], weights=pair_peak[in_peak], minlength=len(brands))
+            if is_main:
+                if root > 0:
+                    by_std["rental"][i] = rate * root * z * sq_ft
+                    by_footprint["rental"] += rate * root * z * brand_std
+                    _add(inputs, "Global", "Service Level", p["service_level"], "rental", rate * root * dz * aggregates["std_sq_ft"][i])
+                    _add(inputs, "Warehouse", f"{label}: Lead Time (days)", lead_time, "rental", rate * z * aggregates["std_sq_ft"][i] / (2.0 * root))
+                if layout == LAYOUT_CENTRAL:
+                    by_pair["rental"] += rate * TRANSFER_LEAD_TIME * supplied[i, pair_area] * pair_daily * footprint
+                    by_footprint["rental"] += rate * TRANSFER_LEAD_TIME * aggregates["front_brand_daily"][i].toarray().ravel()
+            else:
+                by_pair["rental"] += rate * 12.0 * own * pair_daily * footprint
+                by_footprint["rental"] += rate * 12.0 * aggregates["brand_daily"][i].toarray().ravel()
+
+        # Shipping
+        shipping_row = results["shipping"]["details"][i]
+        if is_main:
+            cost_per_40hc = wh.get("shipping_cost_40hc", 0)
+            plan = aggregates.get("container_plan")
+            if plan is None:
+                _add(inputs, "Warehouse", f"{label}: Shipping Cost (per 40HC, $)", cost_per_40hc, "shipping", shipping_row["num_containers"])
+                _add(inputs, "Global", "Capacity for 40ft HC (Units)", capacity, "shipping", -aggregates["annual"][i] * cost_per_40hc / capacity ** 2)
+                by_pair["shipping"] += cost_per_40hc / capacity * own * pair_annual
+            else:
+                units = float(plan["counts"][i] @ plan["costs"])
+                sea = units * cost_per_40hc
+                _add(inputs, "Warehouse", f"{label}: Shipping Cost (per 40HC, $)", cost_per_40hc, "shipping", units)
+                _add(inputs, "Global", "Capacity for 40ft HC (Units)", capacity, "shipping", -sea / capacity)
+                pair_volume = own * pair_annual * footprint / p["sq_ft_per_unit"]
+                volume = pair_volume.sum()
+                if volume > 0:
+                    by_pair["shipping"] += sea * pair_volume / volume
+                    by_footprint["shipping"] += sea / volume * aggregates["brand_annual"][i].toarray().ravel() / p["sq_ft_per_unit"]
+                    # Volumes are footprints over Sq Ft per Unit.
+                    _add(inputs, "Global", "Sq Ft per Unit", p["sq_ft_per_unit"], "shipping", -sea / p["sq_ft_per_unit"])
+            if layout == LAYOUT_REGIONAL and "land_shipping_data" in wh:
+                add_land_sensitivities(inputs, by_pair["shipping"], i, wh, shipping_row, aggregates, p)
+        elif layout == LAYOUT_CENTRAL:
+            annual = aggregates["annual"][i]
+            per_unit = shipping_row["annual_shipping_cost"] / annual if annual > 0 else 0.0
+            _add(inputs, "Warehouse", f"{label}: Cost (per 40ft Truckload, $)", wh.get("front_shipping_cost_40", 0), "shipping", annual / (2.0 * TRUCK_FILL_RATE * capacity))
+            _add(inputs, "Warehouse", f"{label}: Cost (per 53ft Truckload, $)", wh.get("front_shipping_cost_53", 0), "shipping", annual / (2.0 * TRUCK_FILL_RATE * TRUCK_53_CAPACITY_FACTOR * capacity))
+            _add(inputs, "Global", "Capacity for 40ft HC (Units)", capacity, "shipping", -shipping_row["annual_shipping_cost"] / capacity)
+            by_pair["shipping"] += per_unit * own * pair_annual
+
+        # Inventory financing, at MAINs only
+        if is_main:
+            brand_annual = aggregates["brand_annual"]
+            entries = slice(brand_annual.indptr[i], brand_annual.indptr[i + 1])
+            carried = brand_annual.indices[entries]
+            std = aggregates["brand_std"].data[entries]
+            avg_inventory = brand_annual.data[entries] / (2.0 * orders) + std * root * z
+            if layout == LAYOUT_CENTRAL:
+                avg_inventory = avg_inventory + TRANSFER_LEAD_TIME * aggregates["front_brand_daily"].data[entries]
+            _add(inputs, "Global", "Interest Rate (%)", p["interest_rate"], "inventory", avg_inventory @ (FINANCING_MARKUP / 100.0 * prices[carried]))
+            np.add.at(by_price, carried, avg_inventory * FINANCING_MARKUP * (p["interest_rate"] / 100.0))
+            if root > 0:
+                by_std["inventory"][i, carried] = unit_financing[carried] * root * z
+                _add(inputs, "Global", "Service Level", p["service_level"], "inventory", std @ unit_financing[carried] * root * dz)
+                _add(inputs, "Warehouse", f"{label}: Lead Time (days)", lead_time, "inventory", std @ unit_financing[carried] * z / (2.0 * root))
+            by_pair["inventory"] += unit_financing[pair_brand] * (own * pair_annual / (2.0 * orders))
+            if layout == LAYOUT_CENTRAL:
+                by_pair["inventory"] += unit_financing[pair_brand] * TRANSFER_LEAD_TIME * supplied[i, pair_area] * pair_daily
+
+        # Labor
+        _add(inputs, "Warehouse", f"{label}: Avg Annual Salary/Employee ($)", wh.get("avg_employee_salary", 0), "labor", wh.get("num_employees", 0))
+        _add(inputs, "Warehouse", f"{label}: Number of Employees", wh.get("num_employees", 0), "labor", wh.get("avg_employee_salary", 0))
+
+    # Safety stock std, pooled over the areas a warehouse serves
+    gradients = compute_std_gradients(demand, assignment, aggregates["correlation"])
+    for component, weights in by_std.items():
+        by_pair[component] += np.bincount(gradients["pair"], weights=gradients["scale"] * weights[gradients["warehouse"], pair_brand[gradients["pair"]]], minlength=len(pair_area))
+        if gradients["rho"] is not None and weights.any():
+            _add(inputs, "Global", "Demand Correlation", p["demand_correlation"], component, gradients["rho"] @ weights[gradients["entry_warehouse"], gradients["entry_brand"]])
+
+    for b, brand in enumerate(brands):
+        if brand in p["brand_unit_prices"]:
+            _add(inputs, "SKU", f"{brand}: Unit Price ($)", prices[b], "inventory", by_price[b])
+    for component in ("rental", "shipping"):
+        explicit = np.array([brand in p["brand_sq_ft"] for brand in brands], dtype=bool)
+        for b in np.flatnonzero(explicit):
+            _add(inputs, "SKU", f"{brands[b]}: Sq Ft per Unit", sq_ft[b], component, by_footprint[component][b])
+        _add(inputs, "Global", "Sq Ft per Unit", p["sq_ft_per_unit"], component, by_footprint[component][~explicit].sum())
+
+    area_annual = aggregates["area_annual"]
+    brand_total = np.bincount(pair_brand, weights=pair_annual, minlength=len(brands))
+    for component, gradient in by_pair.items():
+        per_area = np.bincount(pair_area, weights=gradient, minlength=len(area_annual))
+        for a, area in enumerate(demand["areas"]):
+            if area_annual[a] > 0:
+                _add(inputs, "Area Demand", f"Demand of {area} (Units/year)", area_annual[a], component, per_area[a] / area_annual[a])
+        per_brand = np.bincount(pair_brand, weights=gradient, minlength=len(brands))
+        for b, brand in enumerate(brands):
+            if brand_total[b] > 0:
+                _add(inputs, "SKU Demand", f"Demand of {brand} (Units/year)", brand_total[b], component, per_brand[b] / brand_total[b])
+
+    rows = list(inputs.values())
+    for row in rows:
+        row["total"] = sum(row[component] for component in COMPONENTS)
+    base = {component: results[component]["total"] for component in COMPONENTS}
+    base["grand_total"] = sum(base.values())
+    return {"base": base, "inputs": rows, "elapsed": time.perf_counter() - start}
+
+
+def add_land_sensitivities(inputs, by_pair, i, wh, shipping_row, aggregates, params):
+    """
+    Regional land freight of MAIN ``i``: the per-order estimate
+    sum(ceil(demand / order size) * cost * miles) over its areas, or with
+    routing the route miles priced at estimate / out-and-back miles.
+    """
+    p = params
+    label = warehouse_label(i, wh)
+    demand = aggregates["demand"]
+    area_index = demand["area_index"]
+    routed = p["land_routing"]
+    estimate = shipping_row.get("regional_land_estimate") if routed else None
+    for area, ship_data in wh["land_shipping_data"].items():
+        a = area_index.get(area)
+        annual = aggregates["area_annual"][a] if a is not None else 0
+        order_size = ship_data.get("calculated_avg_order_size", 1)
+        cost = ship_data.get("cost_for_avg_order", 0)
+        distance = resolve_land_distance(wh, area, ship_data, p)
+        if not (order_size > 0 and cost > 0 and distance > 0):
+            continue
+        orders = ceil(annual / order_size)
+        name = f"{label} to {area}"
+        if routed:
+            if estimate:
+                _add(inputs, "Regional Freight", f"{name}: Cost per Avg Order per Mile ($)", cost, "shipping", shipping_row["regional_land_cost"] * orders * distance / estimate)
+            continue
+        _add(inputs, "Regional Freight", f"{name}: Cost per Avg Order per Mile ($)", cost, "shipping", orders * distance)
+        if ship_data.get("distance") is None:
+            _add(inputs, "Global", "Road Factor", p["road_factor"], "shipping", orders * cost * distance / p["road_factor"])
+        else:
+            _add(inputs, "Regional Freight", f"{name}: Distance (miles)", distance, "shipping", orders * cost)
+        if a is not None:
+            by_pair += np.where(demand["pair_area"] == a, demand["forecast"].sum(axis=1) * cost * distance / order_size, 0.0)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Named scenarios in a local SQLite database.
+
+A scenario row holds the full configuration (``market_area_data``,
+``warehouse_data`` and the resolved global parameters, as JSON) under a
+unique name, together with the hash of that configuration. Results are
+stored once per configuration hash in a separate table, so two names for
+the same configuration share one result, and loading a scenario brings its
+result back without pricing it again.
+"""
+from datetime import datetime, timezone
+import hashlib
+import json
+import sqlite3
+
+from sc_engine import resolve_params
+
+DEFAULT_DB_PATH = "scenarios.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS scenarios (
+    name TEXT PRIMARY KEY,
+    config_hash TEXT NOT NULL,
+    market_area_data TEXT NOT NULL,
+    warehouse_data TEXT NOT NULL,
+    params TEXT NOT NULL,
+    saved_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scenarios_config_hash ON scenarios (config_hash);
+CREATE TABLE IF NOT EXISTS results (
+    config_hash TEXT PRIMARY KEY,
+    grand_total REAL,
+    result TEXT NOT NULL,
+    saved_at TEXT NOT NULL
+);
+"""
+
+
+def _to_json(obj):
+    # NumPy scalars that slipped into a result are written as plain numbers.
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), default=float)
+
+
+def config_hash(market_area_data, warehouse_data, params=None):
+    """Hash of a configuration; equal configurations hash equal regardless of dict order."""
+    config = [market_area_data, warehouse_data, resolve_params(params)]
+    return hashlib.blake2b(_to_json(config).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def open_store(path=DEFAULT_DB_PATH):
+    """Opens (and if needed creates) the scenario database at ``path``."""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def save_scenario(conn, name, market_area_data, warehouse_data, params=None, result=None):
+    """
+    Saves the configuration under ``name``, replacing any scenario of that
+    name, and ``result`` (if given) under the configuration's hash.
+    Returns the hash.
+    """
+    name = name.strip()
+    if not name:
+        raise ValueError("Scenario name must not be empty.")
+    digest = config_hash(market_area_data, warehouse_data, params)
+    now = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO scenarios (name, config_hash, market_area_data, warehouse_data, params, saved_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, digest, _to_json(market_area_data), _to_json(warehouse_data), _to_json(resolve_params(params)), now),
+        )
+        if result is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (config_hash, grand_total, result, saved_at) VALUES (?, ?, ?, ?)",
+                (digest, result.get("grand_total"), _to_json(result), now),
+            )
+    return digest
+
+
+def load_result(conn, digest):
+    """The stored result for a configuration hash, or None."""
+    row = conn.execute("SELECT result FROM results WHERE config_hash = ?", (digest,)).fetchone()
+    return json.loads(row["result"]) if row else None
+
+
+def load_scenario(conn, name):
+    """
+    The scenario saved as ``name`` in the shape ``evaluate_scenario`` and the
+    export take, with its stored ``result`` (None if it was never priced),
+    or None if there is no such scenario.
+    """
+    row = conn.execute("SELECT * FROM scenarios WHERE name = ?", (name,)).fetchone()
+    if row is None:
+        return None
+    return {
+        "name": row["name"],
+        "config_hash": row["config_hash"],
+        "market_area_data": json.loads(row["market_area_data"]),
+        "warehouse_data": json.loads(row["warehouse_data"]),
+        "params": json.loads(row["params"]),
+        "result": load_result(conn, row["config_hash"]),
+        "saved_at": row["saved_at"],
+    }
+
+
+def find_scenarios(conn, digest):
+    """Names of the scenarios saved with configuration hash ``digest``."""
+    return [row["name"] for row in conn.execute("SELECT name FROM scenarios WHERE config_hash = ? ORDER BY name", (digest,))]
+
+
+def list_scenarios(conn):
+    """One dict per saved scenario (name, hash, grand total if priced, save time), by name."""
+    rows = conn.execute(
+        "SELECT s.name, s.config_hash, r.grand_total, s.saved_at FROM scenarios s "
+        "LEFT JOIN results r ON r.config_hash = s.config_hash ORDER BY s.name"
+    )
+    return [dict(row) for row in rows]
+
+
+def delete_scenario(conn, name):
+    """Deletes a scenario; its result goes too unless another scenario shares the configuration."""
+    with conn:
+        conn.execute("DELETE FROM scenarios WHERE name = ?", (name,))
+        conn.execute("DELETE FROM results WHERE config_hash NOT IN (SELECT config_hash FROM scenarios)")
+
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Batched parameter sweep over service level, interest rate and container capacity.
+
+Each cost component is closed-form in these three inputs: rental and safety
+stock are linear in Z, inventory financing is linear in the interest rate, and
+shipping only depends on capacity through ``ceil(demand / capacity)`` and the
+per-unit truckload rates. With container load planning, the MAIN shipments are
+packed once per capacity instead, and routed regional deliveries whose trucks
+take the container capacity are routed once per capacity. The scenario is
+therefore reduced once to a small set
+of coefficients, and the whole grid is evaluated by broadcasting them over
+``(service_level, interest_rate, capacity)``. Only the total is materialized
+over the grid (8 bytes per point); the components are broadcast views of
+their coefficient arrays, and grids are capped at ``MAX_GRID_POINTS``.
+"""
+from math import sqrt
+
+import numpy as np
+from scipy.stats import norm
+
+from sc_engine import (
+    CostInputError,
+    LAYOUT_CENTRAL,
+    TRANSFER_LEAD_TIME,
+    TRUCK_53_CAPACITY_FACTOR,
+    TRUCK_FILL_RATE,
+    FINANCING_MARKUP,
+    resolve_params,
+    main_orders_per_year,
+    prepare_aggregates,
+    plan_main_containers,
+    compute_land_routes,
+    evaluate_scenario,
+)
+
+MAX_GRID_POINTS = 5_000_000  # the total alone takes 40 MB at this size
+
+
+def compute_z_values(service_levels):
+    """Vectorized compute_z_value, with the same ±5 clamp at the bounds."""
+    levels = np.asarray(service_levels, dtype=float)
+    z = norm.ppf(np.clip(levels, 1e-12, 1 - 1e-12))
+    return np.where(levels >= 1.0, 5.0, np.where(levels <= 0.0, -5.0, z))
+
+
+def compute_cost_coefficients(market_area_data, warehouse_data, params=None):
+    """
+    Reduces a scenario to the coefficients the sweep broadcasts:
+
+    - rental = rental_base + rental_z * Z
+    - inventory = (inventory_base + inventory_z * Z) * interest_rate
+    - shipping = sum(ceil(main_demand / capacity) * main_cost_40hc) + front_rate / capacity + shipping_fixed,
+      or the planned containers of ``shipments`` priced at main_cost_40hc,
+      plus the routes of the ``routed`` MAINs, whose trucks are as large as
+      a container
+    - labor is constant
+
+    The base scenario is priced once through the engine, so invalid inputs raise
+    CostInputError exactly as the calculation buttons would.
+    """
+    p = resolve_params(params)
+    base = evaluate_scenario(market_area_data, warehouse_data, p)
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    layout = p["layout_type"]
+    brands = aggregates["demand"]["brands"]
+    prices = np.array([p["brand_unit_prices"].get(brand, 0) for brand in brands], dtype=float)
+
+    rental_base = 0.0
+    rental_z = 0.0
+    inventory_base = 0.0
+    inventory_z = 0.0
+    main_demand = []
+    main_cost_40hc = []
+    front_rate = 0.0
+    shipping_fixed = 0.0
+    for i, wh in enumerate(warehouse_data):
+        lead_time = wh.get("lt_shipping", 0)
+        if wh["type"] == "MAIN":
+            overhead = p["overhead_factor_main"]
+            sq_ft_base = aggregates["peak_sq_ft"][i]
+            sq_ft_z = aggregates["std_sq_ft"][i] * sqrt(lead_time) if lead_time > 0 else 0.0
+            if layout == LAYOUT_CENTRAL:
+                sq_ft_base += TRANSFER_LEAD_TIME * aggregates["front_daily_sq_ft"][i]
+        else:
+            overhead = p["overhead_factor_front"]
+            sq_ft_base = aggregates["peak_sq_ft"][i] / 4.0 + aggregates["daily_sq_ft"][i] * 12.0
+            sq_ft_z = 0.0
+        if wh["rent_pricing_method"] == "Fixed Rent Price":
+            rental_base += wh["rent_price"]
+        else:
+            rate = wh["rent_price"] * overhead
+            rental_base += rate * sq_ft_base
+            rental_z += rate * sq_ft_z
+
+        if wh["type"] == "MAIN":
+            main_demand.append(aggregates["annual"][i])
+            main_cost_40hc.append(wh.get("shipping_cost_40hc", 0))
+        elif layout == LAYOUT_CENTRAL:
+            per_capacity = (wh.get("front_shipping_cost_40", 0) + wh.get("front_shipping_cost_53", 0) / TRUCK_53_CAPACITY_FACTOR) / 2.0 / TRUCK_FILL_RATE
+            front_rate += aggregates["annual"][i] * per_capacity
+
+    # Routes of trucks sized to the container capacity change with it.
+    routed = []
+    for row, wh in zip(base["shipping"]["details"], warehouse_data):
+        if row["regional_land_cost"] is None:
+            continue
+        if p["land_routing"] and not p["route_truck_capacity"]:
+            routed.append(wh)
+        else:
+            shipping_fixed += row["regional_land_cost"]
+
+    # Same (warehouse, brand) entries as the base inventory rows: every brand a MAIN carries.
+    brand_annual = aggregates["brand_annual"]
+    for i, wh in enumerate(warehouse_data):
+        if wh["type"] != "MAIN":
+            continue
+        entries = slice(brand_annual.indptr[i], brand_annual.indptr[i + 1])
+        lead_time = wh.get("lt_shipping", 0)
+        stock_base = brand_annual.data[entries] / (2.0 * main_orders_per_year(p))
+        if layout == LAYOUT_CENTRAL:
+            stock_base = stock_base + TRANSFER_LEAD_TIME * aggregates["front_brand_daily"].data[entries]
+        unit_cost = FINANCING_MARKUP / 100.0 * prices[brand_annual.indices[entries]]
+        inventory_base += stock_base @ unit_cost
+        inventory_z += aggregates["brand_std"].data[entries] @ unit_cost * sqrt(lead_time)
+
+    return {
+        "rental_base": float(rental_base),
+        "rental_z": float(rental_z),
+        "inventory_base": float(inventory_base),
+        "inventory_z": float(inventory_z),
+        "main_demand": np.array(main_demand, dtype=float),
+        "main_cost_40hc": np.array(main_cost_40hc, dtype=float),
+        "shipments": aggregates.get("shipments"),
+        "front_rate": float(front_rate),
+        "shipping_fixed": float(shipping_fixed),
+        "routed": routed,
+        "aggregates": aggregates if routed else None,
+        "labor": float(base["labor"]["total"]),
+    }
+
+
+def run_parameter_sweep(market_area_data, warehouse_data, params=None,
+                        service_levels=None, interest_rates=None, capacities=None):
+    """
+    Evaluates every component on the grid ``service_levels x interest_rates x
+    capacities``. Axes left as None collapse to the value in ``params``.
+    Returns the axes plus one (S, R, C) array per component (read-only
+    broadcast views) and for the total. Raises ``CostInputError`` for grids
+    of more than ``MAX_GRID_POINTS`` points.
+    """
+    p = resolve_params(params)
+    service_levels = np.atleast_1d(np.asarray(p["service_level"] if service_levels is None else service_levels, dtype=float))
+    interest_rates = np.atleast_1d(np.asarray(p["interest_rate"] if interest_rates is None else interest_rates, dtype=float))
+    capacities = np.atleast_1d(np.asarray(p["container_capacity_40"] if capacities is None else capacities, dtype=float))
+    if (service_levels < 0).any() or (interest_rates < 0).any():
+        raise CostInputError("Interest Rate and Service Level must be non-negative.")
+    if (capacities <= 0).any():
+        raise CostInputError("Container Capacity must be positive.")
+    points = len(service_levels) * len(interest_rates) * len(capacities)
+    if points > MAX_GRID_POINTS:
+        raise CostInputError(f"The sweep grid has {points:,} points; at most {MAX_GRID_POINTS:,} are allowed. Use fewer steps.")
+
+    coeffs = compute_cost_coefficients(market_area_data, warehouse_data, p)
+    z = compute_z_values(service_levels)
+
+    rental = coeffs["rental_base"] + coeffs["rental_z"] * z
+    inventory = np.outer(coeffs["inventory_base"] + coeffs["inventory_z"] * z, interest_rates)
+    shipments = coeffs["shipments"]
+    if shipments is None:
+        containers = np.ceil(coeffs["main_demand"][:, None] / capacities[None, :])
+        sea = coeffs["main_cost_40hc"] @ containers
+    else:
+        sea = np.empty(len(capacities))
+        for c, capacity in enumerate(capacities):
+            plan = plan_main_containers(shipments, len(warehouse_data), p, capacity)
+            sea[c] = coeffs["main_cost_40hc"] @ (plan["counts"][shipments["rows"]] @ plan["costs"])
+    shipping = sea + coeffs["front_rate"] / capacities + coeffs["shipping_fixed"]
+    if coeffs["routed"]:
+        for c, capacity in enumerate(capacities):
+            routing_params = dict(p, container_capacity_40=float(capacity))
+            shipping[c] += sum(compute_land_routes(wh, coeffs["aggregates"], routing_params)["cost"] for wh in coeffs["routed"])
+
+    shape = (len(service_levels), len(interest_rates), len(capacities))
+    rental = np.broadcast_to(rental[:, None, None], shape)
+    inventory = np.broadcast_to(inventory[:, :, None], shape)
+    shipping = np.broadcast_to(shipping[None, None, :], shape)
+    labor = np.broadcast_to(coeffs["labor"], shape)
+    total = rental + inventory
+    total += shipping
+    total += labor
+    return {
+        "service_levels": service_levels,
+        "interest_rates": interest_rates,
+        "capacities": capacities,
+        "rental": rental,
+        "inventory": inventory,
+        "shipping": shipping,
+        "labor": labor,
+        "total": total,
+    }
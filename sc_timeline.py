@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+"""
+Month-by-month cost model over a horizon of several years.
+
+The cost engine prices one year from annual aggregates, so the seasonality
+of the 12-month ``forecast_demand`` only reaches the peak sizing of rental
+space. Here every component is laid out on a monthly time axis of
+``years`` x 12 months, with demand growing and costs escalating from year
+to year:
+
+- A MAIN holds half of the order covering the month (an order carries
+  12 / shipments_per_year months of forecast) plus its safety stock, and
+  finances it at a twelfth of the annual interest rate.
+- Sea freight is paid in the month an order ships: the year's containers in
+  proportion to each order's demand, or with container load planning the
+  planned containers of each shipment. Regional land freight follows the
+  monthly demand of the areas delivered, FRONT transfers the FRONT's
+  monthly forecast.
+- Rent and labor are paid in equal monthly installments; rented space is
+  sized to the year's demand.
+- Cash outlay is all costs plus the change in the landed value of the
+  inventory; the stock on hand in the first month is taken as owned.
+
+Demand growth scales forecast, daily demand and std alike, cost escalation
+scales rents, salaries and freight rates. With neither, the twelve months of
+the first year add up to the annual figures of the cost engine. The scenario
+is priced once; every series is a (months x warehouses) array broadcast
+from the 12-month profiles and the yearly factors, so a long horizon costs
+hardly more than a single year.
+"""
+import time
+
+import numpy as np
+
+from sc_demand import MONTHS, build_assignment_matrix
+from sc_containers import ContainerPlanError, plan_shipments
+from sc_engine import (
+    CostInputError,
+    LAYOUT_CENTRAL,
+    TRANSFER_LEAD_TIME,
+    FINANCING_MARKUP,
+    resolve_params,
+    main_orders_per_year,
+    compute_z_value,
+    warehouse_label,
+    prepare_aggregates,
+    calculate_rental_costs,
+    calculate_shipping_costs,
+    calculate_labor_costs,
+    validate_inventory_inputs,
+)
+
+MAX_HORIZON_YEARS = 30
+COST_SERIES = ("rental", "shipping", "financing", "labor")
+
+
+def yearly_factors(years, rates):
+    """
+    Factor of each year relative to the first, for ``rates`` in percent per
+    year: one rate for every year, or a sequence for years 2, 3, ... whose
+    last rate carries on.
+    """
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    if rates.size == 0:
+        rates = np.zeros(1)
+    if (rates <= -100.0).any():
+        raise CostInputError("Yearly growth and escalation rates must be above -100%.")
+    steps = rates[np.minimum(np.arange(years - 1), rates.size - 1)]
+    return np.concatenate([[1.0], np.cumprod(1.0 + steps / 100.0)])
+
+
+def order_profiles(profile, orders_per_year):
+    """
+    For a (12 x warehouse) monthly ``profile``: the quantity shipped with
+    the orders placed in each month, and the size of an order covering each
+    month.
+    """
+    if orders_per_year <= 12:
+        per = 12 // orders_per_year
+        period = profile.reshape((orders_per_year, per) + profile.shape[1:]).sum(axis=1)
+        shipped = np.zeros_like(profile)
+        shipped[::per] = period
+        return shipped, np.repeat(period, per, axis=0)
+    return profile, profile * (12.0 / orders_per_year)
+
+
+def compute_planned_sea_freight(aggregates, growth, cost_40hc, params):
+    """
+    (years x 12 x warehouse) sea freight of the planned shipments, in 40ft HC
+    costs of the first year: every year's shipments are scaled by its demand
+    growth and all are packed in one batch.
+    """
+    p = params
+    shipments = aggregates["shipments"]
+    n_main, n_shipments, n_brands = shipments["quantities"].shape
+    quantities = shipments["quantities"][None] * growth[:, None, None, None]
+    try:
+        plan = plan_shipments(quantities.reshape(-1, n_brands), shipments["volumes"], p["container_capacity_40"], p["container_types"])
+    except ContainerPlanError as e:
+        raise CostInputError(str(e))
+    units = (plan["counts"] @ plan["costs"]).reshape(len(growth), n_main, n_shipments)
+    rows = shipments["rows"]
+    sea = np.zeros((len(growth), len(MONTHS), len(cost_40hc)))
+    months = np.arange(n_shipments) * (len(MONTHS) // n_shipments)
+    sea[:, months[:, None], rows[None, :]] = units.transpose(0, 2, 1) * shipments["repeats"] * cost_40hc[rows]
+    return sea
+
+
+def run_cost_timeline(market_area_data, warehouse_data, params=None, years=5, demand_growth=0.0, cost_escalation=0.0):
+    """
+    Monthly costs of a scenario over ``years`` years. ``demand_growth`` and
+    ``cost_escalation`` are percent per year (see ``yearly_factors``).
+    Returns (months x warehouse) arrays ``demand``, ``inventory`` (units),
+    ``inventory_value``, ``rental``, ``shipping``, ``financing``, ``labor``
+    and ``cash_outlay``, the monthly ``total`` cost, one summary row per
+    year in ``yearly`` and ``elapsed`` seconds.
+    """
+    if not 1 <= years <= MAX_HORIZON_YEARS:
+        raise CostInputError(f"The horizon must be between 1 and {MAX_HORIZON_YEARS} years.")
+    start = time.perf_counter()
+    p = resolve_params(params)
+    validate_inventory_inputs(warehouse_data, p)
+    aggregates = prepare_aggregates(warehouse_data, market_area_data, p)
+    rental = calculate_rental_costs(warehouse_data, market_area_data, p, aggregates)
+    shipping = calculate_shipping_costs(warehouse_data, market_area_data, p, aggregates)
+    labor = calculate_labor_costs(warehouse_data, p)
+
+    n_months = len(MONTHS)
+    growth = yearly_factors(years, demand_growth)
+    escalation = yearly_factors(years, cost_escalation)
+    year_of = np.repeat(np.arange(years), n_months)
+    month_of = np.tile(np.arange(n_months), years)
+    g = growth[year_of][:, None]
+    e = escalation[year_of][:, None]
+
+    demand = aggregates["demand"]
+    prices = np.array([p["brand_unit_prices"].get(brand, 0) for brand in demand["brands"]], dtype=float)
+    assignment = build_assignment_matrix(warehouse_data, demand)
+    monthly = aggregates["monthly"].T
+    pair_value = demand["forecast"] * prices[demand["pair_brand"]][:, None]
+    monthly_value = (assignment @ (demand["area_pairs"] @ pair_value)).T
+    annual = aggregates["annual"]
+
+    # Inventory: cycle stock of the order covering each month plus safety stock, at MAINs only.
+    is_main = np.array([wh["type"] == "MAIN" for wh in warehouse_data])
+    lead_times = np.array([wh.get("lt_shipping", 0) if is_main[w] else 0 for w, wh in enumerate(warehouse_data)], dtype=float)
+    if (lead_times < 0).any():
+        raise CostInputError("Lead times must be non-negative.")
+    orders = main_orders_per_year(p)
+    shipped, order_units = order_profiles(monthly, orders)
+    _, order_value = order_profiles(monthly_value, orders)
+    safety_factor = np.sqrt(lead_times) * compute_z_value(p["service_level"])
+    safety_units = aggregates["std"] * safety_factor
+    safety_value = (aggregates["brand_std"] @ prices) * safety_factor
+    if p["layout_type"] == LAYOUT_CENTRAL:
+        safety_units = safety_units + TRANSFER_LEAD_TIME * aggregates["front_daily"]
+        safety_value = safety_value + TRANSFER_LEAD_TIME * (aggregates["front_brand_daily"] @ prices)
+    inventory = np.where(is_main, order_units[month_of] / 2.0 + safety_units, 0.0) * g
+    inventory_value = np.where(is_main, order_value[month_of] / 2.0 + safety_value, 0.0) * g
+    financing = inventory_value * FINANCING_MARKUP * (p["interest_rate"] / 100.0) / n_months
+
+    rent = np.array([row["annual_rent"] for row in rental["details"]], dtype=float)
+    sized = np.array([row["pricing_method"] != "Fixed Rent Price" for row in rental["details"]])
+    rental_series = rent / n_months * e * np.where(sized, g, 1.0)
+    labor_series = np.array([row["annual_labor_cost"] for row in labor["details"]], dtype=float) / n_months * e
+
+    # Shipping: sea freight when orders ship, land freight with the demand it delivers.
+    cost_40hc = np.array([wh.get("shipping_cost_40hc", 0) if is_main[w] else 0 for w, wh in enumerate(warehouse_data)], dtype=float)
+    if "shipments" in aggregates:
+        sea = compute_planned_sea_freight(aggregates, growth, cost_40hc, p).reshape(years * n_months, -1)
+    else:
+        containers = np.ceil(annual[None, :] * growth[:, None] / p["container_capacity_40"])
+        shipped_share = shipped / np.where(annual > 0, annual, 1.0)
+        sea = containers[year_of] * cost_40hc * shipped_share[month_of]
+    land_annual = np.zeros(len(warehouse_data))
+    land_profile = np.zeros((n_months, len(warehouse_data)))
+    area_index = demand["area_index"]
+    for row, wh in zip(shipping["details"], warehouse_data):
+        w = row["index"]
+        if row["type"] == "MAIN":
+            if not row["regional_land_cost"]:
+                continue
+            land_annual[w] = row["regional_land_cost"]
+            areas = [area_index[area] for area in wh["land_shipping_data"] if area in area_index]
+            profile = aggregates["area_monthly"][areas].sum(axis=0)
+        else:
+            land_annual[w] = row["annual_shipping_cost"]
+            profile = monthly[:, w]
+        total = profile.sum()
+        land_profile[:, w] = profile / total if total > 0 else 1.0 / n_months
+    shipping_series = (sea + land_annual * land_profile[month_of] * g) * e
+
+    landed = inventory_value * FINANCING_MARKUP
+    investment = np.diff(landed, axis=0, prepend=landed[:1])
+    series = {
+        "rental": rental_series,
+        "shipping": shipping_series,
+        "financing": financing,
+        "labor": labor_series,
+    }
+    total = sum(series[name].sum(axis=1) for name in COST_SERIES)
+    cash_outlay = sum(series.values()) + investment
+
+    def by_year(values):
+        return values.reshape(years, n_months, -1).sum(axis=(1, 2))
+
+    demand_series = monthly[month_of] * g
+    yearly_totals = {name: by_year(values) for name, values in series.items()}
+    yearly_demand = by_year(demand_series)
+    yearly_inventory = by_year(inventory) / n_months
+    yearly_value = by_year(inventory_value) / n_months
+    yearly_total = by_year(total)
+    yearly_cash = by_year(cash_outlay)
+    yearly = [dict({
+        "year": y + 1,
+        "demand_factor": float(growth[y]),
+        "cost_factor": float(escalation[y]),
+        "demand": float(yearly_demand[y]),
+        "avg_inventory": float(yearly_inventory[y]),
+        "avg_inventory_value": float(yearly_value[y]),
+    }, **{name: float(yearly_totals[name][y]) for name in COST_SERIES},
+        total=float(yearly_total[y]), cash_outlay=float(yearly_cash[y])) for y in range(years)]
+    return {
+        "years": years,
+        "months": [f"Y{year + 1} {MONTHS[month]}" for year, month in zip(year_of, month_of)],
+        "warehouses": [warehouse_label(w, wh) for w, wh in enumerate(warehouse_data)],
+        "demand": demand_series,
+        "inventory": inventory,
+        "inventory_value": inventory_value,
+        **series,
+        "cash_outlay": cash_outlay,
+        "total": total,
+        "yearly": yearly,
+        "elapsed": time.perf_counter() - start,
+    }